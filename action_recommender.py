@@ -0,0 +1,189 @@
+"""
+Corrective-action recommender backed by a precomputed k-nearest-neighbor graph.
+
+Offline (python action_recommender.py): embed every distinct processed_problem in
+maintenance_logs.csv, build a kNN graph over them with chunked matrix products,
+and precompute for every problem the most common corrective actions among itself
+and its neighbors. Online: one query embedding, one dot product against the
+problem matrix to find the closest problem, then a lookup of its ranked actions.
+No LLM call.
+"""
+
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+from collections import Counter, defaultdict
+
+import numpy as np
+
+ACTION_GRAPH_PATH = Path(os.getenv("ACTION_GRAPH_PATH", "action_graph.npz"))
+LOGS_CSV = Path("maintenance_logs.csv")
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+GRAPH_NEIGHBORS = 10  # Neighbors kept per problem
+GRAPH_MIN_SIMILARITY = 0.6  # Neighbors below this similarity don't contribute actions
+GRAPH_CHUNK = 1024  # Rows per similarity block while building
+ACTIONS_PER_PROBLEM = 10  # Ranked actions stored per problem
+
+
+def normalize_action(action: str) -> str:
+    return " ".join(str(action).lower().split())
+
+
+def build_knn(embeddings, k=GRAPH_NEIGHBORS, chunk=GRAPH_CHUNK):
+    """
+    Exact kNN over L2-normalized embeddings, one block of rows at a time so memory
+    stays at chunk x N instead of N x N. Returns (indices, similarities), both N x k,
+    sorted by decreasing similarity and excluding each row itself.
+    """
+    n = embeddings.shape[0]
+    k = min(k, n - 1)
+    indices = np.empty((n, max(k, 0)), dtype=np.int32)
+    sims = np.empty((n, max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return indices, sims
+
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        block = embeddings[start:stop] @ embeddings.T
+        block[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # drop self-matches
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_sims, axis=1)
+        indices[start:stop] = np.take_along_axis(top, order, axis=1)
+        sims[start:stop] = np.take_along_axis(top_sims, order, axis=1)
+
+    return indices, sims
+
+
+def rank_actions(action_counts, indices, sims, min_similarity=GRAPH_MIN_SIMILARITY, limit=ACTIONS_PER_PROBLEM):
+    """
+    For every problem, score actions by how often they were applied to it and to its
+    neighbors, neighbors weighted by similarity. Returns one list of
+    (action, score, support) per problem, best first.
+    """
+    ranked = []
+    for i, own in enumerate(action_counts):
+        scores = defaultdict(float)
+        support = Counter()
+        for action, count in own.items():
+            scores[action] += count
+            support[action] += count
+        for j, sim in zip(indices[i], sims[i]):
+            if sim < min_similarity:
+                break
+            for action, count in action_counts[j].items():
+                scores[action] += float(sim) * count
+                support[action] += count
+        best = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+        ranked.append([(action, round(score, 3), support[action]) for action, score in best])
+    return ranked
+
+
+def build_graph(csv_path=LOGS_CSV, output=ACTION_GRAPH_PATH, k=GRAPH_NEIGHBORS):
+    """Build and save the problem -> ranked actions graph from the maintenance logs."""
+    import pandas as pd
+    from sentence_transformers import SentenceTransformer
+
+    df = pd.read_csv(csv_path).fillna("")
+    df = df[(df["processed_problem"].str.strip() != "") & (df["processed_action"].str.strip() != "")]
+
+    # One node per distinct problem, with the actions recorded against it
+    grouped = df.groupby("processed_problem")["processed_action"]
+    problems = list(grouped.groups.keys())
+    action_counts = [Counter(normalize_action(a) for a in grouped.get_group(p)) for p in problems]
+    print(f"{len(df)} log rows -> {len(problems)} distinct problems")
+
+    print(f"Embedding problems with {EMBEDDING_MODEL}...")
+    embedder = SentenceTransformer(EMBEDDING_MODEL)
+    embeddings = embedder.encode(problems, batch_size=64, normalize_embeddings=True, show_progress_bar=True)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+
+    start = time.perf_counter()
+    indices, sims = build_knn(embeddings, k)
+    print(f"kNN graph ({k} neighbors) built in {time.perf_counter() - start:.2f}s")
+
+    ranked = rank_actions(action_counts, indices, sims)
+
+    save_graph(output, embeddings, indices, sims, problems, ranked)
+    print(f"Saved action graph to {output}")
+
+
+def pack_strings(strings):
+    """UTF-8 bytes of all strings in one uint8 array plus their offsets (no pickled object arrays)."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_strings(blob, offsets):
+    raw = blob.tobytes()
+    return [raw[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def save_graph(output, embeddings, indices, sims, problems, ranked):
+    """Write the graph as plain numeric arrays, so loading it never needs pickle."""
+    problem_bytes, problem_offsets = pack_strings(problems)
+    action_bytes, action_offsets = pack_strings(json.dumps(r) for r in ranked)
+    np.savez_compressed(
+        Path(output),
+        embeddings=embeddings,
+        neighbors=indices,
+        similarities=sims,
+        problem_bytes=problem_bytes,
+        problem_offsets=problem_offsets,
+        action_bytes=action_bytes,
+        action_offsets=action_offsets,
+    )
+
+
+class ActionRecommender:
+    """Serves corrective-action suggestions from a graph written by build_graph."""
+
+    def __init__(self, path=ACTION_GRAPH_PATH):
+        # ACTION_GRAPH_PATH may point anywhere, so never unpickle from it. Graphs built before
+        # the strings were stored as bytes raise here; rebuild them with `python action_recommender.py`
+        with np.load(path, allow_pickle=False) as data:
+            self.embeddings = data["embeddings"]
+            self.problems = unpack_strings(data["problem_bytes"], data["problem_offsets"])
+            self.actions = [json.loads(a) for a in unpack_strings(data["action_bytes"], data["action_offsets"])]
+        self.path = Path(path)
+
+    @classmethod
+    def load_if_exists(cls, path=ACTION_GRAPH_PATH):
+        """Load the graph if it has been built, otherwise return None."""
+        if not Path(path).is_file():
+            return None
+        try:
+            return cls(path)
+        except (KeyError, ValueError) as e:
+            print(f"Ignoring action graph {path} in an old or unsafe format ({e}); rebuild it with: python action_recommender.py")
+            return None
+
+    def suggest(self, query_embedding, limit=5):
+        """
+        Ranked corrective actions for the problem closest to the query embedding.
+        Returns a dict with the matched problem, its similarity and the suggestions.
+        """
+        q = np.asarray(query_embedding, dtype=np.float32)
+        sims = self.embeddings @ q
+        best = int(np.argmax(sims))
+        return {
+            "matchedProblem": self.problems[best],
+            "similarity": round(float(sims[best]), 3),
+            "suggestions": [
+                {"action": action, "score": score, "support": support}
+                for action, score, support in self.actions[best][:limit]
+            ],
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the corrective-action kNN graph.")
+    parser.add_argument("--csv", type=Path, default=LOGS_CSV)
+    parser.add_argument("--output", type=Path, default=ACTION_GRAPH_PATH)
+    parser.add_argument("--neighbors", type=int, default=GRAPH_NEIGHBORS)
+    args = parser.parse_args()
+    build_graph(args.csv, args.output, args.neighbors)
@@ -0,0 +1,298 @@
+"""
+Columnar analytics store for the Dashboard.
+
+Maintenance logs are written as Parquet part files (one per load) under
+ANALYTICS_DIR/logs, with an issue category assigned at ingestion. Aggregates the
+Dashboard needs (counts by category, top recurring problems, weekly trends) are
+kept as precomputed rollups in ANALYTICS_DIR/rollups.json, together with the
+top ANALYTICS_TOP_PROBLEMS recurring problems per category and overall, taken
+from exact per-problem counts whenever the rollups are saved. Loading new logs
+only folds the new rows into the rollups; `rebuild` recomputes them from the
+Parquet files. Requests never touch the raw logs or the full problem counts.
+
+    python analytics.py ingest maintenance_logs.csv
+    python analytics.py rebuild
+    python analytics.py summary
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import datetime as dt
+import threading
+from pathlib import Path
+from collections import Counter
+
+from issue_categories import REPORT_CATEGORIES, classify_issue, normalize_category
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed to ingest or rebuild
+    pa = pq = None
+
+ANALYTICS_DIR = Path(os.getenv("ANALYTICS_DIR", "analytics"))
+ANALYTICS_TOP_PROBLEMS = int(os.getenv("ANALYTICS_TOP_PROBLEMS", "100"))  # Top problems precomputed per category and overall
+
+SCHEMA_COLUMNS = ["log_id", "problem", "action", "category", "date", "week", "source"]
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("pyarrow is required for the analytics store. Install it with: pip install pyarrow")
+
+
+def logs_dir(base=ANALYTICS_DIR):
+    return Path(base) / "logs"
+
+
+def rollups_path(base=ANALYTICS_DIR):
+    return Path(base) / "rollups.json"
+
+
+def normalize_problem(problem: str) -> str:
+    return " ".join(str(problem).lower().split())
+
+
+def make_log_id(problem, action, occurrence=0, date=""):
+    """
+    Stable id for a log row, from its content rather than the file it came from, so
+    loading the same rows again under any name doesn't double count them.
+    `occurrence` numbers identical rows within one load so genuine repeats are kept.
+    """
+    key = json.dumps([date, problem, action, occurrence]).encode("utf-8")
+    return hashlib.sha1(key).hexdigest()[:16]
+
+
+def week_start(day: dt.date) -> str:
+    """Monday of the week containing `day`, as YYYY-MM-DD."""
+    return (day - dt.timedelta(days=day.weekday())).isoformat()
+
+
+def empty_rollups():
+    return {
+        "total": 0,
+        "by_category": {c: 0 for c in REPORT_CATEGORIES},
+        "problem_counts": {c: {} for c in REPORT_CATEGORIES},
+        "weekly": {},
+        "updated_at": None,
+    }
+
+
+def load_rollups(base=ANALYTICS_DIR):
+    path = rollups_path(base)
+    if not path.is_file():
+        return empty_rollups()
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def top_problem_lists(problem_counts, limit=ANALYTICS_TOP_PROBLEMS):
+    """The `limit` most frequent problems of each category, and under "*" overall, as [[problem, count], ...]."""
+    overall = Counter()
+    top = {}
+    for category, problems in problem_counts.items():
+        overall.update(problems)
+        top[category] = [[p, n] for p, n in Counter(problems).most_common(limit)]
+    top["*"] = [[p, n] for p, n in overall.most_common(limit)]
+    return top
+
+
+def save_rollups(rollups, base=ANALYTICS_DIR):
+    """Write the rollups atomically so readers never see a partial file."""
+    path = rollups_path(base)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rollups["top_problems"] = top_problem_lists(rollups["problem_counts"])
+    rollups["updated_at"] = dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds")
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(rollups, f)
+    os.replace(tmp, path)
+
+
+def fold_rows(rollups, rows):
+    """
+    Add rows (dicts with problem, category, week) to the rollups in place. Problem
+    counts are exact, so incremental loads add up to the same numbers as `rebuild`.
+    """
+    for row in rows:
+        category = row["category"]
+        rollups["total"] += 1
+        rollups["by_category"][category] = rollups["by_category"].get(category, 0) + 1
+        problems = rollups["problem_counts"].setdefault(category, {})
+        key = normalize_problem(row["problem"])
+        if key:
+            problems[key] = problems.get(key, 0) + 1
+        week = rollups["weekly"].setdefault(row["week"], {})
+        week[category] = week.get(category, 0) + 1
+    return rollups
+
+
+def existing_log_ids(base=ANALYTICS_DIR):
+    """Ids already stored, read from the log_id column only."""
+    _require_pyarrow()
+    ids = set()
+    for part in sorted(logs_dir(base).glob("part-*.parquet")):
+        ids.update(pq.read_table(part, columns=["log_id"]).column("log_id").to_pylist())
+    return ids
+
+
+def prepare_rows(df, source, ingest_date=None):
+    """
+    Turn a processed_problem/processed_action frame into analytics rows. A `date`
+    column is used when present; the logs we have carry no dates, so rows
+    otherwise get the day they were loaded.
+    """
+    ingest_date = ingest_date or dt.date.today()
+    has_dates = "date" in df.columns
+    has_category = "category" in df.columns
+    rows = []
+    occurrences = Counter()
+    for _, row in df.iterrows():
+        problem = str(row.get("processed_problem", "") or "").strip()
+        action = str(row.get("processed_action", "") or "").strip()
+        if not problem and not action:
+            continue
+        day = ingest_date
+        if has_dates:
+            try:
+                day = dt.date.fromisoformat(str(row["date"])[:10])
+            except ValueError:
+                pass
+        category = normalize_category(row["category"]) if has_category else None
+        # Without a date column the load day isn't part of the row, so it stays out of the id
+        content = (day.isoformat() if has_dates else "", problem, action)
+        occurrence = occurrences[content]
+        occurrences[content] += 1
+        rows.append({
+            "log_id": make_log_id(problem, action, occurrence, content[0]),
+            "problem": problem,
+            "action": action,
+            "category": category or classify_issue(f"{problem} {action}"),
+            "date": day.isoformat(),
+            "week": week_start(day),
+            "source": source,
+        })
+    return rows
+
+
+def ingest(df, source, base=ANALYTICS_DIR, ingest_date=None):
+    """
+    Append new log rows as a Parquet part file and fold them into the rollups.
+    Rows already ingested (same text and date, from any file) are skipped. Returns the
+    number of rows added.
+    """
+    _require_pyarrow()
+    seen = existing_log_ids(base)
+    rows = [r for r in prepare_rows(df, source, ingest_date) if r["log_id"] not in seen]
+    if not rows:
+        return 0
+
+    out_dir = logs_dir(base)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pydict({col: [r[col] for r in rows] for col in SCHEMA_COLUMNS})
+    pq.write_table(table, out_dir / f"part-{time.time_ns()}.parquet", compression="zstd")
+
+    save_rollups(fold_rows(load_rollups(base), rows), base)
+    return len(rows)
+
+
+def ingest_csv(csv_path, base=ANALYTICS_DIR):
+    import pandas as pd
+
+    df = pd.read_csv(csv_path).fillna("")
+    return ingest(df, Path(csv_path).name, base)
+
+
+def rebuild(base=ANALYTICS_DIR):
+    """Recompute the rollups from every Parquet part file."""
+    _require_pyarrow()
+    rollups = empty_rollups()
+    for part in sorted(logs_dir(base).glob("part-*.parquet")):
+        table = pq.read_table(part, columns=["problem", "category", "week"])
+        fold_rows(rollups, table.to_pylist())
+    save_rollups(rollups, base)
+    return rollups
+
+
+class AnalyticsStore:
+    """Serves Dashboard aggregates from the rollups file, reloading it when it changes."""
+
+    def __init__(self, base=ANALYTICS_DIR):
+        self.path = rollups_path(base)
+        self.rollups = empty_rollups()
+        self.mtime = None
+        self.lock = threading.Lock()
+
+    def _current(self):
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return self.rollups
+        with self.lock:
+            if mtime != self.mtime:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    rollups = json.load(f)
+                if "top_problems" not in rollups:
+                    # Written before the top lists were stored: compute them once per load
+                    rollups["top_problems"] = top_problem_lists(rollups["problem_counts"])
+                self.rollups = rollups
+                self.mtime = mtime
+            return self.rollups
+
+    def available(self):
+        return self.path.is_file()
+
+    def summary(self, weeks=8):
+        """Counts by category and recent weekly totals, shaped like the frontend AnalyticsData."""
+        rollups = self._current()
+        return {
+            "totalIssues": rollups["total"],
+            "issuesByCategory": {c: rollups["by_category"].get(c, 0) for c in REPORT_CATEGORIES},
+            "weeklyCompletions": [
+                {"date": week["date"], "count": week["total"]} for week in self.trends(weeks)["weeks"]
+            ],
+            "updatedAt": rollups["updated_at"],
+        }
+
+    def top_problems(self, limit=10, category=None):
+        """
+        Most frequently recurring problems, overall or within one category, from the
+        lists precomputed in the rollups (at most ANALYTICS_TOP_PROBLEMS long).
+        """
+        top = self._current().get("top_problems") or {}
+        return [{"problem": p, "count": n} for p, n in top.get(category or "*", [])[:limit]]
+
+    def trends(self, weeks=12, category=None):
+        """Weekly issue counts (total and by category) for the most recent weeks."""
+        rollups = self._current()
+        recent = sorted(rollups["weekly"].items())[-weeks:] if weeks else []
+        series = []
+        for date, by_category in recent:
+            entry = {"date": date, "byCategory": {c: by_category.get(c, 0) for c in REPORT_CATEGORIES}}
+            entry["total"] = by_category.get(category, 0) if category else sum(by_category.values())
+            series.append(entry)
+        return {"category": category, "weeks": series}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance log analytics store.")
+    parser.add_argument("--dir", type=Path, default=ANALYTICS_DIR, help="Analytics directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest_cmd = sub.add_parser("ingest", help="Add a processed maintenance log CSV")
+    ingest_cmd.add_argument("csv", type=Path)
+    sub.add_parser("rebuild", help="Recompute the rollups from the Parquet files")
+    sub.add_parser("summary", help="Print the current aggregates")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        added = ingest_csv(args.csv, args.dir)
+        print(f"Added {added} log rows to {logs_dir(args.dir)}")
+    elif args.command == "rebuild":
+        rollups = rebuild(args.dir)
+        print(f"Rebuilt rollups over {rollups['total']} log rows")
+    else:
+        store = AnalyticsStore(args.dir)
+        print(json.dumps({"summary": store.summary(), "topProblems": store.top_problems(10)}, indent=2))
@@ -1,19 +1,59 @@
 import os
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, send_file
 from flask_cors import CORS
 import time
+import json
+import logging
 from dotenv import load_dotenv
 import re
 
 # Import your RAG pipeline
-from rag_pipeline import rag_pipeline
+from rag_pipeline import rag_pipeline, rag_pipeline_progressive, rag_pipeline_batch, embed_query, BATCH_MAX_CONCURRENCY, BREAKERS
+from metrics import render_prometheus, HTTP_REQUESTS, HTTP_LATENCY
+from sessions import SessionStore
+from action_recommender import ActionRecommender
+from analytics import AnalyticsStore
+from issue_categories import normalize_category
+from facets import parse_facet_filters
+from autocomplete import Autocomplete, AUTOCOMPLETE_FIELDS
+from refinements import RefinementStore, REFINE_MAX_WAIT
+from profiling import profile_call, is_admin, folded_path, ProfilerBusy
+from log_store import open_store, InvalidCursor, LOGS_PAGE_DEFAULT, LOGS_PAGE_MAX
+from scheduler import Scheduler, Overloaded, classify_priority, BACKGROUND_PRIORITY
+from resilience import Deadline
 
 # Load environment variables
 load_dotenv()
 
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("app")
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "500"))  # Largest batch accepted by /api/chat/batch
+
+# Conversation sessions: follow-up questions reuse earlier retrieval
+session_store = SessionStore()
+
+# Corrective-action suggestions (build the graph with `python action_recommender.py`)
+action_recommender = ActionRecommender.load_if_exists()
+
+# Dashboard aggregates from precomputed rollups (populate with `python analytics.py ingest <csv>`)
+analytics_store = AnalyticsStore()
+
+# Log phrase completions for LogWriting, refreshed as new logs are loaded
+autocomplete = Autocomplete().build()
+
+# Web-augmented answers computed in the background for progressive /api/chat requests
+refinement_store = RefinementStore()
+
+# Admission control for /api/chat: AOG questions first, routine ones shed or degraded when saturated
+scheduler = Scheduler()
+
+# Indexed log table behind /api/logs (loaded from maintenance_logs.csv when empty)
+log_store = open_store()
+
 def ensure_sources_section(response):
     """
     Ensure that the response has a proper Sources section at the end.
@@ -33,16 +73,42 @@ def ensure_sources_section(response):
     
     return response
 
+def run_refinement(refine):
+    """
+    A progressive answer's web refinement, run in a scheduler slot of the background
+    class so it never takes capacity from a waiting request. A refinement the scheduler
+    would degrade is dropped: web search is all it adds, and the client keeps the fast answer.
+    """
+    with scheduler.admit(BACKGROUND_PRIORITY) as ticket:
+        if ticket.degraded:
+            raise Overloaded("Web refinement skipped: the server is busy", 0)
+        return ensure_sources_section(refine())
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """
-    Endpoint for chat messages that uses the RAG pipeline
+    Endpoint for chat messages that uses the RAG pipeline.
+    Pass the returned sessionId back with follow-up questions to keep the conversation context.
+    
+    With "progressive": true the response is answered from the vector DB alone; if a
+    web-augmented answer is being prepared, the response carries a refinementId to
+    poll at /api/chat/refinement/<refinementId>.
+    
+    Admins (X-Admin-Token header) can add ?profile=1 or an X-Profile: 1 header to run
+    the request under the sampling profiler and tracemalloc; the report is returned
+    under "profile" and the folded stacks can be downloaded from its flamegraphUrl.
+    
+    Requests are scheduled by priority: "priority" ("aog", "urgent" or "routine"),
+    else "aog" when the question mentions AOG, else by issueCategory (see scheduler.py).
+    When the server is saturated, lower-priority requests are answered without web
+    search ("degraded": true) or rejected with 503 and a Retry-After header.
     """
     try:
         start_time = time.time()
         data = request.json
         
         if not data or 'message' not in data:
+            HTTP_REQUESTS.inc(endpoint="/api/chat", status="400")
             return jsonify({'error': 'No message provided'}), 400
         
         # Extract message and optional tags
@@ -50,61 +116,388 @@ def chat():
         aircraft_model = data.get('aircraftModel')
         issue_category = data.get('issueCategory')
         
-        # Print received data to console for verification
-        print("="*50)
-        print(f"RECEIVED MESSAGE FROM FRONTEND: '{user_message}'")
-        print(f"Aircraft model: {aircraft_model}")
-        print(f"Issue category: {issue_category}")
-        print("="*50)
+        logger.debug("Received message: %r (aircraft model: %s, issue category: %s)",
+                     user_message, aircraft_model, issue_category)
         
-        # Add tags to the message if available
-        enhanced_message = user_message
-        if aircraft_model:
-            enhanced_message = f"[Aircraft: {aircraft_model}] {enhanced_message}"
-        if issue_category:
-            enhanced_message = f"[Issue Category: {issue_category}] {enhanced_message}"
+        # Tags become Qdrant filters on the facets tagged at ingestion
+        try:
+            filters = parse_facet_filters(aircraft_model, issue_category)
+            priority = classify_priority(data.get('priority'), issue_category, user_message)
+        except ValueError as e:
+            HTTP_REQUESTS.inc(endpoint="/api/chat", status="400")
+            return jsonify({'error': str(e)}), 400
+        profiling = request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'
+        if profiling and not is_admin(request.headers.get('X-Admin-Token')):
+            HTTP_REQUESTS.inc(endpoint="/api/chat", status="403")
+            return jsonify({'error': 'Profiling is restricted to admins'}), 403
+        
+        session = session_store.get_or_create(data.get('sessionId'))
+        refinement = None
+        profile = None
+        # Time spent queued for a slot counts against the request deadline
+        deadline = Deadline()
+        admission = {}
         
-        print(f"Enhanced message to be processed: '{enhanced_message}'")
+        def answer():
+            with scheduler.admit(priority) as ticket:
+                admission.update(degraded=ticket.degraded, waited=ticket.waited)
+                if data.get('progressive'):
+                    return rag_pipeline_progressive(user_message, session=session, filters=filters, deadline=deadline)
+                return rag_pipeline(user_message, session=session, filters=filters, deadline=deadline), None
         
         # Process with RAG pipeline
         try:
             # Generate response using RAG pipeline
-            response = rag_pipeline(enhanced_message)
-            print(f"RAG pipeline response received (preview): {response[:100]}...")
+            if profiling:
+                try:
+                    (response, refine), profile = profile_call(answer)
+                    profile['flamegraphUrl'] = f"/api/admin/profiles/{profile['profileId']}.folded"
+                except ProfilerBusy as e:
+                    HTTP_REQUESTS.inc(endpoint="/api/chat", status="409")
+                    return jsonify({'error': str(e)}), 409
+            else:
+                response, refine = answer()
+            if refine is not None:
+                refinement = refinement_store.submit(lambda: run_refinement(refine))
+            logger.debug("RAG pipeline response received (preview): %s...", response[:100])
             
             # Ensure the response has a proper Sources section
             response = ensure_sources_section(response)
             
+        except Overloaded as e:
+            logger.warning("Shed %s /api/chat request: %s", priority, e)
+            HTTP_REQUESTS.inc(endpoint="/api/chat", status="503")
+            resp = jsonify({'error': f"Server is busy: {e}", 'priority': priority, 'retryAfter': e.retry_after})
+            resp.headers['Retry-After'] = str(e.retry_after)
+            return resp, 503
         except Exception as rag_error:
-            print(f"Error in RAG pipeline: {rag_error}")
+            logger.exception("Error in RAG pipeline: %s", rag_error)
             response = f"I encountered an error processing your request: {str(rag_error)}"
         
         # Calculate processing time
-        processing_time = round(time.time() - start_time, 2)
-        print(f"Processing time: {processing_time}s")
+        elapsed = time.time() - start_time
+        processing_time = round(elapsed, 2)
+        logger.info("Processed /api/chat in %ss", processing_time)
+        HTTP_LATENCY.observe(elapsed, endpoint="/api/chat")
+        HTTP_REQUESTS.inc(endpoint="/api/chat", status="200")
         
-        return jsonify({
+        result = {
             'response': response,
-            'processingTime': processing_time
-        })
+            'processingTime': processing_time,
+            'sessionId': session.id,
+            'priority': priority,
+            'queueTime': round(admission.get('waited', 0.0), 3)
+        }
+        if admission.get('degraded'):
+            result['degraded'] = True
+        if refinement is not None:
+            result['refinementId'] = refinement.id
+            result['refinementStatus'] = refinement.status
+        if profile is not None:
+            result['profile'] = profile
+        return jsonify(result)
     
     except Exception as e:
-        print(f"Error in /api/chat: {e}")
+        logger.exception("Error in /api/chat: %s", e)
+        HTTP_REQUESTS.inc(endpoint="/api/chat", status="500")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/chat/refinement/<refinement_id>', methods=['GET'])
+def get_refinement(refinement_id):
+    """
+    Status of a progressive answer's refinement: pending, done (with the refined
+    response) or failed. ?wait=<seconds> blocks until it finishes or the wait runs out.
+    """
+    refinement = refinement_store.get(refinement_id)
+    if refinement is None:
+        HTTP_REQUESTS.inc(endpoint="/api/chat/refinement", status="404")
+        return jsonify({'error': 'Unknown or expired refinement'}), 404
+    
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0.0), REFINE_MAX_WAIT)
+    except ValueError:
+        HTTP_REQUESTS.inc(endpoint="/api/chat/refinement", status="400")
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    if wait:
+        refinement.wait(wait)
+    
+    HTTP_REQUESTS.inc(endpoint="/api/chat/refinement", status="200")
+    return jsonify(refinement.to_dict())
+
+@app.route('/api/admin/profiles/<profile_id>.folded', methods=['GET'])
+def download_profile(profile_id):
+    """
+    Folded stacks of a profiled /api/chat request, for flamegraph.pl or speedscope (admins only)
+    """
+    if not is_admin(request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Admins only'}), 403
+    path = folded_path(profile_id)
+    if path is None:
+        return jsonify({'error': 'Unknown profile'}), 404
+    return send_file(path.resolve(), mimetype='text/plain', as_attachment=True, download_name=f"{profile_id}.folded")
+
+@app.route('/api/chat/session/<session_id>', methods=['DELETE'])
+def end_session(session_id):
+    """
+    Drop a conversation session and its cached contexts
+    """
+    if session_store.delete(session_id):
+        return jsonify({'status': 'deleted'})
+    return jsonify({'error': 'Unknown or expired session'}), 404
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Answer many questions in one call. Body: {"messages": [...], "stream": true, "concurrency": 4}
+    where each message is a string or an object with message / aircraftModel / issueCategory.
+    
+    With stream (the default) results are sent as newline-delimited JSON as each item
+    finishes, followed by a summary line. Otherwise one JSON document is returned with
+    the results in input order.
+    
+    Each item is answered in a scheduler slot of the background class, so a batch never
+    takes capacity from interactive requests; items the scheduler sheds come back with
+    an error and retryAfter.
+    """
+    data = request.json
+    messages = data.get('messages') if data else None
+    
+    if not isinstance(messages, list) or not messages:
+        HTTP_REQUESTS.inc(endpoint="/api/chat/batch", status="400")
+        return jsonify({'error': 'No messages provided'}), 400
+    if len(messages) > BATCH_MAX_SIZE:
+        HTTP_REQUESTS.inc(endpoint="/api/chat/batch", status="400")
+        return jsonify({'error': f'Batch too large (max {BATCH_MAX_SIZE} messages)'}), 400
+    
+    questions = []
+    filters = []
+    for item in messages:
+        item_filters = {}
+        if isinstance(item, dict):
+            item_message = item.get('message')
+            try:
+                item_filters = parse_facet_filters(item.get('aircraftModel'), item.get('issueCategory'))
+            except ValueError as e:
+                HTTP_REQUESTS.inc(endpoint="/api/chat/batch", status="400")
+                return jsonify({'error': str(e)}), 400
+        else:
+            item_message = item
+        if not isinstance(item_message, str) or not item_message.strip():
+            HTTP_REQUESTS.inc(endpoint="/api/chat/batch", status="400")
+            return jsonify({'error': 'Every batch item needs a non-empty message'}), 400
+        questions.append(item_message)
+        filters.append(item_filters)
+    
+    try:
+        concurrency = min(max(int(data.get('concurrency', BATCH_MAX_CONCURRENCY)), 1), BATCH_MAX_CONCURRENCY)
+    except (TypeError, ValueError):
+        HTTP_REQUESTS.inc(endpoint="/api/chat/batch", status="400")
+        return jsonify({'error': 'concurrency must be an integer'}), 400
+    
+    logger.info("Batch of %d questions (concurrency %d)", len(questions), concurrency)
+    HTTP_REQUESTS.inc(endpoint="/api/chat/batch", status="200")
+    
+    def results():
+        start_time = time.time()
+        for item in rag_pipeline_batch(questions, concurrency, filters, lambda: scheduler.admit(BACKGROUND_PRIORITY)):
+            if item.get("response"):
+                item["response"] = ensure_sources_section(item["response"])
+            yield item
+        HTTP_LATENCY.observe(time.time() - start_time, endpoint="/api/chat/batch")
+    
+    if data.get('stream', True):
+        return Response((json.dumps(item) + "\n" for item in results()), mimetype='application/x-ndjson')
+    
+    items = list(results())
+    summary = items.pop()
+    return jsonify({
+        'results': sorted(items, key=lambda item: item['index']),
+        'summary': summary
+    })
+
+@app.route('/api/suggest-actions', methods=['POST'])
+def suggest_actions():
+    """
+    Most common corrective actions for a problem description, served from the
+    precomputed neighbor graph: one embedding plus a lookup, no LLM call
+    """
+    start_time = time.time()
+    data = request.json
+    
+    if not data or not str(data.get('problem', '')).strip():
+        HTTP_REQUESTS.inc(endpoint="/api/suggest-actions", status="400")
+        return jsonify({'error': 'No problem description provided'}), 400
+    if action_recommender is None:
+        HTTP_REQUESTS.inc(endpoint="/api/suggest-actions", status="503")
+        return jsonify({'error': 'Action graph not built. Run: python action_recommender.py'}), 503
+    
+    try:
+        limit = min(max(int(data.get('limit', 5)), 1), 20)
+    except (TypeError, ValueError):
+        HTTP_REQUESTS.inc(endpoint="/api/suggest-actions", status="400")
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    result = action_recommender.suggest(embed_query(data['problem']), limit)
+    elapsed = time.time() - start_time
+    HTTP_LATENCY.observe(elapsed, endpoint="/api/suggest-actions")
+    HTTP_REQUESTS.inc(endpoint="/api/suggest-actions", status="200")
+    result['processingTime'] = round(elapsed, 4)
+    return jsonify(result)
+
+def int_arg(name, default, low, high):
+    """Read an integer query parameter clamped to [low, high]; raises ValueError if malformed"""
+    return min(max(int(request.args.get(name, default)), low), high)
+
+def analytics_response(endpoint, build):
+    """Shared checks and metrics for the analytics endpoints"""
+    start_time = time.time()
+    if not analytics_store.available():
+        HTTP_REQUESTS.inc(endpoint=endpoint, status="503")
+        return jsonify({'error': 'Analytics store is empty. Run: python analytics.py ingest maintenance_logs.csv'}), 503
+    try:
+        result = build()
+    except ValueError as e:
+        HTTP_REQUESTS.inc(endpoint=endpoint, status="400")
+        return jsonify({'error': str(e)}), 400
+    elapsed = time.time() - start_time
+    HTTP_LATENCY.observe(elapsed, endpoint=endpoint)
+    HTTP_REQUESTS.inc(endpoint=endpoint, status="200")
+    return jsonify(result)
+
+def category_arg():
+    value = request.args.get('category')
+    category = normalize_category(value)
+    if value and category is None:
+        raise ValueError(f"Unknown category: {value}")
+    return category
+
+@app.route('/api/analytics/summary', methods=['GET'])
+def analytics_summary():
+    """
+    Issue counts by category and weekly totals for the Dashboard charts
+    """
+    return analytics_response(
+        "/api/analytics/summary",
+        lambda: analytics_store.summary(int_arg('weeks', 8, 1, 104))
+    )
+
+@app.route('/api/analytics/top-problems', methods=['GET'])
+def analytics_top_problems():
+    """
+    Most frequently recurring problems, optionally within one issue category
+    """
+    def build():
+        category = category_arg()
+        return {
+            'category': category,
+            'problems': analytics_store.top_problems(int_arg('limit', 10, 1, 100), category),
+        }
+    return analytics_response("/api/analytics/top-problems", build)
+
+@app.route('/api/analytics/trends', methods=['GET'])
+def analytics_trends():
+    """
+    Weekly issue counts, total and per category
+    """
+    return analytics_response(
+        "/api/analytics/trends",
+        lambda: analytics_store.trends(int_arg('weeks', 12, 1, 104), category_arg())
+    )
+
+@app.route('/api/logs', methods=['GET'])
+def list_logs():
+    """
+    Maintenance logs for ValidateLogs and LogWriting, newest first, with keyset
+    pagination: pass the returned nextCursor as ?cursor= to get the next page.
+    Query: ?limit=&cursor=&order=desc|asc&q=&category=&aircraftModel=&dateFrom=&dateTo=
+    """
+    start_time = time.time()
+    try:
+        limit = int_arg('limit', LOGS_PAGE_DEFAULT, 1, LOGS_PAGE_MAX)
+    except ValueError:
+        HTTP_REQUESTS.inc(endpoint="/api/logs", status="400")
+        return jsonify({'error': 'limit must be an integer'}), 400
+    try:
+        result = log_store.page(
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            order=request.args.get('order', 'desc'),
+            q=request.args.get('q'),
+            category=request.args.get('category'),
+            aircraft_model=request.args.get('aircraftModel'),
+            date_from=request.args.get('dateFrom'),
+            date_to=request.args.get('dateTo'),
+        )
+    except InvalidCursor as e:
+        HTTP_REQUESTS.inc(endpoint="/api/logs", status="400")
+        return jsonify({'error': f"Invalid cursor: {e}"}), 400
+    except ValueError as e:
+        HTTP_REQUESTS.inc(endpoint="/api/logs", status="400")
+        return jsonify({'error': str(e)}), 400
+    elapsed = time.time() - start_time
+    HTTP_LATENCY.observe(elapsed, endpoint="/api/logs")
+    HTTP_REQUESTS.inc(endpoint="/api/logs", status="200")
+    result['processingTime'] = round(elapsed, 4)
+    return jsonify(result)
+
+@app.route('/api/autocomplete', methods=['GET'])
+def autocomplete_endpoint():
+    """
+    Completions for a partially typed problem or action, drawn from the historical
+    maintenance logs and ranked by how often they occur. Query: ?q=&field=problem|action&limit=
+    """
+    start_time = time.time()
+    field = request.args.get('field', 'problem')
+    if field not in AUTOCOMPLETE_FIELDS:
+        HTTP_REQUESTS.inc(endpoint="/api/autocomplete", status="400")
+        return jsonify({'error': f"field must be one of: {', '.join(AUTOCOMPLETE_FIELDS)}"}), 400
+    try:
+        limit = int_arg('limit', 10, 1, 50)
+    except ValueError:
+        HTTP_REQUESTS.inc(endpoint="/api/autocomplete", status="400")
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    query = request.args.get('q', '')
+    suggestions = autocomplete.complete(query, field, limit)
+    elapsed = time.time() - start_time
+    HTTP_LATENCY.observe(elapsed, endpoint="/api/autocomplete")
+    HTTP_REQUESTS.inc(endpoint="/api/autocomplete", status="200")
+    return jsonify({
+        'query': query,
+        'field': field,
+        'suggestions': suggestions,
+        'processingTime': round(elapsed, 4)
+    })
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """
-    Simple health check endpoint to verify the server is running
+    Simple health check endpoint to verify the server is running.
+    Also reports the circuit breaker of each external dependency; the status is
+    'degraded' while any of them is not closed. 'scheduler' shows the requests
+    running and the queue depth and oldest wait of each priority class.
     """
+    breakers = {breaker.name: breaker.snapshot() for breaker in BREAKERS}
+    degraded = any(b['state'] != 'closed' for b in breakers.values())
     return jsonify({
-        'status': 'ok',
-        'message': 'Flask API is running with RAG pipeline integration'
+        'status': 'degraded' if degraded else 'ok',
+        'message': 'Flask API is running with RAG pipeline integration',
+        'breakers': breakers,
+        'scheduler': scheduler.snapshot()
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Pipeline metrics (stage latencies, cache hits, web search usage, Groq errors)
+    in the Prometheus text exposition format
+    """
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == "__main__":
     port = int(os.environ.get('PORT', 5000))
     print(f"Starting Flask server with RAG pipeline on port {port}...")
     print(f"Server will receive messages from frontend running at http://localhost:5173")
     print(f"Health check available at: http://localhost:{port}/api/health")
+    print(f"Metrics available at: http://localhost:{port}/api/metrics")
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
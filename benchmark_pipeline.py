@@ -0,0 +1,244 @@
+"""
+Offline per-stage latency benchmark for rag_pipeline.
+
+Loads maintenance_logs.csv and acn.json into an in-memory Qdrant, points the
+pipeline at local Groq / search stubs with configurable latency, runs a set of
+questions and reports p50/p95/p99 per stage and end to end.
+
+    python benchmark_pipeline.py --queries 50 --groq-latency 0.8 --search-latency 0.4
+    python benchmark_pipeline.py --baseline bench_results/pipeline_<previous>.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import platform
+import contextlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from stub_servers import groq_stub, search_stub
+
+
+LOGS_CSV = Path("maintenance_logs.csv")
+ACN_JSON = Path("acn.json")
+RESULTS_DIR = Path("bench_results")
+STAGES = ["embed_query", "retrieve_contexts", "generate_search_query", "web_search", "generate_answer"]
+PERCENTILES = [50, 95, 99]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark for rag_pipeline (offline).")
+    parser.add_argument("--queries", type=int, default=30, help="Number of benchmark questions")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed warm-up questions")
+    parser.add_argument("--logs-limit", type=int, default=None, help="Only load the first N log rows")
+    parser.add_argument("--groq-latency", type=float, default=0.5, help="Stub Groq latency in seconds")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="Stub search latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Uniform +/- jitter added to stub latency")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=None, help="Where to write the JSON results")
+    parser.add_argument("--baseline", type=Path, default=None, help="Previous results file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    return parser.parse_args()
+
+
+def configure_environment(groq_url, search_url):
+    """Point rag_pipeline at the in-memory Qdrant, a scratch payload store and the stubs."""
+    os.environ["QDRANT_URL"] = ":memory:"
+    os.environ.setdefault("QDRANT_API_KEY", "benchmark")
+    os.environ["GROQ_API_KEY"] = "benchmark"
+    os.environ["GROQ_API_URL"] = groq_url
+    os.environ["WEB_SEARCH_URL"] = search_url
+    scratch = tempfile.mkdtemp(prefix="bench_")
+    os.environ["PAYLOAD_STORE_PATH"] = os.path.join(scratch, "payloads.sqlite")
+    os.environ["PAGE_CACHE_DIR"] = os.path.join(scratch, "page_cache")
+    # The stubs have no quota, so don't let the client-side Groq limiter skew timings unless asked to
+    os.environ.setdefault("GROQ_RPM_LIMIT", "0")
+    os.environ.setdefault("GROQ_TPM_LIMIT", "0")
+
+
+def load_corpus(rp, logs_limit=None):
+    """Embed the logs and ACN sections and load them the same way the loaders do."""
+    from qdrant_client.http.models import Distance, VectorParams, PointStruct
+    from load_acns import clean_text, extract_synopsis
+    from facets import acn_facets, log_facets, create_facet_indexes
+    from dedupe import dedupe_sections
+    from context_compression import sentence_fields
+
+    dim = rp.embedder.get_sentence_embedding_dimension()
+
+    df = pd.read_csv(LOGS_CSV).fillna("")
+    if logs_limit:
+        df = df.head(logs_limit)
+    with open(ACN_JSON, encoding="utf-8") as f:
+        sections = json.load(f)
+    sections, _ = dedupe_sections(sections, lambda sec: clean_text(sec["text"]))
+
+    corpora = {
+        rp.COLLECTION_1: [
+            (i, f"Problem: {row.processed_problem}\nAction: {row.processed_action}",
+             {"source": "csv", "csv_row": int(row.Index), **log_facets(row.processed_problem, row.processed_action)},
+             {"problem": row.processed_problem, "action": row.processed_action})
+            for i, row in enumerate(df.itertuples())
+        ],
+        rp.COLLECTION_2: [
+            (i, clean_text(sec["text"]), {"acn": sec["acn"], "duplicate_acns": sec["duplicate_acns"], **acn_facets(sec["text"], clean_text(sec["text"]))},
+             {"text_chunk": clean_text(sec["text"]), "synp": extract_synopsis(sec["text"])})
+            for i, sec in enumerate(sections)
+        ],
+    }
+
+    fields = sentence_fields(
+        [sec["text"] for sec in sections],
+        lambda sents: rp.embedder.encode(sents, batch_size=64, normalize_embeddings=True),
+        clean=clean_text
+    )
+    for row, extra in zip(corpora[rp.COLLECTION_2], fields):
+        row[3].update(extra)
+
+    for coll, rows in corpora.items():
+        print(f"Embedding {len(rows)} points for '{coll}'...")
+        vectors = rp.embedder.encode([r[1] for r in rows], batch_size=64, normalize_embeddings=True)
+        rp.qdrant.recreate_collection(
+            collection_name=coll,
+            vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
+        )
+        create_facet_indexes(rp.qdrant, coll)
+        points = [PointStruct(id=r[0], vector=v.tolist(), payload=r[2]) for r, v in zip(rows, vectors)]
+        for i in range(0, len(points), 256):
+            rp.qdrant.upsert(collection_name=coll, points=points[i:i + 256])
+        rp.payload_store.put_many(coll, ((r[0], r[3]) for r in rows))
+
+    return df, sections
+
+
+def build_questions(df, sections, n, seed):
+    """Mix log problems and ACN synopses into a list of technician-style questions."""
+    from load_acns import extract_synopsis
+
+    rng = random.Random(seed)
+    problems = [p for p in df["processed_problem"].unique() if len(p.split()) >= 3]
+    synopses = [s.split(".")[0] for s in (extract_synopsis(sec["text"]) for sec in sections) if s]
+
+    questions = []
+    for i in range(n):
+        if i % 3 == 2 and synopses:
+            questions.append(f"What should be done when {rng.choice(synopses).strip().lower()}?")
+        else:
+            questions.append(f"How do I fix: {rng.choice(problems)}")
+    return questions
+
+
+def instrument(rp, timings):
+    """Wrap each pipeline stage so its wall time is appended to timings[stage]."""
+    def wrap(name, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timings.setdefault(name, []).append(time.perf_counter() - start)
+        return timed
+
+    for name in STAGES:
+        setattr(rp, name, wrap(name, getattr(rp, name)))
+
+
+def summarize(samples):
+    """Latency summary in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    arr = np.asarray(samples) * 1000.0
+    summary = {"count": int(arr.size), "mean_ms": round(float(arr.mean()), 2)}
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = round(float(np.percentile(arr, p)), 2)
+    summary["max_ms"] = round(float(arr.max()), 2)
+    return summary
+
+
+def print_report(report, baseline=None):
+    rows = [("end_to_end", report["end_to_end"])] + list(report["stages"].items())
+    print(f"\n{'stage':<24}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+    for name, s in rows:
+        if not s.get("count"):
+            print(f"{name:<24}{0:>7}{'-':>11}{'-':>11}{'-':>11}")
+            continue
+        line = f"{name:<24}{s['count']:>7}{s['p50_ms']:>11.1f}{s['p95_ms']:>11.1f}{s['p99_ms']:>11.1f}"
+        if baseline:
+            base = baseline["end_to_end"] if name == "end_to_end" else baseline["stages"].get(name, {})
+            if base.get("count"):
+                line += f"   (p50 {s['p50_ms'] - base['p50_ms']:+.1f}, p95 {s['p95_ms'] - base['p95_ms']:+.1f})"
+        print(line)
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+
+    with groq_stub(args.groq_latency, args.jitter) as groq, search_stub(args.search_latency, args.jitter) as search:
+        configure_environment(f"{groq.base_url}/openai/v1/chat/completions", f"{search.base_url}/search")
+
+        import rag_pipeline as rp
+
+        df, sections = load_corpus(rp, args.logs_limit)
+        questions = build_questions(df, sections, args.warmup + args.queries, args.seed)
+
+        timings = {}
+        instrument(rp, timings)
+        sink = None if args.verbose else io.StringIO()
+
+        print(f"Running {args.warmup} warm-up and {args.queries} timed questions...")
+        end_to_end = []
+        for i, question in enumerate(questions):
+            if i == args.warmup:
+                timings.clear()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(sink) if sink else contextlib.nullcontext():
+                rp.rag_pipeline(question)
+            if i >= args.warmup:
+                end_to_end.append(time.perf_counter() - start)
+            if sink:
+                sink.seek(0)
+                sink.truncate()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "queries": args.queries,
+            "warmup": args.warmup,
+            "logs_loaded": int(len(df)),
+            "acn_loaded": len(sections),
+            "groq_latency_s": args.groq_latency,
+            "search_latency_s": args.search_latency,
+            "jitter_s": args.jitter,
+            "seed": args.seed,
+            "groq_model": rp.GROQ_MODEL,
+            "router_enabled": rp.ROUTER_ENABLED,
+        },
+        "environment": {"python": sys.version.split()[0], "platform": platform.platform()},
+        "end_to_end": summarize(end_to_end),
+        "stages": {name: summarize(timings.get(name, [])) for name in STAGES},
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = args.output or RESULTS_DIR / f"pipeline_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+REST vs gRPC latency benchmark against a running Qdrant server.
+
+Creates a scratch collection of random vectors, then for each transport times
+bulk upserts (per batch) and searches (sequential and from concurrent threads)
+and reports p50/p95/p99. The scratch collection is dropped afterwards.
+
+    python benchmark_qdrant.py --points 20000 --queries 300 --concurrency 8
+    python benchmark_qdrant.py --channels 4   # gRPC spread over 4 channels
+"""
+
+import sys
+import json
+import time
+import uuid
+import argparse
+import warnings
+import platform
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from qdrant_client.http.models import Distance, VectorParams, PointStruct
+
+import qdrant_access
+from qdrant_access import ChannelPool, make_client
+from benchmark_pipeline import summarize
+
+RESULTS_DIR = Path("bench_results")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare Qdrant REST and gRPC latency for searches and bulk upserts.")
+    parser.add_argument("--points", type=int, default=10000, help="Vectors upserted into the scratch collection")
+    parser.add_argument("--dim", type=int, default=384, help="Vector dimension (384 = all-MiniLM-L6-v2)")
+    parser.add_argument("--batch", type=int, default=256, help="Points per upsert request")
+    parser.add_argument("--queries", type=int, default=200, help="Searches per transport and mode")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8, help="Threads for the concurrent search run")
+    parser.add_argument("--channels", type=int, default=qdrant_access.QDRANT_GRPC_CHANNELS, help="gRPC channels for the concurrent run")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", type=Path, default=None)
+    return parser.parse_args()
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def bench_upserts(client, coll, vectors, batch):
+    """Upsert all vectors batch by batch; returns the per-batch latencies."""
+    latencies = []
+    for start in range(0, len(vectors), batch):
+        points = [PointStruct(id=i, vector=vectors[i].tolist(), payload={"n": i})
+                  for i in range(start, min(start + batch, len(vectors)))]
+        latencies.append(timed(client.upsert, collection_name=coll, points=points, wait=True))
+    return latencies
+
+
+def bench_searches(client, coll, queries, top_k, concurrency=1):
+    """Search every query, from `concurrency` threads; returns per-search latencies and wall time."""
+    def one(q):
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=DeprecationWarning)
+            return timed(client.search, collection_name=coll, query_vector=q.tolist(), limit=top_k)
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        latencies = [one(q) for q in queries]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(one, queries))
+    return latencies, time.perf_counter() - start
+
+
+def run_transport(name, client, concurrent_client, args, vectors, queries):
+    coll = f"bench_transport_{name}_{uuid.uuid4().hex[:8]}"
+    client.recreate_collection(collection_name=coll, vectors_config=VectorParams(size=args.dim, distance=Distance.COSINE))
+    try:
+        print(f"[{name}] upserting {len(vectors)} points in batches of {args.batch}...")
+        upserts = bench_upserts(client, coll, vectors, args.batch)
+        bench_searches(client, coll, queries[:10], args.top_k)  # warm-up
+        print(f"[{name}] {len(queries)} sequential searches...")
+        sequential, _ = bench_searches(client, coll, queries, args.top_k)
+        print(f"[{name}] {len(queries)} searches from {args.concurrency} threads...")
+        concurrent, wall = bench_searches(concurrent_client, coll, queries, args.top_k, args.concurrency)
+    finally:
+        client.delete_collection(collection_name=coll)
+    return {
+        "upsert_batch": summarize(upserts),
+        "upsert_points_per_s": round(len(vectors) / sum(upserts), 1),
+        "search_sequential": summarize(sequential),
+        "search_concurrent": summarize(concurrent),
+        "search_concurrent_qps": round(len(queries) / wall, 1),
+    }
+
+
+def print_report(report):
+    print(f"\n{'':<26}{'REST':>14}{'gRPC':>14}")
+    rows = [("upsert batch p50 ms", "upsert_batch", "p50_ms"), ("upsert batch p95 ms", "upsert_batch", "p95_ms"),
+            ("search p50 ms", "search_sequential", "p50_ms"), ("search p95 ms", "search_sequential", "p95_ms"),
+            ("search p99 ms", "search_sequential", "p99_ms"),
+            ("concurrent p50 ms", "search_concurrent", "p50_ms"), ("concurrent p95 ms", "search_concurrent", "p95_ms")]
+    for label, section, key in rows:
+        print(f"{label:<26}{report['rest'][section][key]:>14.2f}{report['grpc'][section][key]:>14.2f}")
+    for label, key in [("upsert points/s", "upsert_points_per_s"), ("concurrent searches/s", "search_concurrent_qps")]:
+        print(f"{label:<26}{report['rest'][key]:>14.1f}{report['grpc'][key]:>14.1f}")
+
+
+def main():
+    args = parse_args()
+    if not qdrant_access.QDRANT_URL or qdrant_access.QDRANT_URL == ":memory:":
+        sys.exit("Set QDRANT_URL to a running Qdrant server; the in-memory instance has no transport to compare.")
+
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((args.points, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.choice(args.points, size=args.queries)] + 0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    timeout = qdrant_access.QDRANT_BULK_TIMEOUT
+    rest = make_client(prefer_grpc=False, timeout=timeout)
+    grpc_clients = [make_client(prefer_grpc=True, timeout=timeout) for _ in range(max(1, args.channels))]
+    grpc_pool = grpc_clients[0] if len(grpc_clients) == 1 else ChannelPool(grpc_clients)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "server": qdrant_access.QDRANT_URL,
+        "environment": {"python": sys.version.split()[0], "platform": platform.platform()},
+        "rest": run_transport("rest", rest, rest, args, vectors, queries),
+        "grpc": run_transport("grpc", grpc_clients[0], grpc_pool, args, vectors, queries),
+    }
+    print_report(report)
+
+    output = args.output or RESULTS_DIR / f"qdrant_transport_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
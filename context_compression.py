@@ -0,0 +1,131 @@
+"""
+Sentence-level extractive compression of retrieved contexts.
+
+At ingestion each long document is split into sentences, and every sentence is
+embedded once; the sentences and their embeddings (float16, base64) are stored
+with the point's texts in the payload store. At query time the sentences of all
+retrieved documents are scored against the query vector with one matrix-vector
+product, and each document keeps only its best COMPRESS_SENTENCES sentences,
+in their original order. The prompt shrinks without another model call.
+"""
+
+import os
+import re
+import base64
+import logging
+
+import numpy as np
+
+from metrics import CONTEXT_CHARS
+
+logger = logging.getLogger("context_compression")
+
+COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "true").lower() == "true"
+COMPRESS_SENTENCES = int(os.getenv("COMPRESS_SENTENCES", "5"))  # Sentences kept per retrieved document
+MIN_SENTENCE_WORDS = 6  # Shorter fragments (form fields, headings) are merged with their neighbours
+MAX_SENTENCE_WORDS = 60  # ... until a merged unit reaches about this many words
+OMISSION = " ... "
+SENTENCE_FIELDS = ("sentences", "sentence_vectors")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+
+
+def _collapse(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def split_sentences(text, clean=_collapse):
+    """
+    Split a document into sentence units. Lines and sentence ends are boundaries;
+    runs of short fragments (e.g. "Flight Phase : Parked") are merged into one unit
+    so each unit carries enough words to be scored. `clean` is applied per unit.
+    """
+    pieces = []
+    for line in text.splitlines():
+        for piece in _SENTENCE_END.split(line):
+            piece = clean(piece)
+            if piece:
+                pieces.append(piece)
+
+    units = []
+    current = []
+    for piece in pieces:
+        words = len(piece.split())
+        if current and (words >= MIN_SENTENCE_WORDS or len(" ".join(current).split()) + words > MAX_SENTENCE_WORDS):
+            units.append(" ".join(current))
+            current = []
+        current.append(piece)
+        if words >= MIN_SENTENCE_WORDS:
+            units.append(" ".join(current))
+            current = []
+    if current:
+        units.append(" ".join(current))
+    return units
+
+
+def encode_vectors(vectors):
+    return base64.b64encode(np.asarray(vectors, dtype=np.float16).tobytes()).decode("ascii")
+
+
+def decode_vectors(blob, count):
+    return np.frombuffer(base64.b64decode(blob), dtype=np.float16).reshape(count, -1)
+
+
+def sentence_fields(texts, embed, clean=_collapse):
+    """
+    Payload fields {"sentences", "sentence_vectors"} for each text, with all
+    sentences embedded in one call. `embed` maps a list of strings to normalized vectors.
+    """
+    split = [split_sentences(text, clean) for text in texts]
+    flat = [s for sentences in split for s in sentences]
+    vectors = np.asarray(embed(flat), dtype=np.float32) if flat else np.empty((0, 0), np.float32)
+
+    fields = []
+    start = 0
+    for sentences in split:
+        end = start + len(sentences)
+        fields.append({"sentences": sentences, "sentence_vectors": encode_vectors(vectors[start:end])})
+        start = end
+    return fields
+
+
+def compress_contexts(results, query_embedding, keep=COMPRESS_SENTENCES):
+    """
+    Replace the text of each retrieved context that has stored sentences with its
+    `keep` sentences closest to the query. All sentences of all contexts are scored
+    in a single dot product. Contexts without sentences, or with no more than
+    `keep` of them, are left as they are. Updates `results` in place.
+    """
+    candidates = []
+    for res in results:
+        # Payload dicts can be shared between the queries of a batch, so copy rather than pop
+        payload = res["payload"]
+        sentences, blob = payload.get("sentences"), payload.get("sentence_vectors")
+        res["payload"] = {k: v for k, v in payload.items() if k not in SENTENCE_FIELDS}
+        if sentences and blob and len(sentences) > keep:
+            candidates.append((res, sentences, decode_vectors(blob, len(sentences))))
+    if not candidates:
+        return results
+
+    matrix = np.concatenate([vectors for _, _, vectors in candidates]).astype(np.float32)
+    scores = matrix @ np.asarray(query_embedding, dtype=np.float32)
+
+    start = 0
+    for res, sentences, _ in candidates:
+        doc_scores = scores[start:start + len(sentences)]
+        start += len(sentences)
+        best = sorted(np.argpartition(-doc_scores, keep - 1)[:keep])
+
+        parts = [sentences[best[0]]]
+        for prev, i in zip(best, best[1:]):
+            parts.append((" " if i == prev + 1 else OMISSION) + sentences[i])
+        compressed = "".join(parts)
+
+        synopsis = res["payload"].get("synp")
+        if synopsis:
+            compressed += f"\n\nSynopsis: {synopsis}"
+        CONTEXT_CHARS.inc(len(res["text"]), stage="retrieved")
+        CONTEXT_CHARS.inc(len(compressed), stage="compressed")
+        logger.debug("Compressed context from %d to %d characters", len(res["text"]), len(compressed))
+        res["text"] = compressed
+    return results
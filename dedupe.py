@@ -0,0 +1,155 @@
+"""
+Near-duplicate elimination for ACN sections before they are embedded.
+
+Each section is turned into a set of word shingles and a MinHash signature.
+LSH banding over the signatures proposes candidate pairs, which are kept when
+their exact shingle Jaccard similarity reaches the threshold. Connected groups
+of near-duplicates collapse into one canonical section (the longest) that
+records the ACNs it absorbed.
+
+    python dedupe.py acn.json --threshold 0.8
+"""
+
+import re
+import zlib
+import json
+import argparse
+from pathlib import Path
+from collections import defaultdict
+
+import numpy as np
+
+DEDUPE_THRESHOLD = 0.8  # Jaccard similarity at which two sections count as duplicates
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+LSH_BANDS = 16  # 16 bands x 8 rows: pairs around Jaccard 0.7 and above become candidates
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+def shingles(text: str, k=SHINGLE_WORDS):
+    """Hashed word k-grams of a text, as a uint64 array of unique values."""
+    words = re.findall(r"\w+", text.lower())
+    grams = {" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) & MERSENNE_PRIME for g in grams), dtype=np.uint64))
+
+
+def minhash_params(num_perm=NUM_PERM, seed=1):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash(shingle_hashes, params):
+    """MinHash signature: for each permutation (a*x + b) mod p, the minimum over the shingles."""
+    a, b = params
+    if shingle_hashes.size == 0:
+        return np.full(a.shape, MERSENNE_PRIME, dtype=np.uint64)
+    return ((a[:, None] * shingle_hashes[None, :] + b[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+
+def lsh_candidates(signatures, bands=LSH_BANDS):
+    """Pairs (i, j), i < j, whose signatures agree on every row of at least one band."""
+    rows = signatures.shape[1] // bands
+    candidates = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        chunk = signatures[:, band * rows:(band + 1) * rows]
+        for i, row in enumerate(chunk):
+            buckets[row.tobytes()].append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    candidates.add((members[x], members[y]))
+    return candidates
+
+
+def jaccard(a, b):
+    if a.size == 0 and b.size == 0:
+        return 1.0
+    inter = np.intersect1d(a, b, assume_unique=True).size
+    return inter / (a.size + b.size - inter)
+
+
+def find_duplicate_groups(texts, threshold=DEDUPE_THRESHOLD, bands=LSH_BANDS, num_perm=NUM_PERM):
+    """Groups (lists of indices, each of size > 1) of texts that are near-duplicates of each other."""
+    sets = [shingles(t) for t in texts]
+    params = minhash_params(num_perm)
+    signatures = np.stack([minhash(s, params) for s in sets]) if sets else np.empty((0, num_perm), np.uint64)
+
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in lsh_candidates(signatures, bands):
+        if jaccard(sets[i], sets[j]) >= threshold:
+            parent[find(i)] = find(j)
+
+    groups = defaultdict(list)
+    for i in range(len(texts)):
+        groups[find(i)].append(i)
+    return [sorted(g) for g in groups.values() if len(g) > 1]
+
+
+def dedupe_sections(sections, text_of, threshold=DEDUPE_THRESHOLD):
+    """
+    Collapse near-duplicate ACN sections. `text_of(section)` gives the text compared.
+    Returns (kept_sections, report); each kept section gains a "duplicate_acns" list
+    with the ACNs of the sections folded into it.
+    """
+    texts = [text_of(sec) for sec in sections]
+    groups = find_duplicate_groups(texts, threshold)
+
+    dropped = set()
+    kept = [dict(sec, duplicate_acns=[]) for sec in sections]
+    for group in groups:
+        canonical = max(group, key=lambda i: len(texts[i]))
+        for i in group:
+            if i == canonical:
+                continue
+            dropped.add(i)
+            acn = sections[i]["acn"]
+            if acn != sections[canonical]["acn"] and acn not in kept[canonical]["duplicate_acns"]:
+                kept[canonical]["duplicate_acns"].append(acn)
+    kept = [sec for i, sec in enumerate(kept) if i not in dropped]
+
+    before_chars = sum(len(t) for t in texts)
+    after_chars = sum(len(texts[i]) for i in range(len(texts)) if i not in dropped)
+    report = {
+        "threshold": threshold,
+        "sections_before": len(sections),
+        "sections_after": len(kept),
+        "removed": len(dropped),
+        "shrink_pct": round(100.0 * len(dropped) / len(sections), 1) if sections else 0.0,
+        "chars_before": before_chars,
+        "chars_after": after_chars,
+        "groups": [[sections[i]["acn"] for i in group] for group in groups],
+    }
+    return kept, report
+
+
+def print_report(report):
+    print(
+        f"Near-duplicate removal (Jaccard >= {report['threshold']}): "
+        f"{report['sections_before']} -> {report['sections_after']} sections "
+        f"({report['removed']} removed, {report['shrink_pct']}% smaller; "
+        f"{report['chars_before']} -> {report['chars_after']} characters)"
+    )
+    for group in report["groups"]:
+        print(f"  merged ACNs: {', '.join(str(acn) for acn in group)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report near-duplicate ACN sections.")
+    parser.add_argument("path", type=Path, nargs="?", default=Path("acn.json"))
+    parser.add_argument("--threshold", type=float, default=DEDUPE_THRESHOLD)
+    args = parser.parse_args()
+
+    with open(args.path, encoding="utf-8") as f:
+        sections = json.load(f)
+    _, report = dedupe_sections(sections, lambda sec: sec["text"], args.threshold)
+    print_report(report)
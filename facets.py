@@ -0,0 +1,108 @@
+"""
+Search facets tagged onto points at ingestion time.
+
+ACN reports get the aircraft they involve (from their "Make Model Name" fields,
+or model designators mentioned in the text) and every document gets an issue
+category. The values match the frontend's AircraftModel / IssueCategory options
+so /api/chat can pass them straight through as Qdrant filters.
+"""
+
+import re
+
+from issue_categories import classify_issue, normalize_category
+
+AIRCRAFT_MODEL_FIELD = "aircraft_models"
+AIRCRAFT_TYPE_FIELD = "aircraft_types"
+ISSUE_CATEGORY_FIELD = "issue_category"
+
+# Fields that get a keyword payload index in Qdrant
+INDEXED_FIELDS = [AIRCRAFT_MODEL_FIELD, ISSUE_CATEGORY_FIELD]
+
+# Frontend aircraft model -> designators that identify it in report text
+AIRCRAFT_MODEL_PATTERNS = {
+    "Boeing 737": r"B737|Boeing 737|737[ -]?(?:MAX|[1-9]00)",
+    "Airbus A320": r"A3(?:18|19|20|21)(?:neo)?|Airbus A3(?:18|19|20|21)",
+    "Boeing 787": r"B787|Boeing 787|787 Dreamliner",
+    "Airbus A350": r"A350|Airbus A350",
+    "Embraer E190": r"E190|E-190|ERJ[ -]?190|EMB[ -]?190|Embraer 190",
+}
+AIRCRAFT_MODELS = list(AIRCRAFT_MODEL_PATTERNS)
+
+_MODEL_PATTERNS = {
+    model: re.compile(r"\b(?:" + pattern + r")\b", re.IGNORECASE)
+    for model, pattern in AIRCRAFT_MODEL_PATTERNS.items()
+}
+_MAKE_MODEL_LINE = re.compile(r"Make Model Name\s*:\s*([^\n]+)")
+
+# "Make Model Name" values that don't name an aircraft type
+_GENERIC_TYPES = ("commercial fixed wing", "no aircraft", "any unknown")
+
+
+def extract_aircraft_types(text: str):
+    """Raw aircraft types from an ACN's "Make Model Name" fields, in order, without duplicates."""
+    types = []
+    for value in _MAKE_MODEL_LINE.findall(text or ""):
+        value = " ".join(value.split())
+        if value and not value.lower().startswith(_GENERIC_TYPES) and value not in types:
+            types.append(value)
+    return types
+
+
+def extract_aircraft_models(text: str):
+    """Frontend aircraft models mentioned in a report, in AIRCRAFT_MODELS order."""
+    return [model for model, pattern in _MODEL_PATTERNS.items() if pattern.search(text or "")]
+
+
+def normalize_aircraft_model(value):
+    """Map a user-supplied aircraft model (any case) to its canonical name, or None."""
+    if not value:
+        return None
+    for model in AIRCRAFT_MODELS:
+        if model.lower() == str(value).strip().lower():
+            return model
+    return None
+
+
+def acn_facets(raw_text: str, cleaned_text: str):
+    """Facet payload fields for one ACN report."""
+    return {
+        AIRCRAFT_MODEL_FIELD: extract_aircraft_models(raw_text),
+        AIRCRAFT_TYPE_FIELD: extract_aircraft_types(raw_text),
+        ISSUE_CATEGORY_FIELD: classify_issue(cleaned_text),
+    }
+
+
+def log_facets(problem: str, action: str):
+    """Facet payload fields for one maintenance log entry (the logs don't name aircraft)."""
+    return {ISSUE_CATEGORY_FIELD: classify_issue(f"{problem} {action}")}
+
+
+def parse_facet_filters(aircraft_model=None, issue_category=None):
+    """
+    Turn the optional aircraftModel / issueCategory request fields into a
+    {payload field: value} filter dict. Raises ValueError for unknown values.
+    """
+    filters = {}
+    if aircraft_model:
+        model = normalize_aircraft_model(aircraft_model)
+        if model is None:
+            raise ValueError(f"Unknown aircraft model: {aircraft_model}")
+        filters[AIRCRAFT_MODEL_FIELD] = model
+    if issue_category:
+        category = normalize_category(issue_category)
+        if category is None:
+            raise ValueError(f"Unknown issue category: {issue_category}")
+        filters[ISSUE_CATEGORY_FIELD] = category
+    return filters
+
+
+def create_facet_indexes(client, collection_name):
+    """Keyword payload indexes so filtered searches don't scan every point."""
+    from qdrant_client.http.models import PayloadSchemaType
+
+    for field in INDEXED_FIELDS:
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field,
+            field_schema=PayloadSchemaType.KEYWORD,
+        )
@@ -0,0 +1,81 @@
+"""
+Keyword classifier that maps maintenance log text to the issue categories used
+by the frontend (see IssueCategory in maintenance_aircraft_app/src/types).
+"""
+
+import re
+
+ISSUE_CATEGORIES = ["Mechanical", "Electrical", "Hydraulics", "Avionics", "Environmental", "Structural"]
+UNCLASSIFIED = "Unclassified"  # Logs that match no category's terms
+REPORT_CATEGORIES = ISSUE_CATEGORIES + [UNCLASSIFIED]  # Categories reported by the analytics rollups
+DEFAULT_CATEGORY = UNCLASSIFIED
+
+# Terms that point at each category; among the specific systems the one with the most matching terms wins
+CATEGORY_KEYWORDS = {
+    "Mechanical": [
+        "engine", "cylinder", "cylinders", "piston", "rings", "compression", "valve", "valves", "rocker",
+        "lifter", "crankshaft", "camshaft", "crankcase", "oil", "plug", "plugs", "carburetor", "carb",
+        "mixture", "throttle", "idle", "rpm", "prop", "propeller", "spinner", "governor", "exhaust", "muffler",
+        "mount", "mounts", "gasket", "baffle", "baffles", "filter", "cable", "cables", "pulley", "bearing",
+        "bearings", "tire", "tires", "wheel", "wheels", "gear", "tailwheel", "fuel", "pump", "primer",
+    ],
+    "Electrical": [
+        "electrical", "magneto", "magnetos", "mag", "mags", "wire", "wires", "wiring", "harness", "battery",
+        "alternator", "generator", "starter", "breaker", "fuse", "voltage", "volt", "volts", "amp", "amps",
+        "ammeter", "light", "lights", "bulb", "switch", "relay",
+    ],
+    "Hydraulics": [
+        "hydraulic", "hydraulics", "brake", "brakes", "strut", "struts", "actuator", "reservoir",
+        "caliper", "master cylinder", "fluid", "shimmy", "oleo",
+    ],
+    "Avionics": [
+        "avionics", "radio", "radios", "transponder", "gps", "autopilot", "nav", "com", "comm", "display",
+        "eicas", "instrument", "instruments", "gauge", "gauges", "indicator", "tach", "tachometer",
+        "annunciator", "altimeter", "pitot", "static", "egt", "cht", "antenna", "intercom",
+    ],
+    "Environmental": [
+        "cabin", "heater", "heat", "scat", "defrost", "vent", "ventilation", "pressurization",
+        "air conditioning", "oxygen", "climate", "blower", "muff",
+    ],
+    "Structural": [
+        "structural", "rivet", "rivets", "corrosion", "corroded", "skin", "spar", "fuselage", "wing",
+        "cowl", "cowling", "fairing", "dent", "dented", "rib", "stringer", "bulkhead", "firewall",
+        "door", "window", "windshield", "hinge",
+    ],
+}
+
+_PATTERNS = {
+    category: re.compile(r"\b(" + "|".join(re.escape(k) for k in keywords) + r")\b", re.IGNORECASE)
+    for category, keywords in CATEGORY_KEYWORDS.items()
+}
+
+
+def classify_issue(text: str) -> str:
+    """
+    Return the best matching issue category for a problem/action text. The specific
+    systems are checked first, since engine, oil and gear terms show up in most logs
+    as context; Mechanical is the fallback when only its terms match, and
+    UNCLASSIFIED when nothing does.
+    """
+    if not text:
+        return DEFAULT_CATEGORY
+    best, best_hits = None, 0
+    for category, pattern in _PATTERNS.items():
+        if category == "Mechanical":
+            continue
+        hits = len(pattern.findall(text))
+        if hits > best_hits:
+            best, best_hits = category, hits
+    if best is not None:
+        return best
+    return "Mechanical" if _PATTERNS["Mechanical"].search(text) else DEFAULT_CATEGORY
+
+
+def normalize_category(value):
+    """Map a user-supplied category (any case) to its canonical name, or None."""
+    if not value:
+        return None
+    for category in REPORT_CATEGORIES:
+        if category.lower() == str(value).strip().lower():
+            return category
+    return None
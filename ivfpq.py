@@ -0,0 +1,381 @@
+"""
+In-process approximate nearest-neighbor index: IVF coarse partitions plus
+product-quantized residuals, in NumPy.
+
+Vectors are assigned to the nearest of `nlist` k-means centroids; the residual
+(vector - centroid) is split into `m` subvectors, each stored as a one-byte code
+into a 256-entry codebook. A 384-dim float32 embedding (1.5 KB) becomes m bytes
+of codes plus its id. A search ranks the `nprobe` closest partitions and scores
+their codes with one lookup table per query, so cost grows with nprobe rather
+than with the collection size.
+
+PQ scores alone are coarse (recall@10 levels off near 0.58 however many
+partitions are scanned), so a search returns a shortlist of IVF_RERANK_FACTOR
+times the requested results, and the caller rescores it exactly with `rerank`
+against the stored vectors.
+
+The arrays are saved as .npy files and memory-mapped on load, so an index over
+millions of log rows doesn't need to fit in RAM. Indexes are saved under the
+versioned collection they were built from (LOCAL_INDEX_DIR/acn_v20261019T131500),
+not the alias, so an index never answers for a version it doesn't describe;
+reindex.py builds one for each new version that replaces an indexed one.
+
+    python ivfpq.py build --collection aircraft_maintenance_logs
+    python ivfpq.py report --synthetic 200000
+    python ivfpq.py report --collection aircraft_maintenance_logs
+"""
+
+import os
+import json
+import time
+import uuid
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR")  # Directory of per-collection indexes; unset disables the local index
+IVF_NLIST = 0  # Partitions; 0 picks about sqrt(n)
+PQ_SUBQUANTIZERS = 48  # Bytes of code per vector (must divide the embedding dimension)
+PQ_CENTROIDS = 256  # One-byte codes
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))  # Partitions scanned per query
+IVF_RERANK_FACTOR = int(os.getenv("IVF_RERANK_FACTOR", "10"))  # Shortlisted candidates per requested result, rescored exactly
+KMEANS_ITERS = 20
+PQ_KMEANS_ITERS = 10  # Codebooks converge quickly; training them dominates build time
+KMEANS_SAMPLE = 100_000  # Training rows used for the coarse k-means
+PQ_TRAIN_SAMPLE = 32_768  # Training rows used for each PQ codebook
+ASSIGN_CHUNK = 65_536  # Rows per block when assigning / encoding
+RESULTS_DIR = Path("bench_results")
+
+
+def _nearest(x, centroids, chunk=ASSIGN_CHUNK):
+    """Index of the nearest centroid (L2) for every row of x."""
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), chunk):
+        block = np.asarray(x[start:start + chunk], dtype=np.float32)
+        out[start:start + chunk] = np.argmax(block @ centroids.T - half_norms, axis=1)
+    return out
+
+
+def kmeans(x, k, iters=KMEANS_ITERS, seed=0):
+    """Lloyd's k-means; empty clusters are reseeded from random rows."""
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    centroids = x[rng.choice(len(x), size=k, replace=len(x) < k)].copy()
+    for _ in range(iters):
+        assign = _nearest(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.add.reduceat(x[order], starts[~empty], axis=0)
+        centroids[~empty] = sums / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), size=int(empty.sum()))]
+    return centroids
+
+
+def encode_ids(ids):
+    """Ids as an int64 array, or as 16-byte rows for UUID strings. Returns (array, id_type)."""
+    ids = list(ids)
+    if all(isinstance(i, (int, np.integer)) for i in ids):
+        return np.asarray(ids, dtype=np.int64), "int"
+    return np.frombuffer(b"".join(uuid.UUID(str(i)).bytes for i in ids), dtype=np.uint8).reshape(-1, 16), "uuid"
+
+
+def decode_id(ids, row, id_type):
+    if id_type == "int":
+        return int(ids[row])
+    return str(uuid.UUID(bytes=bytes(ids[row])))
+
+
+class IVFPQIndex:
+    """Inner-product search over L2-normalized vectors with IVF partitions and PQ codes."""
+
+    def __init__(self, centroids, codebooks, codes, ids, offsets, id_type="int"):
+        self.centroids = centroids  # nlist x dim
+        self.codebooks = codebooks  # m x 256 x dsub
+        self.codes = codes  # n x m uint8, grouped by partition
+        self.ids = ids  # n (int64) or n x 16 (uuid bytes)
+        self.offsets = offsets  # nlist + 1, partition p is codes[offsets[p]:offsets[p + 1]]
+        self.id_type = id_type
+        self.centroid_half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+
+    @classmethod
+    def build(cls, vectors, ids, nlist=IVF_NLIST, m=PQ_SUBQUANTIZERS, seed=0):
+        """Train the coarse and product quantizers on (a sample of) the vectors and encode them all."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n, dim = vectors.shape
+        if dim % m:
+            raise ValueError(f"dimension {dim} is not divisible by {m} subquantizers")
+        nlist = nlist or max(1, min(int(np.sqrt(n)), n // 39 or 1))
+        dsub = dim // m
+
+        # Up to 256 training rows per partition is plenty for the coarse quantizer
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n, size=min(n, KMEANS_SAMPLE), replace=False)]
+        centroids = kmeans(sample[:256 * nlist], nlist, seed=seed)
+
+        pq_sample = sample[:PQ_TRAIN_SAMPLE]
+        residuals = pq_sample - centroids[_nearest(pq_sample, centroids)]
+        codebooks = np.stack([
+            kmeans(residuals[:, j * dsub:(j + 1) * dsub], PQ_CENTROIDS, iters=PQ_KMEANS_ITERS, seed=seed + j + 1)
+            for j in range(m)
+        ])
+
+        assign = _nearest(vectors, centroids)
+        codes = np.empty((n, m), dtype=np.uint8)
+        for start in range(0, n, ASSIGN_CHUNK):
+            block = vectors[start:start + ASSIGN_CHUNK] - centroids[assign[start:start + ASSIGN_CHUNK]]
+            for j in range(m):
+                codes[start:start + ASSIGN_CHUNK, j] = _nearest(block[:, j * dsub:(j + 1) * dsub], codebooks[j])
+
+        order = np.argsort(assign, kind="stable")
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=offsets[1:])
+        ids, id_type = encode_ids(ids)
+        return cls(centroids, codebooks, codes[order], ids[order], offsets, id_type)
+
+    def search(self, query, k=10, nprobe=IVF_NPROBE):
+        """Approximate top-k by inner product. Returns (ids, scores), best first."""
+        q = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe, len(self.centroids))
+        coarse = self.centroids @ q
+        probe = np.argpartition(-(coarse - self.centroid_half_norms), nprobe - 1)[:nprobe]
+
+        m, _, dsub = self.codebooks.shape
+        lut = np.einsum("jcd,jd->jc", self.codebooks, q.reshape(m, dsub))  # q . codeword, per subspace
+
+        rows = [np.arange(self.offsets[p], self.offsets[p + 1]) for p in probe]
+        sizes = [len(r) for r in rows]
+        if not sum(sizes):
+            return [], np.empty(0, dtype=np.float32)
+        rows = np.concatenate(rows)
+        base = np.repeat(coarse[probe], sizes)
+        scores = base + lut[np.arange(m), np.asarray(self.codes[rows], dtype=np.intp)].sum(axis=1)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [decode_id(self.ids, rows[i], self.id_type) for i in top], scores[top]
+
+    def bytes_per_vector(self):
+        return self.codes.shape[1] + self.ids.itemsize * (self.ids.shape[1] if self.ids.ndim == 2 else 1)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def save(self, path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ("centroids", "codebooks", "codes", "ids", "offsets"):
+            np.save(path / f"{name}.npy", getattr(self, name))
+        with open(path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"id_type": self.id_type, "count": len(self), "nlist": len(self.centroids),
+                       "m": self.codes.shape[1]}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a saved index; the codes and ids stay memory-mapped."""
+        path = Path(path)
+        with open(path / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        return cls(
+            np.load(path / "centroids.npy"),
+            np.load(path / "codebooks.npy"),
+            np.load(path / "codes.npy", mmap_mode=mode),
+            np.load(path / "ids.npy", mmap_mode=mode),
+            np.load(path / "offsets.npy"),
+            meta["id_type"],
+        )
+
+
+def rerank(ids, vectors, query, k):
+    """Exact top-k of a shortlist by inner product with `query`. Returns (ids, scores), best first."""
+    if not len(ids):
+        return [], np.empty(0, dtype=np.float32)
+    scores = np.asarray(vectors, dtype=np.float32) @ np.asarray(query, dtype=np.float32)
+    top = np.argsort(-scores, kind="stable")[:k]
+    return [ids[i] for i in top], scores[top]
+
+
+def load_local_indexes(collections, base=LOCAL_INDEX_DIR, loaded=None):
+    """
+    {collection: IVFPQIndex} for the (versioned) collections that have a saved index
+    under `base`. Indexes already in `loaded` are reused rather than reopened.
+    """
+    if not base:
+        return {}
+    loaded = loaded or {}
+    return {
+        coll: loaded.get(coll) or IVFPQIndex.load(Path(base) / coll)
+        for coll in collections
+        if (Path(base) / coll / "meta.json").is_file()
+    }
+
+
+def build_local_index(client, collection, base=LOCAL_INDEX_DIR, nlist=IVF_NLIST, m=PQ_SUBQUANTIZERS):
+    """Build and save the index of one Qdrant collection (a versioned name, not an alias) under `base`."""
+    ids, vectors = scroll_vectors(client, collection)
+    index = IVFPQIndex.build(vectors, ids, nlist=nlist, m=m)
+    output = Path(base or "local_index") / collection
+    index.save(output)
+    print(f"Indexed {len(index)} vectors into {len(index.centroids)} partitions "
+          f"({index.bytes_per_vector()} bytes/vector) at {output}")
+    return output
+
+
+def scroll_vectors(client, collection, batch=1024):
+    """All (ids, vectors) of a Qdrant collection."""
+    ids, vectors = [], []
+    offset = None
+    while True:
+        points, offset = client.scroll(collection, limit=batch, offset=offset, with_vectors=True, with_payload=False)
+        for point in points:
+            ids.append(point.id)
+            vectors.append(point.vector)
+        if offset is None:
+            break
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+    return ids, vectors
+
+
+def synthetic_vectors(n, dim=384, latent=32, clusters=1000, seed=0):
+    """
+    Unit vectors standing in for a large embedded log history: a clustered
+    low-dimensional latent space projected up to `dim`, since sentence embeddings
+    have far fewer degrees of freedom than dimensions.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, latent)).astype(np.float32)
+    points = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, latent)).astype(np.float32)
+    projection = rng.standard_normal((latent, dim)).astype(np.float32)
+    vectors = points @ projection + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(range(n)), vectors
+
+
+def recall_report(vectors, ids, queries, k=10, nprobes=(1, 2, 4, 8, 16, 32, 64), nlist=IVF_NLIST, m=PQ_SUBQUANTIZERS,
+                  rerank_factor=IVF_RERANK_FACTOR):
+    """
+    Build an index and compare recall@k and latency per nprobe against exact search,
+    for the PQ scores alone and for a shortlist of k * rerank_factor rescored exactly.
+    """
+    start = time.perf_counter()
+    index = IVFPQIndex.build(vectors, ids, nlist=nlist, m=m)
+    build_s = time.perf_counter() - start
+
+    exact, nearest, exact_ms = [], [], []
+    for q in queries:
+        t = time.perf_counter()
+        scores = vectors @ q
+        top = np.argpartition(-scores, k)[:k]
+        exact_ms.append((time.perf_counter() - t) * 1000)
+        exact.append({ids[i] for i in top})
+        nearest.append(ids[top[np.argmax(scores[top])]])
+
+    row_of = {i: row for row, i in enumerate(ids)}
+    rows = []
+    for nprobe in nprobes:
+        if nprobe > len(index.centroids):
+            break
+        hits, nn_hits, reranked_hits, latencies = 0, 0, 0, []
+        for q, truth, nn in zip(queries, exact, nearest):
+            t = time.perf_counter()
+            found, _ = index.search(q, k, nprobe)
+            latencies.append((time.perf_counter() - t) * 1000)
+            hits += len(truth.intersection(found))
+            nn_hits += nn in found
+            shortlist, _ = index.search(q, k * rerank_factor, nprobe)
+            reranked, _ = rerank(shortlist, vectors[[row_of[i] for i in shortlist]], q, k)
+            reranked_hits += len(truth.intersection(reranked))
+        rows.append({
+            "nprobe": nprobe,
+            f"recall@{k}": round(hits / (k * len(queries)), 4),
+            f"nn_in_top{k}": round(nn_hits / len(queries), 4),
+            f"recall@{k}_reranked": round(reranked_hits / (k * len(queries)), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        })
+
+    return {
+        "vectors": len(vectors),
+        "dim": vectors.shape[1],
+        "nlist": len(index.centroids),
+        "m": index.codes.shape[1],
+        "build_s": round(build_s, 2),
+        "rerank_factor": rerank_factor,
+        "bytes_per_vector": {"float32": vectors.shape[1] * 4, "ivfpq": index.bytes_per_vector()},
+        "exact": {"p50_ms": round(float(np.percentile(exact_ms, 50)), 3),
+                  "p95_ms": round(float(np.percentile(exact_ms, 95)), 3)},
+        "nprobe": rows,
+    }
+
+
+def print_recall_report(report, k):
+    print(f"\n{report['vectors']} vectors, dim {report['dim']}, nlist {report['nlist']}, m {report['m']}, "
+          f"built in {report['build_s']}s")
+    print(f"bytes/vector: {report['bytes_per_vector']['float32']} float32 -> {report['bytes_per_vector']['ivfpq']} IVF-PQ")
+    print(f"exact search: p50 {report['exact']['p50_ms']} ms, p95 {report['exact']['p95_ms']} ms")
+    print(f"reranked: shortlist of {k * report['rerank_factor']} rescored exactly")
+    print(f"\n{'nprobe':>8}{f'recall@{k}':>12}{f'nn in top{k}':>13}{'reranked':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in report["nprobe"]:
+        print(f"{row['nprobe']:>8}{row[f'recall@{k}']:>12.3f}{row[f'nn_in_top{k}']:>13.3f}"
+              f"{row[f'recall@{k}_reranked']:>10.3f}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}")
+
+
+def _qdrant_client():
+    import qdrant_access
+
+    return qdrant_access.get_client(timeout=qdrant_access.QDRANT_BULK_TIMEOUT)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IVF-PQ local index for Qdrant collections.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_cmd = sub.add_parser("build", help="Build an index from a Qdrant collection")
+    build_cmd.add_argument("--collection", required=True)
+    build_cmd.add_argument("--output", type=Path, default=None,
+                           help="Directory the index goes under; defaults to $LOCAL_INDEX_DIR")
+
+    report_cmd = sub.add_parser("report", help="Recall@k vs latency against exact search")
+    source = report_cmd.add_mutually_exclusive_group(required=True)
+    source.add_argument("--collection")
+    source.add_argument("--synthetic", type=int, help="Number of synthetic vectors")
+    report_cmd.add_argument("--queries", type=int, default=200)
+    report_cmd.add_argument("--k", type=int, default=10)
+
+    for cmd in (build_cmd, report_cmd):
+        cmd.add_argument("--nlist", type=int, default=IVF_NLIST)
+        cmd.add_argument("--m", type=int, default=PQ_SUBQUANTIZERS)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        import reindex
+
+        client = _qdrant_client()
+        # Index the version behind the alias, so the server stops using it once the alias moves
+        collection = reindex.current_version(client, args.collection) or args.collection
+        build_local_index(client, collection, args.output or LOCAL_INDEX_DIR, nlist=args.nlist, m=args.m)
+    else:
+        if args.synthetic:
+            ids, vectors = synthetic_vectors(args.synthetic)
+        else:
+            ids, vectors = scroll_vectors(_qdrant_client(), args.collection)
+        rng = np.random.default_rng(1)
+        picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+        # Perturbed copies of stored vectors, so queries aren't exact matches
+        queries = vectors[picks] + 0.05 * rng.standard_normal((len(picks), vectors.shape[1])).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        report = recall_report(vectors, ids, queries, k=args.k, nlist=args.nlist, m=args.m)
+        print_recall_report(report, args.k)
+        RESULTS_DIR.mkdir(exist_ok=True)
+        out = RESULTS_DIR / f"ivfpq_{time.strftime('%Y%m%d-%H%M%S')}.json"
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved report to {out}")
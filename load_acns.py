@@ -7,8 +7,14 @@ from dotenv import load_dotenv
 from tqdm import tqdm
 
 from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams, PointStruct
+from qdrant_client.http.models import PointStruct
+
+from payload_store import PayloadStore
+from facets import acn_facets
+import reindex
+from dedupe import dedupe_sections, print_report
+from context_compression import sentence_fields
+import qdrant_access
 
 # --- CONFIG ---
 load_dotenv()
@@ -53,22 +59,29 @@ def main():
     with open(JSON_PATH, encoding="utf-8") as f:
         sections = json.load(f)
 
+    # Collapse near-duplicate sections so the same report isn't embedded and retrieved twice
+    sections, report = dedupe_sections(sections, lambda sec: clean_text(sec["text"]))
+    print_report(report)
+
     # 2. Load SBERT
     print("Loading embedding model...")
     embedder = SentenceTransformer(EMBEDDING_MODEL)
     dim = embedder.get_sentence_embedding_dimension()
 
     # 3. Connect & recreate Qdrant collection
-    print(f"Connecting to Qdrant at {QDRANT_URL}...")
-    client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, timeout=60)
-    print(f"Recreating collection '{COLLECTION_NAME}'...")
-    client.recreate_collection(
-        collection_name=COLLECTION_NAME,
-        vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
-    )
+    print(f"Connecting to {qdrant_access.describe()}...")
+    client = qdrant_access.get_client(timeout=qdrant_access.QDRANT_BULK_TIMEOUT)
+    # Searches keep using the live version until the new one is validated and the alias swapped
+    target = reindex.create_version(client, COLLECTION_NAME, dim)
+    print(f"Loading into new version '{target}' of '{COLLECTION_NAME}'...")
+
+    # Full texts go to the local payload store, not Qdrant (keyed by the alias; the
+    # live version's texts stay until that version is pruned)
+    store = PayloadStore()
 
-    # 4. Build PointStructs with full payload
+    # 4. Build PointStructs with a small payload; keep the texts aside
     points = []
+    texts = []
     for sec in tqdm(sections, desc="Preparing ACN points"):
         acn     = sec["acn"]
         raw_txt = sec["text"]
@@ -90,27 +103,44 @@ def main():
         # Unique numeric ID
         pid = uuid.uuid4().int >> 64
 
-        # **Full payload including synp**
+        # Qdrant only keeps the small filter fields: aircraft and issue category facets
         payload = {
             "acn": acn,
-            "text_chunk": cleaned,
-            "synp": synp
+            "duplicate_acns": sec["duplicate_acns"],
+            **acn_facets(raw_txt, cleaned)
         }
 
         points.append(PointStruct(id=pid, vector=vec, payload=payload))
+        texts.append((pid, {"text_chunk": cleaned, "synp": synp}))
+
+    # Sentences and their embeddings let the pipeline keep only the parts of a report that match the question
+    print("Embedding sentences for context compression...")
+    fields = sentence_fields(
+        [sec["text"] for sec in sections],
+        lambda sents: embedder.encode(sents, batch_size=BATCH_SIZE, normalize_embeddings=True, show_progress_bar=False),
+        clean=clean_text
+    )
+    texts = [(pid, dict(stored, **extra)) for (pid, stored), extra in zip(texts, fields)]
 
     # 5. Upsert in batches (overwrite existing IDs)
-    print(f"Upserting {len(points)} points into '{COLLECTION_NAME}'...")
+    print(f"Upserting {len(points)} points into '{target}'...")
     for i in tqdm(range(0, len(points), BATCH_SIZE), desc="Upserting batches"):
         batch = points[i : i + BATCH_SIZE]
         client.upsert(
-            collection_name=COLLECTION_NAME,
+            collection_name=target,
             points=batch,
             wait=True,         # wait until operation completes
             ordering="strong"  # strongest ordering guarantee
         )
 
-    print("✅ Done. ACN collection updated with text_chunk + synp payload.")
+    print(f"Writing {len(texts)} text payloads to {store.path}...")
+    store.put_many(COLLECTION_NAME, texts)
+
+    # 6. Validate the new version and switch the alias to it
+    sample = [(p.id, p.vector) for p in points[::max(1, len(points) // reindex.VALIDATION_SAMPLE)]]
+    reindex.publish(client, COLLECTION_NAME, target, len(points), sample, store)
+
+    print("✅ Done. ACN collection updated; text_chunk + synp are in the payload store.")
 
 if __name__ == "__main__":
     main()
@@ -2,14 +2,18 @@ import os
 import pandas as pd
 import fitz 
 from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient, models
-from qdrant_client.http.models import Distance, VectorParams, PointStruct
+from qdrant_client import models
+from qdrant_client.http.models import PointStruct
 from dotenv import load_dotenv
 from pathlib import Path
 import uuid
 from tqdm import tqdm
-import time
 
+from payload_store import PayloadStore
+import analytics
+from facets import log_facets
+import reindex
+import qdrant_access
 
 load_dotenv() 
 
@@ -72,15 +76,25 @@ def process_data():
                         metadata = {
                             "source": "csv",
                             "csv_row": index,
-                            "problem": row['processed_problem'],
-                            "action": row['processed_action'],
-                            "original_file": CSV_FILE_PATH
+                            "original_file": CSV_FILE_PATH,
+                            **log_facets(row['processed_problem'], row['processed_action'])
                         }
                         processed_data.append({
                             "id": str(uuid.uuid4()), 
                             "text": text_to_embed,
-                            "metadata": metadata
+                            "metadata": metadata,
+                            "stored": {
+                                "problem": row['processed_problem'],
+                                "action": row['processed_action']
+                            }
                         })
+
+                # Keep the Dashboard rollups in step with the logs we load
+                try:
+                    added = analytics.ingest(df, Path(CSV_FILE_PATH).name)
+                    print(f"Added {added} new log rows to the analytics store")
+                except Exception as e:
+                    print(f"Warning: could not update the analytics store: {e}")
             else:
                 print(f"Warning: CSV file {CSV_FILE_PATH} missing 'processed_problem' or 'processed_solution' columns.")
 
@@ -123,9 +137,9 @@ def process_data():
         return 
 
     
-    print(f"Connecting to Qdrant at {QDRANT_URL}...")
+    print(f"Connecting to {qdrant_access.describe()}...")
     try:
-        client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, timeout=60) 
+        client = qdrant_access.get_client(timeout=qdrant_access.QDRANT_BULK_TIMEOUT)
         client.get_collections()
         print("Qdrant connection successful.")
     except Exception as e:
@@ -134,16 +148,11 @@ def process_data():
         return
 
     
-    print(f"Setting up Qdrant collection: {COLLECTION_NAME}")
+    # Load into a new version; searches keep using the live one until the alias is swapped
+    print(f"Setting up a new version of Qdrant collection: {COLLECTION_NAME}")
     try:
-        client.recreate_collection(
-            collection_name=COLLECTION_NAME,
-            vectors_config=VectorParams(size=embedding_dim, distance=Distance.COSINE)
-            
-            
-            
-        )
-        print(f"Collection '{COLLECTION_NAME}' created/recreated successfully.")
+        target = reindex.create_version(client, COLLECTION_NAME, embedding_dim)
+        print(f"Collection '{target}' created successfully.")
     except Exception as e:
         print(f"Error setting up Qdrant collection: {e}")
         return
@@ -169,28 +178,37 @@ def process_data():
         points_to_upload.extend(points_batch)
 
     
-    print(f"\nUploading {len(points_to_upload)} points to Qdrant collection '{COLLECTION_NAME}'...")
+    print(f"\nUploading {len(points_to_upload)} points to Qdrant collection '{target}'...")
     try:
-        
         for i in tqdm(range(0, len(points_to_upload), BATCH_SIZE), desc="Uploading to Qdrant"):
              batch_points = points_to_upload[i:i + BATCH_SIZE]
              if batch_points: 
                 client.upsert(
-                    collection_name=COLLECTION_NAME,
+                    collection_name=target,
                     points=batch_points,
-                    wait=False 
+                    wait=True
                 )
-        print("Waiting briefly for uploads to settle...")
-        time.sleep(2) 
 
-        
-        count_after = client.count(collection_name=COLLECTION_NAME).count
+        count_after = client.count(collection_name=target).count
         print(f"Successfully uploaded points. Collection count: {count_after}")
-        if count_after != len(processed_data):
-            print(f"Warning: Mismatch between processed items ({len(processed_data)}) and Qdrant count ({count_after}). Check logs.")
+
+        # Problem/action texts live in the local payload store, not in Qdrant. The live
+        # version's texts stay until it is pruned, so they are added to, not replaced.
+        # Written once the upload succeeded; `publish` removes them if validation fails
+        store = PayloadStore()
+        store.put_many(
+            COLLECTION_NAME,
+            ((item['id'], item['stored']) for item in processed_data if 'stored' in item)
+        )
+        print(f"Stored {store.count(COLLECTION_NAME)} text payloads in {store.path}")
+
+        # Check the count and a sample search, then switch the alias over
+        sample = [(p.id, p.vector) for p in points_to_upload[::max(1, len(points_to_upload) // reindex.VALIDATION_SAMPLE)]]
+        reindex.publish(client, COLLECTION_NAME, target, len(points_to_upload), sample, store)
 
     except Exception as e:
         print(f"Error uploading points to Qdrant: {e}")
+        print(f"'{COLLECTION_NAME}' still points at the previous version.")
 
     print("\nEmbedding and upload process finished.")
 
@@ -0,0 +1,248 @@
+"""
+Concurrent load-replay harness for /api/chat.
+
+Replays technician questions built from the processed_problem column of
+maintenance_logs.csv against a running app, either closed loop (a fixed number
+of workers sending back to back) or open loop (Poisson arrivals at a fixed
+rate, latency measured from the scheduled send time so queueing is counted).
+
+With --launch-app the harness starts the Groq / search stubs, loads the corpus
+into an in-memory Qdrant and serves app.py in-process, so it runs fully offline.
+
+    python load_replay.py --launch-app --mode closed --concurrency 8 --requests 200
+    python load_replay.py --url http://localhost:5000 --mode open --rate 5 --duration 60
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+
+LOGS_CSV = Path("maintenance_logs.csv")
+RESULTS_DIR = Path("bench_results")
+PERCENTILES = [50, 95, 99]
+QUESTION_TEMPLATES = [
+    "How do I fix: {}",
+    "What is the corrective action when {}?",
+    "Technician reports {}. What should I check?",
+    "{}",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay maintenance questions against /api/chat.")
+    parser.add_argument("--url", default="http://localhost:5000", help="Base URL of a running app")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=4, help="Workers (closed loop) or max in flight (open loop)")
+    parser.add_argument("--rate", type=float, default=2.0, help="Arrival rate in requests/s (open loop)")
+    parser.add_argument("--requests", type=int, default=100, help="Total requests to send")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request client timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=None, help="Where to write the JSON results")
+    parser.add_argument("--launch-app", action="store_true", help="Serve app.py in-process against stubs and an in-memory Qdrant")
+    parser.add_argument("--logs-limit", type=int, default=None, help="With --launch-app, only load the first N log rows")
+    parser.add_argument("--groq-latency", type=float, default=0.5, help="With --launch-app, stub Groq latency in seconds")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="With --launch-app, stub search latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    return parser.parse_args()
+
+
+def build_questions(n, seed):
+    """Turn distinct processed_problem entries into question-shaped requests."""
+    rng = random.Random(seed)
+    df = pd.read_csv(LOGS_CSV).fillna("")
+    problems = [p for p in df["processed_problem"].unique() if len(p.split()) >= 3]
+    return [rng.choice(QUESTION_TEMPLATES).format(rng.choice(problems)) for _ in range(n)]
+
+
+def launch_app(args):
+    """Start the stubs, load the corpus and serve the Flask app on a background thread."""
+    from werkzeug.serving import make_server
+    from stub_servers import groq_stub, search_stub
+    import benchmark_pipeline
+
+    groq = groq_stub(args.groq_latency, args.jitter).start()
+    search = search_stub(args.search_latency, args.jitter).start()
+    benchmark_pipeline.configure_environment(f"{groq.base_url}/openai/v1/chat/completions", f"{search.base_url}/search")
+
+    import rag_pipeline
+    from app import app
+
+    benchmark_pipeline.load_corpus(rag_pipeline, args.logs_limit)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    print(f"App serving at {url} (Groq stub {groq.base_url}, search stub {search.base_url})")
+
+    def shutdown():
+        server.shutdown()
+        groq.stop()
+        search.stop()
+
+    return url, shutdown
+
+
+class Recorder:
+    """Collects per-request outcomes from the worker threads."""
+
+    def __init__(self):
+        self.latencies = []
+        self.processing_times = []
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def ok(self, latency, processing_time):
+        with self.lock:
+            self.latencies.append(latency)
+            if processing_time is not None:
+                self.processing_times.append(processing_time)
+
+    def error(self, kind, latency):
+        with self.lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+            self.latencies.append(latency)
+
+
+_session = threading.local()
+
+
+def send(url, question, timeout, recorder, scheduled=None):
+    """POST one question. Latency counts from `scheduled` when given (open loop)."""
+    session = getattr(_session, "s", None)
+    if session is None:
+        session = _session.s = requests.Session()
+
+    start = scheduled if scheduled is not None else time.perf_counter()
+    try:
+        response = session.post(f"{url}/api/chat", json={"message": question}, timeout=timeout)
+        latency = time.perf_counter() - start
+        if response.status_code != 200:
+            recorder.error(f"http_{response.status_code}", latency)
+            return
+        body = response.json()
+        if "error" in body:
+            recorder.error("app_error", latency)
+            return
+        recorder.ok(latency, body.get("processingTime"))
+    except requests.RequestException as e:
+        recorder.error(type(e).__name__, time.perf_counter() - start)
+
+
+def run_closed(url, questions, args, recorder):
+    """Each worker sends its next request as soon as the previous one returns."""
+    it = iter(questions)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    def worker():
+        while deadline is None or time.perf_counter() < deadline:
+            with lock:
+                question = next(it, None)
+            if question is None:
+                return
+            send(url, question, args.timeout, recorder)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def run_open(url, questions, args, recorder):
+    """Poisson arrivals at --rate, independent of how fast responses come back."""
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    next_at = start
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for question in questions:
+            next_at += rng.expovariate(args.rate)
+            if args.duration and next_at - start > args.duration:
+                break
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, url, question, args.timeout, recorder, next_at)
+
+
+def percentiles(samples, scale=1.0):
+    if not samples:
+        return {}
+    arr = np.asarray(samples, dtype=float) * scale
+    return {f"p{p}": round(float(np.percentile(arr, p)), 3) for p in PERCENTILES}
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+
+    shutdown = None
+    url = args.url.rstrip("/")
+    if args.launch_app:
+        url, shutdown = launch_app(args)
+
+    questions = build_questions(args.requests, args.seed)
+    recorder = Recorder()
+
+    print(f"Sending {len(questions)} requests to {url}/api/chat ({args.mode} loop, concurrency {args.concurrency}"
+          + (f", rate {args.rate}/s" if args.mode == "open" else "") + ")...")
+    start = time.perf_counter()
+    try:
+        if args.mode == "closed":
+            run_closed(url, questions, args, recorder)
+        else:
+            run_open(url, questions, args, recorder)
+    finally:
+        wall = time.perf_counter() - start
+        if shutdown:
+            shutdown()
+
+    total = len(recorder.latencies)
+    errors = sum(recorder.errors.values())
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "url": url,
+            "mode": args.mode,
+            "concurrency": args.concurrency,
+            "rate": args.rate if args.mode == "open" else None,
+            "requests": args.requests,
+            "duration": args.duration,
+            "launch_app": args.launch_app,
+            "seed": args.seed,
+        },
+        "wall_time_s": round(wall, 3),
+        "completed": total,
+        "throughput_rps": round(total / wall, 3) if wall else 0,
+        "error_rate": round(errors / total, 4) if total else 0,
+        "errors": recorder.errors,
+        "latency_ms": percentiles(recorder.latencies, 1000.0),
+        "processing_time_s": percentiles(recorder.processing_times),
+    }
+
+    print(f"\nCompleted {total} requests in {wall:.1f}s -> {report['throughput_rps']} req/s, "
+          f"error rate {report['error_rate']:.2%}")
+    for name, values in (("latency (ms)", report["latency_ms"]), ("processingTime (s)", report["processing_time_s"])):
+        if values:
+            print(f"{name:<20}" + "  ".join(f"{k}={v}" for k, v in values.items()))
+    if recorder.errors:
+        print(f"errors: {recorder.errors}")
+
+    output = args.output or RESULTS_DIR / f"load_{args.mode}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
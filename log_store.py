@@ -0,0 +1,218 @@
+"""
+Indexed local store of maintenance logs for the /api/logs browsing API.
+
+Logs live in a SQLite table with composite indexes on (date, id) and on each
+filterable field plus (date, id), and an FTS5 index over the problem and
+action text. Pages are fetched with keyset pagination: the cursor carries the
+(date, id) of the last row served and the next page starts strictly after it,
+so a page deep in the list costs the same as the first one and rows never
+shift between pages when new logs arrive.
+
+    python log_store.py build maintenance_logs.csv
+"""
+
+import os
+import json
+import base64
+import sqlite3
+import argparse
+import threading
+import datetime as dt
+from pathlib import Path
+
+from analytics import prepare_rows
+from facets import extract_aircraft_models, normalize_aircraft_model
+from issue_categories import normalize_category
+
+LOG_STORE_PATH = os.getenv("LOG_STORE_PATH", "log_store.sqlite")
+LOGS_CSV = Path(os.getenv("LOGS_CSV", "maintenance_logs.csv"))  # Loaded into an empty store at startup
+LOGS_PAGE_DEFAULT = 50
+LOGS_PAGE_MAX = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id             INTEGER PRIMARY KEY,
+    log_id         TEXT NOT NULL UNIQUE,
+    date           TEXT NOT NULL,
+    category       TEXT NOT NULL,
+    aircraft_model TEXT,
+    problem        TEXT NOT NULL,
+    action         TEXT NOT NULL,
+    source         TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS logs_date ON logs (date, id);
+CREATE INDEX IF NOT EXISTS logs_category ON logs (category, date, id);
+CREATE INDEX IF NOT EXISTS logs_model ON logs (aircraft_model, date, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
+    problem, action, content='logs', content_rowid='id'
+);
+"""
+
+COLUMNS = ["id", "log_id", "date", "category", "aircraft_model", "problem", "action", "source"]
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that wasn't produced by this API (or for another sort order)."""
+
+
+def encode_cursor(row, order):
+    raw = json.dumps([row["date"], row["id"], order]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, order):
+    try:
+        date, row_id, cursor_order = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise InvalidCursor("malformed cursor")
+    if cursor_order != order or not isinstance(row_id, int):
+        raise InvalidCursor("cursor does not belong to this listing")
+    return date, row_id
+
+
+def fts_query(text):
+    """FTS5 query matching every word of `text` as a prefix (user input never reaches FTS syntax)."""
+    words = [w for w in "".join(c if c.isalnum() else " " for c in text.lower()).split() if w]
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def _iso_date(value, name):
+    try:
+        return dt.date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"{name} must be a YYYY-MM-DD date")
+
+
+class LogStore:
+    """SQLite-backed log table with keyset-paginated, filtered listing."""
+
+    def __init__(self, path=LOG_STORE_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _conn(self):
+        # One connection per thread, as in PayloadStore
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+
+    def ingest(self, df, source):
+        """Add the rows of a processed_problem/processed_action frame; rows already stored are skipped."""
+        rows = []
+        for r in prepare_rows(df, source):
+            models = extract_aircraft_models(f"{r['problem']} {r['action']}")
+            rows.append((r["log_id"], r["date"], r["category"], models[0] if models else None,
+                         r["problem"], r["action"], source))
+        conn = self._conn()
+        with conn:
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM logs").fetchone()[0]
+            conn.executemany(
+                "INSERT OR IGNORE INTO logs (log_id, date, category, aircraft_model, problem, action, source) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            # Index only the rows just added in the full-text table
+            added = conn.execute(
+                "INSERT INTO logs_fts (rowid, problem, action) SELECT id, problem, action FROM logs WHERE id > ?",
+                (last_id,),
+            ).rowcount
+        return added
+
+    def ingest_csv(self, csv_path):
+        import pandas as pd
+
+        df = pd.read_csv(csv_path).fillna("")
+        return self.ingest(df, Path(csv_path).name)
+
+    def page(self, limit=LOGS_PAGE_DEFAULT, cursor=None, order="desc", q=None, category=None,
+             aircraft_model=None, date_from=None, date_to=None):
+        """
+        One page of logs ordered by (date, id) (`order` "desc" = newest first), after
+        `cursor`. Returns {"items": [...], "nextCursor": str or None}.
+        """
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'")
+        limit = max(1, min(int(limit), LOGS_PAGE_MAX))
+
+        where = []
+        params = []
+        if q and fts_query(q):
+            where.append("logs.id IN (SELECT rowid FROM logs_fts WHERE logs_fts MATCH ?)")
+            params.append(fts_query(q))
+        if category:
+            if normalize_category(category) is None:
+                raise ValueError(f"Unknown category: {category}")
+            where.append("logs.category = ?")
+            params.append(normalize_category(category))
+        if aircraft_model:
+            if normalize_aircraft_model(aircraft_model) is None:
+                raise ValueError(f"Unknown aircraft model: {aircraft_model}")
+            where.append("logs.aircraft_model = ?")
+            params.append(normalize_aircraft_model(aircraft_model))
+        if date_from:
+            where.append("logs.date >= ?")
+            params.append(_iso_date(date_from, "dateFrom"))
+        if date_to:
+            where.append("logs.date <= ?")
+            params.append(_iso_date(date_to, "dateTo"))
+        if cursor:
+            # Row-value comparison lets SQLite seek straight to the cursor in the (…, date, id) index
+            where.append("(logs.date, logs.id) < (?, ?)" if order == "desc" else "(logs.date, logs.id) > (?, ?)")
+            params.extend(decode_cursor(cursor, order))
+
+        direction = "DESC" if order == "desc" else "ASC"
+        sql = (
+            f"SELECT {', '.join('logs.' + c for c in COLUMNS)} FROM logs"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + f" ORDER BY logs.date {direction}, logs.id {direction} LIMIT ?"
+        )
+        rows = [dict(r) for r in self._conn().execute(sql, [*params, limit + 1]).fetchall()]
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "items": [self._to_item(r) for r in rows],
+            "nextCursor": encode_cursor(rows[-1], order) if has_more else None,
+        }
+
+    @staticmethod
+    def _to_item(row):
+        return {
+            "id": row["log_id"],
+            "date": row["date"],
+            "category": row["category"],
+            "aircraftModel": row["aircraft_model"],
+            "description": row["problem"],
+            "action": row["action"],
+            "source": row["source"],
+        }
+
+
+def open_store(path=LOG_STORE_PATH, csv_path=LOGS_CSV):
+    """The log store, loaded from `csv_path` first if it is empty."""
+    store = LogStore(path)
+    if store.count() == 0 and Path(csv_path).is_file():
+        added = store.ingest_csv(csv_path)
+        print(f"Loaded {added} logs from {csv_path} into {store.path}")
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the /api/logs store from a log CSV.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="Add a CSV's logs to the store").add_argument("csv", type=Path)
+    args = parser.parse_args()
+
+    store = LogStore()
+    print(f"Added {store.ingest_csv(args.csv)} logs; {store.count()} in {store.path}")
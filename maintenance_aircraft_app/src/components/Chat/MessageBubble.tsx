@@ -51,6 +51,7 @@ const MessageBubble: React.FC<MessageBubbleProps> = ({ message }) => {
             minute: '2-digit',
           })}
           {message.processingTime && ` • ${message.processingTime}s`}
+          {message.refining && ' • refining with web results…'}
         </div>
       </div>
     </div>
@@ -7,11 +7,15 @@ import ChatInput from '../components/Chat/ChatInput';
 import { Message, AircraftModel, IssueCategory } from '../types';
 
 const API_URL = 'http://localhost:5000/api';
+/** Seconds each refinement poll may block on the server */
+const REFINEMENT_WAIT = 20;
 
 const GetAssistance: React.FC = () => {
   const [messages, setMessages] = useState<Message[]>([]);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  /** Server-side conversation, so follow-up questions can reuse earlier retrieval */
+  const [sessionId, setSessionId] = useState<string | null>(null);
 
   /** Keeps a handle on *the very last* div so we can scroll into view */
   const messagesEndRef = useRef<HTMLDivElement>(null);
@@ -21,6 +25,31 @@ const GetAssistance: React.FC = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
 
+  /* Long-poll the web-augmented answer and swap it in when it is ready */
+  const pollRefinement = async (messageId: string, refinementId: string) => {
+    const update = (changes: Partial<Message>) =>
+      setMessages(prev => prev.map(m => (m.id === messageId ? { ...m, ...changes } : m)));
+
+    try {
+      for (;;) {
+        const { data } = await axios.get(`${API_URL}/chat/refinement/${refinementId}`, {
+          params: { wait: REFINEMENT_WAIT },
+        });
+        if (data.status === 'done') {
+          update({ content: data.response, processingTime: data.processingTime, refining: false });
+          return;
+        }
+        if (data.status === 'failed') {
+          update({ refining: false });
+          return;
+        }
+      }
+    } catch {
+      // Expired or unreachable: keep the fast answer
+      update({ refining: false });
+    }
+  };
+
   const handleSendMessage = async (
     content: string,
     tags: { aircraftModel?: AircraftModel; issueCategory?: IssueCategory }
@@ -42,7 +71,10 @@ const GetAssistance: React.FC = () => {
         message: content,
         aircraftModel: tags.aircraftModel,
         issueCategory: tags.issueCategory,
+        sessionId: sessionId ?? undefined,
+        progressive: true,
       });
+      setSessionId(data.sessionId ?? null);
 
       const newAssistantMessage: Message = {
         id: `assistant-${Date.now()}`,
@@ -50,8 +82,12 @@ const GetAssistance: React.FC = () => {
         content: data.response,
         timestamp: new Date(),
         processingTime: data.processingTime,
+        refining: Boolean(data.refinementId),
       };
       setMessages(prev => [...prev, newAssistantMessage]);
+      if (data.refinementId) {
+        void pollRefinement(newAssistantMessage.id, data.refinementId);
+      }
     } catch (err) {
       setError('Failed to get response from the server. Please try again.');
       setMessages(prev => [
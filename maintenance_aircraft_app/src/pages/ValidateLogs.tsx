@@ -1,9 +1,13 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
+import axios from 'axios';
 import LogValidationForm, { ValidationResult } from '../components/Logs/LogValidationForm';
 import Card from '../components/ui/Card';
 import Badge from '../components/ui/Badge';
-import { mockMaintenanceLogs } from '../data/mockData';
-import { MaintenanceLog } from '../types';
+import { LogPage, LogRecord, ReportCategory } from '../types';
+
+const API_URL = 'http://localhost:5000/api';
+const PAGE_SIZE = 25;
+const CATEGORIES: ReportCategory[] = ['Mechanical', 'Electrical', 'Hydraulics', 'Avionics', 'Environmental', 'Structural', 'Unclassified'];
 
 const ValidateLogs: React.FC = () => {
   const [validationResult, setValidationResult] = useState<{
@@ -12,9 +16,43 @@ const ValidateLogs: React.FC = () => {
     suggestions: string[];
   } | null>(null);
   
-  const [selectedLog, setSelectedLog] = useState<MaintenanceLog | null>(null);
+  const [selectedLog, setSelectedLog] = useState<LogRecord | null>(null);
+  const [logs, setLogs] = useState<LogRecord[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [query, setQuery] = useState('');
+  const [category, setCategory] = useState('');
+  const [isLoading, setIsLoading] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+
+  /* Fetch one page; without a cursor the list starts over (new filters) */
+  const loadLogs = useCallback(async (cursor: string | null) => {
+    setIsLoading(true);
+    setError(null);
+    try {
+      const { data } = await axios.get<LogPage>(`${API_URL}/logs`, {
+        params: {
+          limit: PAGE_SIZE,
+          cursor: cursor || undefined,
+          q: query || undefined,
+          category: category || undefined,
+        },
+      });
+      setLogs(prev => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.nextCursor);
+    } catch {
+      setError('Failed to load maintenance logs from the server.');
+    } finally {
+      setIsLoading(false);
+    }
+  }, [query, category]);
+
+  /* Debounce typing in the search box */
+  useEffect(() => {
+    const timer = setTimeout(() => void loadLogs(null), 300);
+    return () => clearTimeout(timer);
+  }, [loadLogs]);
   
-  const handleSelectLog = (log: MaintenanceLog) => {
+  const handleSelectLog = (log: LogRecord) => {
     setSelectedLog(log);
     setValidationResult(null);
   };
@@ -27,19 +65,6 @@ const ValidateLogs: React.FC = () => {
     setValidationResult(result);
   };
   
-  const getStatusColor = (status: MaintenanceLog['status']) => {
-    switch (status) {
-      case 'Completed':
-        return 'success';
-      case 'Pending':
-        return 'warning';
-      case 'Flagged':
-        return 'danger';
-      default:
-        return 'default';
-    }
-  };
-  
   return (
     <div className="space-y-6">
       <div>
@@ -49,9 +74,34 @@ const ValidateLogs: React.FC = () => {
       
       <div className="grid grid-cols-1 lg:grid-cols-3 gap-6">
         <div className="lg:col-span-1">
-          <Card title="Recent Logs">
+          <Card title="Maintenance Logs">
             <div className="space-y-4">
-              {mockMaintenanceLogs.map((log) => (
+              <div className="flex gap-2">
+                <input
+                  type="search"
+                  value={query}
+                  onChange={(e) => setQuery(e.target.value)}
+                  placeholder="Search problems and actions"
+                  className="flex-1 min-w-0 border border-gray-300 dark:border-gray-600 rounded-md p-2 text-sm bg-white dark:bg-slate-800"
+                />
+                <select
+                  value={category}
+                  onChange={(e) => setCategory(e.target.value)}
+                  className="border border-gray-300 dark:border-gray-600 rounded-md p-2 text-sm bg-white dark:bg-slate-800"
+                >
+                  <option value="">All categories</option>
+                  {CATEGORIES.map((c) => (
+                    <option key={c} value={c}>{c}</option>
+                  ))}
+                </select>
+              </div>
+
+              {error && <p className="text-sm text-red-600 dark:text-red-400">{error}</p>}
+              {!isLoading && !error && logs.length === 0 && (
+                <p className="text-sm text-gray-500 dark:text-gray-400">No logs match these filters.</p>
+              )}
+
+              {logs.map((log) => (
                 <div
                   key={log.id}
                   className={`p-4 border rounded-lg cursor-pointer transition-colors ${
@@ -63,18 +113,26 @@ const ValidateLogs: React.FC = () => {
                 >
                   <div className="flex justify-between items-start mb-2">
                     <div>
-                      <h3 className="font-medium">{log.aircraftModel}</h3>
+                      <h3 className="font-medium">{log.aircraftModel ?? 'Unknown aircraft'}</h3>
                       <p className="text-sm text-gray-500 dark:text-gray-400">
-                        {log.date} • {log.technicianName}
+                        {log.date} • {log.source}
                       </p>
                     </div>
-                    <Badge variant={getStatusColor(log.status)}>
-                      {log.status}
-                    </Badge>
+                    <Badge variant="secondary">{log.category}</Badge>
                   </div>
                   <p className="text-sm truncate">{log.description}</p>
                 </div>
               ))}
+
+              {nextCursor && (
+                <button
+                  className="w-full px-4 py-2 text-sm border border-gray-300 dark:border-gray-600 rounded-md hover:bg-gray-50 dark:hover:bg-slate-700 disabled:opacity-50"
+                  disabled={isLoading}
+                  onClick={() => void loadLogs(nextCursor)}
+                >
+                  {isLoading ? 'Loading…' : 'Load more'}
+                </button>
+              )}
             </div>
           </Card>
         </div>
@@ -82,8 +140,8 @@ const ValidateLogs: React.FC = () => {
         <div className="lg:col-span-2">
           {selectedLog ? (
             <Card 
-              title={`Log Details - ${selectedLog.aircraftModel} (${selectedLog.tailNumber})`}
-              description={`Technician: ${selectedLog.technicianName} • ${selectedLog.date}`}
+              title={`Log Details - ${selectedLog.aircraftModel ?? 'Unknown aircraft'}`}
+              description={`${selectedLog.source} • ${selectedLog.date}`}
             >
               <div className="space-y-4">
                 <div>
@@ -101,38 +159,18 @@ const ValidateLogs: React.FC = () => {
                   <p className="text-gray-900 dark:text-gray-100">{selectedLog.action}</p>
                 </div>
                 
-                {selectedLog.parts && selectedLog.parts.length > 0 && (
-                  <div>
-                    <h4 className="font-medium text-gray-700 dark:text-gray-300 mb-1">Parts Used</h4>
-                    <div className="flex flex-wrap gap-2">
-                      {selectedLog.parts.map((part, index) => (
-                        <Badge key={index} variant="default" size="sm">
-                          {part}
-                        </Badge>
-                      ))}
-                    </div>
-                  </div>
-                )}
-                
-                <div>
-                  <h4 className="font-medium text-gray-700 dark:text-gray-300 mb-1">Time Spent</h4>
-                  <p className="text-gray-900 dark:text-gray-100">
-                    {Math.floor(selectedLog.timeSpent / 60)}h {selectedLog.timeSpent % 60}m
-                  </p>
-                </div>
-                
                 <div className="pt-4 border-t border-gray-200 dark:border-gray-700">
                   <button 
                     className="px-4 py-2 bg-blue-600 hover:bg-blue-700 text-white rounded-md"
                     onClick={() => {
-                      const result = {
-                        isValid: selectedLog.status === 'Completed',
-                        issues: selectedLog.status === 'Pending' || selectedLog.status === 'Flagged' 
-                          ? ['Status is not marked as completed', 'Some required information may be missing'] 
-                          : [],
+                      const issues: string[] = [];
+                      if (!selectedLog.action.trim()) issues.push('No corrective action is recorded');
+                      if (!selectedLog.aircraftModel) issues.push('The aircraft model is not identified in the log');
+                      setValidationResult({
+                        isValid: issues.length === 0,
+                        issues,
                         suggestions: ['Ensure all technical references are included', 'Add specific measurements where applicable']
-                      };
-                      setValidationResult(result);
+                      });
                     }}
                   >
                     Validate This Log
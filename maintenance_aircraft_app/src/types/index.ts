@@ -2,6 +2,9 @@ export type AircraftModel = 'Boeing 737' | 'Airbus A320' | 'Boeing 787' | 'Airbu
 
 export type IssueCategory = 'Mechanical' | 'Electrical' | 'Hydraulics' | 'Avionics' | 'Environmental' | 'Structural';
 
+/** Categories the log and analytics APIs report: historical logs that match no category are 'Unclassified' */
+export type ReportCategory = IssueCategory | 'Unclassified';
+
 export type MaintenanceLog = {
   id: string;
   date: string;
@@ -17,6 +20,19 @@ export type MaintenanceLog = {
   timeSpent: number; // in minutes
 };
 
+/** A historical log as served by GET /api/logs */
+export type LogRecord = Pick<MaintenanceLog, 'id' | 'date' | 'description' | 'action'> & {
+  category: ReportCategory;
+  aircraftModel: AircraftModel | null;
+  source: string;
+};
+
+export type LogPage = {
+  items: LogRecord[];
+  /** Pass back as ?cursor= for the next page; null on the last page */
+  nextCursor: string | null;
+};
+
 export type Message = {
   id: string;
   role: 'user' | 'assistant';
@@ -26,6 +42,10 @@ export type Message = {
     aircraftModel?: AircraftModel;
     issueCategory?: IssueCategory;
   };
+  processingTime?: number;
+  isError?: boolean;
+  /** A web-augmented version of this answer is still being prepared */
+  refining?: boolean;
 };
 
 export type ChatSession = {
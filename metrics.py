@@ -0,0 +1,246 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters and histograms are keyed by label values and are safe to update from
+Flask's request threads. `span(stage)` times one pipeline stage, records it in
+the stage latency histogram and emits a debug log line.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger("metrics")
+
+# Latency buckets (seconds) sized for a pipeline whose stages range from
+# sub-millisecond lookups to multi-second LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def count(self, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            return series["count"] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, dict(v, buckets=list(v["buckets"]))) for k, v in self._series.items())
+        for key, series in items:
+            for bound, cumulative in zip(self.buckets, series["buckets"]):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', repr(float(bound))))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', '+Inf'))} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series['count']}")
+        return lines
+
+
+class Registry:
+    """Holds every metric so they can be rendered together."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, labels=()):
+        return self._register(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, labels, buckets)
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.histogram(
+    "rag_stage_duration_seconds", "Wall time of each RAG pipeline stage", labels=("stage",)
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "rag_stage_errors_total", "Pipeline stages that raised an exception", labels=("stage",)
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "rag_cache_lookups_total", "Cache lookups by cache and result (hit/miss)", labels=("cache", "result")
+)
+WEB_SEARCHES = REGISTRY.counter(
+    "rag_web_search_total", "Web search decisions by outcome", labels=("outcome",)
+)
+GROQ_REQUESTS = REGISTRY.counter(
+    "rag_groq_requests_total", "Groq API calls by result", labels=("result",)
+)
+GROQ_ERRORS = REGISTRY.counter(
+    "rag_groq_errors_total", "Groq API errors by reason", labels=("reason",)
+)
+GROQ_QUEUE_WAIT = REGISTRY.histogram(
+    "rag_groq_queue_wait_seconds", "Time Groq calls waited for client-side rate limit budget",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+GROQ_COALESCED = REGISTRY.counter(
+    "rag_groq_coalesced_total", "Groq calls served by sharing an identical in-flight request"
+)
+GROQ_HEDGES = REGISTRY.counter(
+    "rag_groq_hedges_total",
+    "Hedged Groq calls by outcome (not_needed, primary_won, hedge_won, both_failed)", labels=("outcome",)
+)
+GROQ_HEDGE_DEADLINE = REGISTRY.gauge(
+    "rag_groq_hedge_deadline_seconds", "Current wait before a hedge request is sent"
+)
+PAGE_FETCHES = REGISTRY.counter(
+    "rag_page_fetches_total",
+    "Web result page fetches by outcome (cache_hit, fetched, timeout, error, deadline)", labels=("outcome",)
+)
+CIRCUIT_STATE = REGISTRY.gauge(
+    "rag_circuit_state", "Circuit breaker state per dependency (0 closed, 1 half-open, 2 open)", labels=("dependency",)
+)
+CIRCUIT_REJECTIONS = REGISTRY.counter(
+    "rag_circuit_rejections_total", "Calls refused because the dependency's circuit was open", labels=("dependency",)
+)
+CONTEXT_CHARS = REGISTRY.counter(
+    "rag_context_chars_total", "Characters of retrieved context before and after sentence compression", labels=("stage",)
+)
+REFINEMENTS = REGISTRY.counter(
+    "rag_refinements_total", "Background web-augmented refinements of progressive answers by outcome", labels=("outcome",)
+)
+SCHED_QUEUE_DEPTH = REGISTRY.gauge(
+    "rag_sched_queue_depth", "Requests waiting for a pipeline slot by priority class", labels=("priority",)
+)
+SCHED_RUNNING = REGISTRY.gauge(
+    "rag_sched_running", "Requests currently running the pipeline"
+)
+SCHED_WAIT = REGISTRY.histogram(
+    "rag_sched_wait_seconds", "Time requests waited for a pipeline slot by priority class", labels=("priority",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+SCHED_REQUESTS = REGISTRY.counter(
+    "rag_sched_requests_total",
+    "Scheduled requests by priority class and outcome (admitted, degraded, shed_queue_full, shed_timeout)",
+    labels=("priority", "outcome")
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "rag_http_requests_total", "HTTP requests served by endpoint and status", labels=("endpoint", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "rag_http_request_duration_seconds", "HTTP request latency by endpoint", labels=("endpoint",)
+)
+
+
+@contextmanager
+def span(stage, **attributes):
+    """
+    Time one pipeline stage. Records the duration in rag_stage_duration_seconds,
+    counts exceptions in rag_stage_errors_total and logs the span at debug level.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage=stage)
+        if logger.isEnabledFor(logging.DEBUG):
+            extra = " ".join(f"{k}={v}" for k, v in attributes.items())
+            logger.debug("span stage=%s duration_ms=%.1f %s", stage, elapsed * 1000, extra)
+
+
+def render_prometheus():
+    """Render every registered metric in the Prometheus text format."""
+    return REGISTRY.render_prometheus()
@@ -0,0 +1,271 @@
+"""
+Fetch and condense the pages behind web search results.
+
+Search snippets are a sentence or two; the procedure text the model needs is on
+the page. For the top N results this module downloads the pages concurrently
+(strict per-page timeout and byte cap, one overall deadline), strips them down
+to their main text, and keeps the passages closest to the query embedding.
+Extracted page text is cached on disk by URL so repeated questions don't
+refetch; entries past PAGE_CACHE_TTL, and the oldest entries once the cache
+grows past PAGE_CACHE_MAX_BYTES, are evicted every few writes.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import requests
+
+from metrics import PAGE_FETCHES
+
+logger = logging.getLogger("page_fetch")
+
+PAGE_FETCH_ENABLED = os.getenv("PAGE_FETCH_ENABLED", "false").lower() == "true"
+PAGE_FETCH_TOP_N = int(os.getenv("PAGE_FETCH_TOP_N", "3"))  # Result pages fetched per search
+PAGE_FETCH_TIMEOUT = float(os.getenv("PAGE_FETCH_TIMEOUT", "3.0"))  # Seconds allowed per page (connect + download)
+PAGE_FETCH_DEADLINE = float(os.getenv("PAGE_FETCH_DEADLINE", "4.0"))  # Seconds allowed for the whole fetch stage
+PAGE_FETCH_MAX_BYTES = int(os.getenv("PAGE_FETCH_MAX_BYTES", "1000000"))  # Pages are truncated past this size
+PAGE_PASSAGE_WORDS = 80  # Words per passage
+PAGE_MAX_PASSAGES = 60  # Passages per page considered for selection
+PAGE_PASSAGES_KEPT = int(os.getenv("PAGE_PASSAGES_KEPT", "2"))  # Best passages kept per page
+PAGE_CACHE_DIR = Path(os.getenv("PAGE_CACHE_DIR", "page_cache"))
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds before a cached page is refetched
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))  # Oldest pages are evicted past this size
+PAGE_CACHE_PRUNE_EVERY = 50  # Cache writes between eviction passes
+
+USER_AGENT = "Mozilla/5.0 (compatible; aircraft-maintenance-assistant/1.0)"
+
+fetch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="page-fetch")
+
+
+class _MainTextParser(HTMLParser):
+    """Collects the text of content blocks, skipping scripts, navigation and other chrome."""
+
+    SKIP = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "button", "select"}
+    BLOCKS = {"p", "li", "td", "th", "pre", "blockquote", "h1", "h2", "h3", "h4", "h5", "h6", "div", "section", "article", "br", "tr"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skip_depth = 0
+        self.blocks = []
+        self.current = []
+
+    def _flush(self):
+        text = " ".join(" ".join(self.current).split())
+        if text:
+            self.blocks.append(text)
+        self.current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self.skip_depth += 1
+        elif tag in self.BLOCKS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in self.BLOCKS:
+            self._flush()
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.current.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def extract_main_text(html: str, min_words=6) -> str:
+    """Main text of an HTML page: content blocks of at least `min_words` words, one per line."""
+    parser = _MainTextParser()
+    parser.feed(html)
+    parser.close()
+    return "\n".join(block for block in parser.blocks if len(block.split()) >= min_words)
+
+
+def split_passages(text: str, words=PAGE_PASSAGE_WORDS, limit=PAGE_MAX_PASSAGES):
+    """Split page text into consecutive passages of `words` words (the last may be shorter)."""
+    passages = []
+    current = []
+    for block in text.split("\n"):
+        current.extend(block.split())
+        while len(current) >= words:
+            passages.append(" ".join(current[:words]))
+            current = current[words:]
+        if len(passages) >= limit:
+            return passages[:limit]
+    if current:
+        passages.append(" ".join(current))
+    return passages[:limit]
+
+
+def select_passages(passages, query_embedding, embed, k=PAGE_PASSAGES_KEPT):
+    """The k passages most similar to the query, in page order."""
+    if len(passages) <= k:
+        return list(passages)
+    vectors = np.asarray(embed(passages), dtype=np.float32)
+    scores = vectors @ np.asarray(query_embedding, dtype=np.float32)
+    best = sorted(np.argsort(-scores)[:k])
+    return [passages[i] for i in best]
+
+
+def _cache_path(url, cache_dir):
+    return Path(cache_dir) / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json"
+
+
+def read_cache(url, cache_dir=PAGE_CACHE_DIR):
+    path = _cache_path(url, cache_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if time.time() - entry.get("fetched_at", 0) > PAGE_CACHE_TTL:
+        return None
+    return entry["text"]
+
+
+_cache_writes = 0
+_cache_writes_lock = threading.Lock()
+
+
+def write_cache(url, text, cache_dir=PAGE_CACHE_DIR):
+    global _cache_writes
+    path = _cache_path(url, cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A temp file of its own per writer: pages are fetched on several threads at once
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=path.parent, suffix=".tmp", delete=False) as f:
+        json.dump({"url": url, "fetched_at": time.time(), "text": text}, f)
+    os.replace(f.name, path)
+
+    with _cache_writes_lock:
+        _cache_writes += 1
+        prune = _cache_writes % PAGE_CACHE_PRUNE_EVERY == 0
+    if prune:
+        prune_cache(cache_dir)
+
+
+def prune_cache(cache_dir=PAGE_CACHE_DIR, max_bytes=PAGE_CACHE_MAX_BYTES, ttl=PAGE_CACHE_TTL):
+    """Delete expired entries, then the oldest ones until the cache fits in `max_bytes`. Returns the number deleted."""
+    now = time.time()
+    entries = []
+    deleted = 0
+    for path in Path(cache_dir).glob("*.*"):
+        if path.suffix not in (".json", ".tmp"):
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue  # Replaced or pruned by another thread
+        # A temp file an hour old was left behind by a writer that died
+        if now - stat.st_mtime > (ttl if path.suffix == ".json" else 3600):
+            path.unlink(missing_ok=True)
+            deleted += 1
+        elif path.suffix == ".json":
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        deleted += 1
+    if deleted:
+        logger.info("Evicted %d cached pages from %s", deleted, cache_dir)
+    return deleted
+
+
+def download(url, timeout=PAGE_FETCH_TIMEOUT, max_bytes=PAGE_FETCH_MAX_BYTES):
+    """
+    GET an HTML page, giving up after `timeout` seconds in total. Bodies larger than
+    `max_bytes` are truncated; non-HTML responses raise ValueError.
+    """
+    deadline = time.monotonic() + timeout
+    with requests.get(url, stream=True, timeout=timeout, headers={"User-Agent": USER_AGENT}) as response:
+        # requests' timeout applies to each read, so a host dripping bytes could hold the
+        # worker indefinitely: shut the connection down when the page's time is up, which
+        # aborts a read in progress
+        abort = getattr(response.raw, "shutdown", response.close)
+        watchdog = threading.Timer(max(0.0, deadline - time.monotonic()), abort)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            if content_type and "html" not in content_type and "text/plain" not in content_type:
+                raise ValueError(f"unsupported content type {content_type}")
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=16384):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= max_bytes:
+                    logger.debug("Truncating %s at %d bytes", url, max_bytes)
+                    break
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"page took longer than {timeout}s")
+        except Exception:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"page took longer than {timeout}s")
+            raise
+        finally:
+            watchdog.cancel()
+        body = b"".join(chunks)[:max_bytes]
+        return body.decode(response.encoding or "utf-8", errors="replace")
+
+
+def fetch_page_text(url, cache_dir=PAGE_CACHE_DIR):
+    """Main text of one page, from the disk cache or fetched. Returns None on failure."""
+    text = read_cache(url, cache_dir)
+    if text is not None:
+        PAGE_FETCHES.inc(outcome="cache_hit")
+        return text
+    try:
+        text = extract_main_text(download(url))
+    except (requests.Timeout, TimeoutError):
+        PAGE_FETCHES.inc(outcome="timeout")
+        logger.info("Timed out fetching %s", url)
+        return None
+    except Exception as e:
+        PAGE_FETCHES.inc(outcome="error")
+        logger.info("Could not fetch %s: %s", url, e)
+        return None
+    PAGE_FETCHES.inc(outcome="fetched")
+    write_cache(url, text, cache_dir)
+    return text
+
+
+def fetch_passages(urls, query_embedding, embed, deadline=PAGE_FETCH_DEADLINE, cache_dir=PAGE_CACHE_DIR):
+    """
+    Fetch `urls` concurrently and return {url: [passages]} for the pages that
+    arrived within `deadline` seconds. `embed` maps a list of strings to
+    normalized embeddings.
+    """
+    futures = {fetch_pool.submit(fetch_page_text, url, cache_dir): url for url in urls}
+    done, not_done = wait(futures, timeout=deadline)
+    if not_done:
+        PAGE_FETCHES.inc(len(not_done), outcome="deadline")
+        # Pages still queued behind other requests' fetches are dropped; ones already
+        # downloading stop at their own PAGE_FETCH_TIMEOUT inside `download`
+        for future in not_done:
+            future.cancel()
+
+    passages = {}
+    for future in done:
+        text = future.result()
+        if text:
+            selected = select_passages(split_passages(text), query_embedding, embed)
+            if selected:
+                passages[futures[future]] = selected
+    return passages
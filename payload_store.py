@@ -0,0 +1,129 @@
+import os
+import json
+import sqlite3
+import threading
+import zlib
+
+# zstd is optional - fall back to zlib if the zstandard package isn't installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Configuration
+PAYLOAD_STORE_PATH = os.getenv("PAYLOAD_STORE_PATH", "payload_store.sqlite")
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 6
+
+
+def _compress(data: bytes):
+    """Compress bytes, returning (codec, blob)."""
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(codec: str, blob: bytes) -> bytes:
+    """Decompress a blob written by _compress."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Payload was stored with zstd but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+
+class PayloadStore:
+    """
+    Local compressed key-value store for the large text fields of Qdrant points.
+    Qdrant keeps only the vector plus small filter fields; the full texts live here,
+    keyed by (collection, point id), and are fetched only for the hits we actually use.
+    """
+
+    def __init__(self, path=PAYLOAD_STORE_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS payloads (
+                collection TEXT NOT NULL,
+                point_id   TEXT NOT NULL,
+                codec      TEXT NOT NULL,
+                data       BLOB NOT NULL,
+                PRIMARY KEY (collection, point_id)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.commit()
+
+    def _conn(self):
+        # SQLite connections can't be shared across threads, and Flask serves
+        # requests from several threads, so keep one connection per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put_many(self, collection, items):
+        """
+        Store payloads for many points in one transaction.
+        `items` is an iterable of (point_id, dict) pairs.
+        """
+        rows = []
+        for point_id, fields in items:
+            raw = json.dumps(fields, ensure_ascii=False).encode("utf-8")
+            codec, blob = _compress(raw)
+            rows.append((collection, str(point_id), codec, blob))
+
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO payloads (collection, point_id, codec, data) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def get_many(self, collection, point_ids):
+        """
+        Fetch payloads for the given point ids with a single query.
+        Returns a dict of point_id (as str) -> dict; missing ids are left out.
+        """
+        keys = [str(pid) for pid in point_ids]
+        if not keys:
+            return {}
+
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn().execute(
+            f"SELECT point_id, codec, data FROM payloads WHERE collection = ? AND point_id IN ({placeholders})",
+            [collection, *keys],
+        ).fetchall()
+
+        return {
+            point_id: json.loads(_decompress(codec, blob).decode("utf-8"))
+            for point_id, codec, blob in rows
+        }
+
+    def delete_collection(self, collection):
+        """Drop every payload stored for a collection (used before a full reload)."""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM payloads WHERE collection = ?", (collection,))
+
+    def delete_ids(self, collection, point_ids):
+        """Drop the payloads of specific points (e.g. those of a pruned collection version)."""
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "DELETE FROM payloads WHERE collection = ? AND point_id = ?",
+                ((collection, str(pid)) for pid in point_ids),
+            )
+
+    def count(self, collection):
+        """Number of payloads stored for a collection."""
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM payloads WHERE collection = ?", (collection,)
+        ).fetchone()
+        return row[0]
@@ -0,0 +1,186 @@
+"""
+On-demand profiling of a single request.
+
+`profile_call(fn)` runs fn on the calling thread while a background thread
+samples that thread's stack every PROFILE_INTERVAL seconds, and tracemalloc
+records allocations. The result is a report with:
+- the stacks in folded format ("outer;inner;leaf count" per line), which
+  flamegraph.pl, speedscope and most flame graph viewers read directly
+- the functions with the most samples at the top of the stack
+- peak memory allocated during the request, and the largest allocation
+  sites still held when it finished
+
+Work the request hands to other threads (hedged Groq calls, page fetches)
+shows up as the request thread waiting on it. tracemalloc is process-wide, so
+allocations made by concurrent requests are included; only one request is
+profiled at a time. Only the newest PROFILE_KEEP folded files are kept in
+PROFILE_DIR.
+"""
+
+import os
+import sys
+import time
+import uuid
+import hmac
+import threading
+import tracemalloc
+from pathlib import Path
+from collections import Counter
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # Required in the X-Admin-Token header for admin-only features; unset disables them
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))  # Seconds between stack samples
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))  # Where folded stacks are saved for download
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))  # Saved profiles kept; older ones are deleted
+PROFILE_TOP = 15  # Functions and allocation sites listed in the report
+TRACEMALLOC_FRAMES = 10
+
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Raised when another request is already being profiled."""
+
+
+def is_admin(token):
+    """Whether `token` matches ADMIN_TOKEN (always False when no token is configured)."""
+    return bool(ADMIN_TOKEN and token) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples one thread's stack from a background thread."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit=PROFILE_TOP):
+        """Functions by samples at the top of the stack (self time) and anywhere on it (total time)."""
+        if not self.samples:
+            return []
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+        return [
+            {"function": label, "self_pct": round(100.0 * n / self.samples, 1),
+             "total_pct": round(100.0 * total[label] / self.samples, 1)}
+            for label, n in own.most_common(limit)
+        ]
+
+
+def memory_report(snapshot, limit=PROFILE_TOP):
+    stats = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ]).statistics("lineno")
+    return [
+        {"site": f"{os.path.basename(s.traceback[0].filename)}:{s.traceback[0].lineno}",
+         "size_bytes": s.size, "count": s.count}
+        for s in stats[:limit]
+    ]
+
+
+def profile_call(fn, save_dir=PROFILE_DIR):
+    """
+    Run fn() under the sampling profiler and tracemalloc. Returns (result, report).
+    Raises ProfilerBusy if another call is being profiled.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("another request is being profiled")
+    try:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+
+        profiler = SamplingProfiler(threading.get_ident())
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            result = fn()
+        finally:
+            profiler.stop()
+            wall = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            allocations = memory_report(tracemalloc.take_snapshot())
+            if started_tracing:
+                tracemalloc.stop()
+    finally:
+        _profile_lock.release()
+
+    profile_id = uuid.uuid4().hex
+    save_dir = Path(save_dir)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    (save_dir / f"{profile_id}.folded").write_text(profiler.folded() + "\n", encoding="utf-8")
+    prune_profiles(save_dir)
+
+    report = {
+        "profileId": profile_id,
+        "wall_ms": round(wall * 1000, 1),
+        "samples": profiler.samples,
+        "interval_ms": profiler.interval * 1000,
+        "top_functions": profiler.top_functions(),
+        "memory": {
+            "peak_bytes": peak - baseline,
+            "retained_bytes": current - baseline,
+            "top_allocations": allocations,
+        },
+    }
+    return result, report
+
+
+def prune_profiles(save_dir=PROFILE_DIR, keep=PROFILE_KEEP):
+    """Delete all but the `keep` newest saved profiles. Returns the number deleted."""
+    saved = []
+    for path in Path(save_dir).glob("*.folded"):
+        try:
+            saved.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            continue  # Pruned by a concurrent call
+    saved.sort(reverse=True)
+    for _, path in saved[keep:]:
+        path.unlink(missing_ok=True)
+    return len(saved[keep:])
+
+
+def folded_path(profile_id, save_dir=PROFILE_DIR):
+    """Path of a saved profile, or None if the id is malformed or unknown."""
+    if not (len(profile_id) == 32 and all(c in "0123456789abcdef" for c in profile_id)):
+        return None
+    path = Path(save_dir) / f"{profile_id}.folded"
+    return path if path.is_file() else None
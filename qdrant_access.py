@@ -0,0 +1,100 @@
+"""
+One place to build Qdrant clients for the API, the loaders and the scripts.
+
+Clients are shared per process: every caller asking for the same timeout gets
+the same client, so connections (and, over gRPC, HTTP/2 channels) are reused
+instead of each module opening its own. QDRANT_PREFER_GRPC switches the data
+calls (search, upsert, retrieve) to gRPC on QDRANT_GRPC_PORT; collection
+management still goes over REST inside qdrant-client. With
+QDRANT_GRPC_CHANNELS > 1 calls are spread round-robin over that many clients,
+each with its own channel, so concurrent requests don't queue behind one
+HTTP/2 connection.
+
+QDRANT_URL=":memory:" gives an in-process instance (used by the benchmarks).
+"""
+
+import os
+import itertools
+import threading
+
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient
+
+load_dotenv()
+
+QDRANT_URL = os.getenv("QDRANT_URL")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_GRPC_CHANNELS = int(os.getenv("QDRANT_GRPC_CHANNELS", "1"))  # Channels per shared gRPC client pool
+QDRANT_TIMEOUT = float(os.getenv("QDRANT_TIMEOUT", "10"))  # Seconds per request for interactive calls
+QDRANT_BULK_TIMEOUT = float(os.getenv("QDRANT_BULK_TIMEOUT", "60"))  # Seconds per request for loaders and bulk upserts
+
+# Keep idle channels alive between questions and allow large upsert batches
+GRPC_OPTIONS = {
+    "grpc.keepalive_time_ms": 30000,
+    "grpc.keepalive_timeout_ms": 10000,
+    "grpc.keepalive_permit_without_calls": 1,
+    "grpc.max_send_message_length": 64 * 1024 * 1024,
+    "grpc.max_receive_message_length": 64 * 1024 * 1024,
+}
+
+_clients = {}
+_lock = threading.Lock()
+
+
+class ChannelPool:
+    """Round-robins attribute access (i.e. API calls) over several clients."""
+
+    def __init__(self, clients):
+        self.clients = clients
+        self._next = itertools.cycle(clients)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        with self._lock:
+            client = next(self._next)
+        return getattr(client, name)
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+
+
+def make_client(prefer_grpc=QDRANT_PREFER_GRPC, timeout=QDRANT_TIMEOUT, url=None, api_key=None):
+    """A new, unshared client. Prefer get_client() outside benchmarks."""
+    url = url or QDRANT_URL
+    if url == ":memory:":
+        return QdrantClient(location=":memory:")
+    return QdrantClient(
+        url=url,
+        api_key=api_key or QDRANT_API_KEY,
+        prefer_grpc=prefer_grpc,
+        grpc_port=QDRANT_GRPC_PORT,
+        grpc_options=GRPC_OPTIONS if prefer_grpc else None,
+        timeout=int(timeout),
+    )
+
+
+def get_client(timeout=QDRANT_TIMEOUT, prefer_grpc=QDRANT_PREFER_GRPC, channels=QDRANT_GRPC_CHANNELS):
+    """The process-wide client for this timeout and transport, created on first use."""
+    if not QDRANT_URL:
+        raise RuntimeError("Please set QDRANT_URL in your .env")
+    if QDRANT_URL == ":memory:":
+        # Every caller must see the same in-memory instance
+        timeout, prefer_grpc, channels = None, False, 1
+    channels = max(1, channels) if prefer_grpc else 1
+    key = (timeout, prefer_grpc, channels)
+    with _lock:
+        if key not in _clients:
+            clients = [make_client(prefer_grpc, timeout or QDRANT_TIMEOUT) for _ in range(channels)]
+            _clients[key] = clients[0] if channels == 1 else ChannelPool(clients)
+        return _clients[key]
+
+
+def describe():
+    """Human-readable description of the configured connection."""
+    if QDRANT_URL == ":memory:":
+        return "in-memory Qdrant"
+    transport = f"gRPC (port {QDRANT_GRPC_PORT}, {QDRANT_GRPC_CHANNELS} channel(s))" if QDRANT_PREFER_GRPC else "REST"
+    return f"Qdrant at {QDRANT_URL} over {transport}"
@@ -1,16 +1,37 @@
 import os
 import json
 import time
+import random
+import hashlib
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
 import requests
 import re
 from dotenv import load_dotenv
-from qdrant_client import QdrantClient
+from qdrant_client import models
 from sentence_transformers import SentenceTransformer
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import os.path
 import warnings
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
+from payload_store import PayloadStore
+from metrics import span, CACHE_LOOKUPS, WEB_SEARCHES, GROQ_REQUESTS, GROQ_ERRORS, GROQ_QUEUE_WAIT, GROQ_COALESCED, GROQ_HEDGES, GROQ_HEDGE_DEADLINE
+from rate_limit import RateLimiter, RateLimitTimeout, SingleFlight, SingleFlightTimeout
+import page_fetch
+from ivfpq import load_local_indexes, rerank, IVF_NPROBE, IVF_RERANK_FACTOR
+import qdrant_access
+from qdrant_access import QDRANT_TIMEOUT
+from resilience import (
+    Deadline, DeadlineExceeded, CircuitBreaker, CircuitOpenError, deadline_scope, current_deadline, stage_timeout
+)
+from context_compression import COMPRESS_ENABLED, compress_contexts
+from facets import AIRCRAFT_MODEL_FIELD, AIRCRAFT_TYPE_FIELD, ISSUE_CATEGORY_FIELD
+from scheduler import is_degraded, Overloaded, SCHED_CONCURRENCY
+
 # Import the free web search function
 from duckduckgo_search import DDGS
 
@@ -21,6 +42,8 @@ load_dotenv()
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+WEB_SEARCH_URL = os.getenv("WEB_SEARCH_URL")  # Optional JSON search endpoint used instead of DuckDuckGo
 COLLECTION_1 = "aircraft_maintenance_logs"
 COLLECTION_2 = "acn"
 EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
@@ -29,7 +52,49 @@ SIM_THRESHOLD = 0.5  # Balanced threshold
 WEB_SEARCH_ENABLED = True  # Enable web search
 HYBRID_MODE = True  # Use both vector DB and web search
 WEB_SEARCH_NUM = 3  # Number of search results to return
-DIAGNOSTIC_MODE = True  # Print diagnostic information to help troubleshoot
+DIAGNOSTIC_MODE = os.getenv("DIAGNOSTIC_MODE", "true").lower() == "true"  # Emit per-hit diagnostics at DEBUG level
+DIAGNOSTIC_SAMPLE_RATE = float(os.getenv("DIAGNOSTIC_SAMPLE_RATE", "0.05"))  # Fraction of requests whose per-hit diagnostics are logged
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))  # Concurrent Groq/web calls per batch
+GROQ_RPM_LIMIT = int(os.getenv("GROQ_RPM_LIMIT", "30"))  # Client-side requests-per-minute budget (0 = unlimited)
+GROQ_TPM_LIMIT = int(os.getenv("GROQ_TPM_LIMIT", "30000"))  # Client-side tokens-per-minute budget (0 = unlimited)
+GROQ_LIMIT_MAX_WAIT = float(os.getenv("GROQ_LIMIT_MAX_WAIT", "60"))  # Give up if the budget isn't available within this many seconds
+
+# Per-call timeouts; each is further shortened to whatever is left of the request deadline
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))
+WEB_SEARCH_TIMEOUT = float(os.getenv("WEB_SEARCH_TIMEOUT", "10"))
+COLLECTIONS_REFRESH_INTERVAL = float(os.getenv("COLLECTIONS_REFRESH_INTERVAL", "30"))  # Seconds the collection/alias list is cached
+ANSWER_TIME_RESERVE = float(os.getenv("ANSWER_TIME_RESERVE", "8"))  # Skip web search when less than this is left for the answer
+
+# Hedged Groq requests: if the primary model is slower than its recent latency percentile,
+# send the same prompt to an alternate model/endpoint and take whichever answers first
+GROQ_HEDGE_ENABLED = os.getenv("GROQ_HEDGE_ENABLED", "false").lower() == "true"
+GROQ_HEDGE_PERCENTILE = float(os.getenv("GROQ_HEDGE_PERCENTILE", "95"))  # Primary latency percentile used as the hedge deadline
+GROQ_HEDGE_MIN_DELAY = float(os.getenv("GROQ_HEDGE_MIN_DELAY", "0.5"))  # Never hedge sooner than this (seconds)
+GROQ_HEDGE_DEFAULT_DELAY = float(os.getenv("GROQ_HEDGE_DEFAULT_DELAY", "5.0"))  # Deadline until enough latencies are recorded
+GROQ_HEDGE_MIN_SAMPLES = int(os.getenv("GROQ_HEDGE_MIN_SAMPLES", "20"))
+GROQ_HEDGE_WINDOW = int(os.getenv("GROQ_HEDGE_WINDOW", "200"))  # Recent primary latencies kept for the percentile
+
+logger = logging.getLogger("rag_pipeline")
+
+# Confidence router: skip web search / LLM keyword generation when the DB answer is strong
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+ROUTER_SKIP_WEB_SCORE = float(os.getenv("ROUTER_SKIP_WEB_SCORE", "0.75"))  # Raw vector score that makes web search unnecessary
+ROUTER_MIN_RELEVANT_HITS = int(os.getenv("ROUTER_MIN_RELEVANT_HITS", "1"))  # Relevant hits required before skipping web search
+ROUTER_LLM_KEYWORDS_MAX_SCORE = float(os.getenv("ROUTER_LLM_KEYWORDS_MAX_SCORE", "0.6"))  # Above this, the query is on-topic enough to search as-is
+
+# Qdrant only holds these small fields; the full texts live in the local payload store
+PAYLOAD_FIELDS = {
+    COLLECTION_1: ["source", "csv_row", "original_file", ISSUE_CATEGORY_FIELD],
+    COLLECTION_2: ["acn", "duplicate_acns", AIRCRAFT_MODEL_FIELD, AIRCRAFT_TYPE_FIELD, ISSUE_CATEGORY_FIELD],
+}
+
+# Facet fields each collection is tagged with at ingestion (see facets.py). A filter
+# only applies to collections that carry its field: the maintenance logs don't name
+# aircraft, so an aircraft filter narrows the ACN reports and leaves the logs alone.
+FACET_FIELDS = {
+    COLLECTION_1: [ISSUE_CATEGORY_FIELD],
+    COLLECTION_2: [AIRCRAFT_MODEL_FIELD, ISSUE_CATEGORY_FIELD],
+}
 
 # Determine which model to use
 def get_groq_model():
@@ -51,6 +116,9 @@ def get_groq_model():
 
 # Get the model to use
 GROQ_MODEL = get_groq_model()
+GROQ_HEDGE_MODEL = os.getenv("GROQ_HEDGE_MODEL", GROQ_MODEL)  # Alternate model for hedge requests
+GROQ_HEDGE_URL = os.getenv("GROQ_HEDGE_URL", GROQ_API_URL)  # Alternate endpoint for hedge requests
+GROQ_DEGRADED_MODEL = os.getenv("GROQ_DEGRADED_MODEL", GROQ_MODEL)  # Model for requests degraded under load; the primary one unless set
 
 # Validate environment variables
 required_vars = ["QDRANT_URL", "QDRANT_API_KEY", "GROQ_API_KEY"]
@@ -60,8 +128,51 @@ for var in required_vars:
 
 # Initialize clients
 print("Initializing clients...")
-qdrant = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, timeout=30)
+print(f"Connecting to {qdrant_access.describe()}...")
+qdrant = qdrant_access.get_client()
 embedder = SentenceTransformer(EMBED_MODEL_NAME)
+payload_store = PayloadStore()
+# One breaker per external dependency: after repeated failures calls fail fast and the
+# pipeline degrades (no DB contexts, no web search, or an extractive answer without the LLM)
+qdrant_breaker = CircuitBreaker("qdrant")
+groq_breaker = CircuitBreaker("groq")
+web_breaker = CircuitBreaker("web_search")
+BREAKERS = [qdrant_breaker, groq_breaker, web_breaker]
+# Optional in-process IVF-PQ indexes (LOCAL_INDEX_DIR, built with `python ivfpq.py build`), keyed
+# by the versioned collection each alias points at; loaded by available_collections
+local_indexes = {}
+groq_limiter = RateLimiter(GROQ_RPM_LIMIT, GROQ_TPM_LIMIT)
+groq_singleflight = SingleFlight()
+groq_latencies = deque(maxlen=GROQ_HEDGE_WINDOW)
+groq_latency_lock = threading.Lock()
+# Room for a primary and a hedge per concurrent Groq caller: every scheduler slot plus one batch
+groq_hedge_pool = ThreadPoolExecutor(max_workers=2 * (SCHED_CONCURRENCY + BATCH_MAX_CONCURRENCY), thread_name_prefix="groq-hedge")
+
+_diagnostics = threading.local()
+
+@contextmanager
+def diagnostics_scope(sampled=None):
+    """
+    Decide once per request whether its verbose diagnostics are logged, so every
+    check in the request agrees. Pass `sampled` to carry an earlier decision over
+    to work done for the same request on another thread.
+    """
+    previous = getattr(_diagnostics, "sampled", None)
+    if sampled is None:
+        sampled = DIAGNOSTIC_MODE and logger.isEnabledFor(logging.DEBUG) and random.random() < DIAGNOSTIC_SAMPLE_RATE
+    _diagnostics.sampled = sampled
+    try:
+        yield sampled
+    finally:
+        _diagnostics.sampled = previous
+
+def sample_diagnostics():
+    """Whether the current request's verbose diagnostics should be logged."""
+    sampled = getattr(_diagnostics, "sampled", None)
+    if sampled is None:
+        # Outside a request scope (scripts, direct calls): decide per call
+        return DIAGNOSTIC_MODE and logger.isEnabledFor(logging.DEBUG) and random.random() < DIAGNOSTIC_SAMPLE_RATE
+    return sampled
 
 def is_relevant_to_query(query, text, min_relevance=0.4):
     """
@@ -77,8 +188,8 @@ def is_relevant_to_query(query, text, min_relevance=0.4):
     # Calculate cosine similarity
     similarity = cosine_similarity(query_embedding, text_embedding)[0][0]
     
-    if DIAGNOSTIC_MODE:
-        print(f"Direct relevance check: '{query}' vs text - Similarity: {similarity:.3f}")
+    if sample_diagnostics():
+        logger.debug("Direct relevance check: %r vs text - Similarity: %.3f", query, similarity)
     
     return similarity > min_relevance
 
@@ -119,81 +230,94 @@ def is_helpful_for_query(query, text):
     # Check if text is generic template
     is_template = contains_template_language(text)
     
-    if DIAGNOSTIC_MODE:
-        print(f"Keyword match ratio: {keyword_match_ratio:.2f}, Is template: {is_template}")
+    if sample_diagnostics():
+        logger.debug("Keyword match ratio: %.2f, Is template: %s", keyword_match_ratio, is_template)
     
     # Text is helpful if it has good keyword matches and isn't just a template
     return keyword_match_ratio > 0.3 and not is_template
 
-def retrieve_contexts(query, query_embedding, top_k=3):
+def hydrate_payloads(coll, hits):
     """
-    Search both collections, return merged contexts sorted by score.
-    Using the search method since that's what's working in your system.
+    Merge the full texts from the local payload store into the small Qdrant payloads.
+    Only the hits passed in are looked up, in one batched read. Points loaded before
+    the payload store existed still carry their texts in Qdrant, so any id missing
+    from the store is fetched from Qdrant in a single retrieve call.
+    """
+    payloads = {str(hit.id): dict(hit.payload or {}) for hit in hits}
+    stored = payload_store.get_many(coll, payloads.keys())
+    for point_id, fields in stored.items():
+        payloads[point_id].update(fields)
+
+    missing = list({str(hit.id): hit.id for hit in hits if str(hit.id) not in stored}.values())
+    CACHE_LOOKUPS.inc(len(stored), cache="payload_store", result="hit")
+    CACHE_LOOKUPS.inc(len(missing), cache="payload_store", result="miss")
+    if missing:
+        try:
+            points = qdrant_breaker.call(
+                qdrant.retrieve, collection_name=coll, ids=missing, with_payload=True,
+                timeout=max(1, int(stage_timeout(QDRANT_TIMEOUT)))
+            )
+            for point in points:
+                payloads[str(point.id)].update(point.payload or {})
+        except Exception as e:
+            logger.error("Error hydrating payloads from %s: %s", coll, e)
+
+    return payloads
+
+def embed_query(user_q):
+    """Embed a single query with the same normalization used at ingestion."""
+    return embedder.encode([user_q], normalize_embeddings=True)[0]
+
+def score_hits(query, coll, hits, payloads, diagnostics=False):
+    """
+    Build context entries for one collection's hits and check each one for
+    relevance to the query. Returns (results, relevant_count).
     """
     results = []
     relevant_count = 0
     
-    for coll in (COLLECTION_1, COLLECTION_2):
-        try:
-            # Check if collection exists
-            collections = qdrant.get_collections().collections
-            collection_names = [c.name for c in collections]
-            
-            if coll not in collection_names:
-                print(f"Warning: Collection '{coll}' not found. Available collections: {collection_names}")
-                continue
-                
-            # Use the original search method with DeprecationWarning suppressed
-            with warnings.catch_warnings():
-                warnings.filterwarnings("ignore", category=DeprecationWarning)
-                hits = qdrant.search(
-                    collection_name=coll,
-                    query_vector=query_embedding,
-                    limit=top_k,
-                    with_payload=True
-                )
+    for hit in hits:
+        # Extract payload
+        payload = payloads[str(hit.id)]
+        score = hit.score if hasattr(hit, 'score') else 0
+        
+        # Extract text based on collection schema
+        if coll == COLLECTION_1:  # aircraft_maintenance_logs
+            text = f"Problem: {payload.get('problem', '')}\nAction: {payload.get('action', '')}"
+        else:  # acn collection
+            text = payload.get("text_chunk", "")
+            synopsis = payload.get("synp", "")
+            if synopsis:
+                text += f"\n\nSynopsis: {synopsis}"
+        
+        # Check if the text is actually helpful for this query
+        is_helpful = is_helpful_for_query(query, text)
+        is_relevant = is_relevant_to_query(query, text)
+        
+        if diagnostics:
+            logger.debug(
+                "Document from %s: raw score %.3f, relevant=%s, helpful=%s, snippet=%r",
+                coll, score, is_relevant, is_helpful, text[:100]
+            )
+        
+        # Only include if it's actually relevant or has a very high score
+        if is_helpful or is_relevant or score > 0.85:
+            results.append({
+                "collection": coll,
+                "score": score,
+                "payload": payload,
+                "text": text,
+                "is_helpful": is_helpful,
+                "is_relevant": is_relevant
+            })
             
-            for hit in hits:
-                # Extract payload
-                payload = hit.payload if hasattr(hit, 'payload') else {}
-                score = hit.score if hasattr(hit, 'score') else 0
-                
-                # Extract text based on collection schema
-                if coll == COLLECTION_1:  # aircraft_maintenance_logs
-                    text = f"Problem: {payload.get('problem', '')}\nAction: {payload.get('action', '')}"
-                else:  # acn collection
-                    text = payload.get("text_chunk", "")
-                    synopsis = payload.get("synp", "")
-                    if synopsis:
-                        text += f"\n\nSynopsis: {synopsis}"
-                
-                # Check if the text is actually helpful for this query
-                is_helpful = is_helpful_for_query(query, text)
-                is_relevant = is_relevant_to_query(query, text)
-                
-                if DIAGNOSTIC_MODE:
-                    print(f"\nDocument from {coll}:")
-                    print(f"Raw score: {score:.3f}")
-                    print(f"Is relevant: {is_relevant}")
-                    print(f"Is helpful: {is_helpful}")
-                    print(f"Text snippet: {text[:100]}...")
-                
-                # Only include if it's actually relevant or has a very high score
-                if is_helpful or is_relevant or score > 0.85:
-                    results.append({
-                        "collection": coll,
-                        "score": score,
-                        "payload": payload,
-                        "text": text,
-                        "is_helpful": is_helpful,
-                        "is_relevant": is_relevant
-                    })
-                    
-                    if is_helpful or is_relevant:
-                        relevant_count += 1
-        except Exception as e:
-            print(f"Error searching collection {coll}: {e}")
+            if is_helpful or is_relevant:
+                relevant_count += 1
     
+    return results, relevant_count
+
+def rank_results(results, relevant_count, top_k, diagnostics=False):
+    """Sort merged hits by combined score and summarize their relevance."""
     # Sort by a combined score that prioritizes helpfulness
     for res in results:
         combined_score = res["score"]
@@ -205,23 +329,254 @@ def retrieve_contexts(query, query_embedding, top_k=3):
     
     results.sort(key=lambda x: x["combined_score"], reverse=True)
     
-    if DIAGNOSTIC_MODE:
-        print(f"\nFound {len(results)} total hits, {relevant_count} relevant hits")
-        if results:
-            print(f"Top result combined score: {results[0]['combined_score']:.3f}")
+    if diagnostics:
+        logger.debug(
+            "Found %d total hits, %d relevant hits, top combined score %.3f",
+            len(results), relevant_count, results[0]["combined_score"] if results else 0
+        )
     
     # Return info about relevance along with results
     return {
         "results": results[:top_k*2],  # Return top results from both collections
         "found_relevant": relevant_count > 0,
-        "top_score": results[0]["combined_score"] if results else 0
+        "top_score": results[0]["combined_score"] if results else 0,
+        "top_raw_score": max((r["score"] for r in results), default=0),
+        "relevant_count": relevant_count
     }
 
+def facet_filter(coll, filters):
+    """Qdrant filter for the facets in `filters` ({field: value}) that `coll` is tagged with."""
+    conditions = [
+        models.FieldCondition(key=field, match=models.MatchValue(value=value))
+        for field, value in (filters or {}).items()
+        if field in FACET_FIELDS.get(coll, [])
+    ]
+    return models.Filter(must=conditions) if conditions else None
+
+def local_index(coll):
+    """The IVF-PQ index built from the version `coll` currently points at, or None."""
+    return local_indexes.get(_collection_names["targets"].get(coll, coll))
+
+def rerank_shortlists(coll, query_embeddings, shortlists, top_k):
+    """
+    Exact top_k hits for each IVF-PQ shortlist. One Qdrant retrieve fetches the
+    shortlisted points' vectors and small payload fields (the index holds neither);
+    PQ scores are too coarse to compare with the router's score thresholds.
+    """
+    ids = list({str(i): i for shortlist in shortlists for i in shortlist}.values())
+    if not ids:
+        return [[] for _ in shortlists]
+    points = qdrant_breaker.call(
+        qdrant.retrieve, collection_name=coll, ids=ids, with_payload=PAYLOAD_FIELDS.get(coll, True),
+        with_vectors=True, timeout=max(1, int(stage_timeout(QDRANT_TIMEOUT)))
+    )
+    by_id = {str(p.id): p for p in points}
+    results = []
+    for emb, shortlist in zip(query_embeddings, shortlists):
+        found = [by_id[str(i)] for i in shortlist if str(i) in by_id]
+        top, scores = rerank(found, [p.vector for p in found], emb, top_k)
+        results.append([
+            models.ScoredPoint(id=p.id, version=0, score=float(score), payload=p.payload or {})
+            for p, score in zip(top, scores)
+        ])
+    return results
+
+def search_collection(coll, query_embedding, top_k, filters=None):
+    """
+    Nearest points of one collection. Uses the local IVF-PQ index when one is loaded
+    for the collection's current version and no facet filter applies (the index holds
+    no payloads), with its shortlist reranked exactly; otherwise Qdrant.
+    """
+    query_filter = facet_filter(coll, filters)
+    index = local_index(coll)
+    if index is not None and query_filter is None:
+        shortlist, _ = index.search(query_embedding, top_k * IVF_RERANK_FACTOR, IVF_NPROBE)
+        return rerank_shortlists(coll, [query_embedding], [shortlist], top_k)[0]
+    
+    # Use the original search method with DeprecationWarning suppressed
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=DeprecationWarning)
+        return qdrant_breaker.call(
+            qdrant.search,
+            collection_name=coll,
+            query_vector=query_embedding,
+            query_filter=query_filter,
+            limit=top_k,
+            with_payload=PAYLOAD_FIELDS.get(coll, True),
+            timeout=max(1, int(stage_timeout(QDRANT_TIMEOUT)))
+        )
+
+_collection_names = {"names": None, "targets": {}, "fetched": 0.0}
+
+def available_collections():
+    """
+    Names of the searchable collections that exist in Qdrant. Both are normally
+    aliases of versioned collections (see reindex.py); plain collections of the
+    same name from older loads work too. The lookup is cached for
+    COLLECTIONS_REFRESH_INTERVAL seconds; each refresh also swaps in the local
+    indexes of the versions the aliases now point at.
+    """
+    global local_indexes
+    now = time.monotonic()
+    collection_names = _collection_names["names"]
+    if collection_names is None or now - _collection_names["fetched"] > COLLECTIONS_REFRESH_INTERVAL:
+        collection_names = [c.name for c in qdrant_breaker.call(qdrant.get_collections).collections]
+        aliases = qdrant_breaker.call(qdrant.get_aliases).aliases
+        collection_names += [a.alias_name for a in aliases]
+        targets = {a.alias_name: a.collection_name for a in aliases}
+        versions = [targets.get(coll, coll) for coll in (COLLECTION_1, COLLECTION_2)]
+        # An index of a version no alias points at any more is dropped, never searched
+        local_indexes = load_local_indexes(versions, loaded=local_indexes)
+        _collection_names.update(names=collection_names, targets=targets, fetched=now)
+    for coll in (COLLECTION_1, COLLECTION_2):
+        if coll not in collection_names:
+            logger.warning("Collection '%s' not found. Available collections: %s", coll, collection_names)
+    return [coll for coll in (COLLECTION_1, COLLECTION_2) if coll in collection_names]
+
+def retrieve_contexts(query, query_embedding, top_k=3, filters=None):
+    """
+    Search both collections, return merged contexts sorted by score.
+    Using the search method since that's what's working in your system.
+    `filters` ({facet field: value}) restricts the search to matching points.
+    """
+    results = []
+    relevant_count = 0
+    diagnostics = sample_diagnostics()
+    
+    try:
+        collections = available_collections()
+    except CircuitOpenError:
+        logger.warning("Qdrant circuit open, answering without database contexts")
+        collections = []
+    except Exception as e:
+        logger.error("Error listing collections: %s", e)
+        collections = []
+    
+    for coll in collections:
+        try:
+            hits = search_collection(coll, query_embedding, top_k, filters)
+            
+            # Fetch the full texts only for the hits Qdrant returned
+            payloads = hydrate_payloads(coll, hits)
+            coll_results, coll_relevant = score_hits(query, coll, hits, payloads, diagnostics)
+            results.extend(coll_results)
+            relevant_count += coll_relevant
+        except Exception as e:
+            logger.error("Error searching collection %s: %s", coll, e)
+    
+    context_info = rank_results(results, relevant_count, top_k, diagnostics)
+    if COMPRESS_ENABLED:
+        # Keep only the sentences of each context that are closest to the question
+        compress_contexts(context_info["results"], query_embedding)
+    return context_info
+
+def retrieve_contexts_batch(queries, query_embeddings, top_k=3, filters=None):
+    """
+    Batched version of retrieve_contexts: one search_batch request and one
+    payload-store read per collection for all queries together.
+    `filters` is an optional list with one facet filter dict (or None) per query.
+    Returns one context_info dict per query, in order.
+    """
+    filters = filters or [None] * len(queries)
+    per_query = [([], 0) for _ in queries]
+    
+    try:
+        collections = available_collections()
+    except Exception as e:
+        logger.error("Error listing collections: %s", e)
+        collections = []
+    
+    for coll in collections:
+        try:
+            index = local_index(coll)
+            if index is not None and not any(facet_filter(coll, f) for f in filters):
+                # The local index shortlists each query in-process; one retrieve reranks them all
+                shortlists = [index.search(emb, top_k * IVF_RERANK_FACTOR, IVF_NPROBE)[0] for emb in query_embeddings]
+                batch_hits = rerank_shortlists(coll, query_embeddings, shortlists, top_k)
+            else:
+                requests_batch = [
+                    models.SearchRequest(
+                        vector=list(map(float, emb)),
+                        filter=facet_filter(coll, query_filters),
+                        limit=top_k,
+                        with_payload=PAYLOAD_FIELDS.get(coll, True)
+                    )
+                    for emb, query_filters in zip(query_embeddings, filters)
+                ]
+                with warnings.catch_warnings():
+                    warnings.filterwarnings("ignore", category=DeprecationWarning)
+                    batch_hits = qdrant_breaker.call(
+                        qdrant.search_batch, collection_name=coll, requests=requests_batch,
+                        timeout=max(1, int(stage_timeout(QDRANT_TIMEOUT)))
+                    )
+            
+            payloads = hydrate_payloads(coll, [hit for hits in batch_hits for hit in hits])
+            for i, (query, hits) in enumerate(zip(queries, batch_hits)):
+                coll_results, coll_relevant = score_hits(query, coll, hits, payloads)
+                results, relevant_count = per_query[i]
+                per_query[i] = (results + coll_results, relevant_count + coll_relevant)
+        except Exception as e:
+            logger.error("Error batch searching collection %s: %s", coll, e)
+    
+    context_infos = [rank_results(results, relevant_count, top_k) for results, relevant_count in per_query]
+    if COMPRESS_ENABLED:
+        for context_info, emb in zip(context_infos, query_embeddings):
+            compress_contexts(context_info["results"], emb)
+    return context_infos
+
 def call_groq_api(prompt, max_tokens=512, temperature=0.0):
     """
     Call the Groq API to generate a response from a prompt.
     Uses the determined model name from get_groq_model().
+    Identical prompts already in flight share one upstream call; a caller waiting
+    on one gives up at its own deadline, and one whose leader failed makes its own
+    call. Requests the scheduler degraded under load use GROQ_DEGRADED_MODEL.
     """
+    model = GROQ_DEGRADED_MODEL if is_degraded() else GROQ_MODEL
+    key = hashlib.sha256(
+        json.dumps([model, prompt, max_tokens, temperature]).encode("utf-8")
+    ).hexdigest()
+    
+    def call():
+        result = send_groq_request(prompt, max_tokens, temperature, model)
+        if result.startswith("Error generating response"):
+            # Failures are the leader's own (its deadline, its budget): don't share them
+            raise GroqCallFailed(result)
+        return result
+    
+    deadline = current_deadline()
+    try:
+        result, shared = groq_singleflight.do(key, call, timeout=deadline.remaining() if deadline else None)
+    except GroqCallFailed as e:
+        return str(e)
+    except SingleFlightTimeout:
+        GROQ_ERRORS.inc(reason="deadline")
+        return "Error generating response: no answer before the request deadline"
+    if shared:
+        GROQ_COALESCED.inc()
+    return result
+
+class GroqCallFailed(Exception):
+    """A Groq call that ended in an error message (see send_groq_request)."""
+
+class GroqCallCancelled(Exception):
+    """Raised when a hedged Groq call lost the race before it was sent."""
+
+def groq_chat_completion(prompt, max_tokens, temperature, model=None, url=None, cancelled=None, timeout=None):
+    """
+    Send one chat completion request once the client-side rate limiter has
+    budget for it and return the answer text. Raises on any failure.
+    `cancelled` is an optional threading.Event checked just before sending.
+    `timeout` defaults to GROQ_TIMEOUT cut to the current request deadline.
+    """
+    model = model or GROQ_MODEL
+    url = url or GROQ_API_URL
+    timeout = timeout or stage_timeout(GROQ_TIMEOUT)
+    started = time.monotonic()
+    
+    # Rough token estimate (~4 characters per token) plus the completion budget
+    estimated_tokens = len(prompt) // 4 + max_tokens
+    
     # Get API key from environment
     api_key = os.getenv("GROQ_API_KEY", "").strip()
     
@@ -231,34 +586,169 @@ def call_groq_api(prompt, max_tokens=512, temperature=0.0):
     }
     
     data = {
-        "model": GROQ_MODEL,
+        "model": model,
         "messages": [{"role": "user", "content": prompt}],
         "max_tokens": max_tokens,
         "temperature": temperature
     }
     
-    try:
-        print(f"Sending request to Groq API with model: {GROQ_MODEL}")
-        
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=30
-        )
-        
-        print(f"Response status code: {response.status_code}")
+    waited = groq_limiter.acquire(estimated_tokens, max_wait=min(GROQ_LIMIT_MAX_WAIT, timeout))
+    GROQ_QUEUE_WAIT.observe(waited)
+    if cancelled is not None and cancelled.is_set():
+        groq_limiter.reconcile(estimated_tokens, 0)
+        raise GroqCallCancelled("cancelled before sending")
+    
+    logger.debug("Sending request to Groq API with model: %s", model)
+    
+    remaining = timeout - (time.monotonic() - started)
+    if remaining <= 0:
+        groq_limiter.reconcile(estimated_tokens, 0)
+        raise DeadlineExceeded("no time left to call Groq")
+    
+    response = requests.post(
+        url,
+        headers=headers,
+        json=data,
+        timeout=remaining
+    )
+    
+    logger.debug("Response status code: %s", response.status_code)
+    
+    if response.status_code != 200:
+        logger.error("Error response: %s", response.text)
+    
+    if response.status_code == 429:
+        # Upstream says we're over the limit: hold every caller back for a while
+        try:
+            retry_after = float(response.headers.get("retry-after", 1))
+        except ValueError:
+            retry_after = 1.0
+        groq_limiter.pause(retry_after)
         
-        if response.status_code != 200:
-            print(f"Error response: {response.text}")
+    response.raise_for_status()
+    body = response.json()
+    groq_limiter.reconcile(estimated_tokens, body.get("usage", {}).get("total_tokens"))
+    return body["choices"][0]["message"]["content"]
+
+def record_groq_latency(seconds):
+    """Remember how long a successful primary call took."""
+    with groq_latency_lock:
+        groq_latencies.append(seconds)
+
+def hedge_deadline():
+    """Seconds to wait for the primary model before sending the hedge request."""
+    with groq_latency_lock:
+        samples = list(groq_latencies)
+    if len(samples) < GROQ_HEDGE_MIN_SAMPLES:
+        return GROQ_HEDGE_DEFAULT_DELAY
+    return max(GROQ_HEDGE_MIN_DELAY, float(np.percentile(samples, GROQ_HEDGE_PERCENTILE)))
+
+def hedged_chat_completion(prompt, max_tokens, temperature):
+    """
+    Send the request to the primary model; if it hasn't answered by the hedge
+    deadline, send the same request to the hedge model/endpoint and return
+    whichever answers first. The loser is cancelled if it hasn't been sent yet,
+    otherwise its result is discarded.
+    
+    The hedge delay and the primary's latency are measured from when the primary
+    starts running on the pool, so time queued for a pool thread never triggers
+    a hedge or skews the latency percentile.
+    """
+    deadline = hedge_deadline()
+    GROQ_HEDGE_DEADLINE.set(deadline)
+    
+    # The pool threads don't see this request's deadline, so hand both calls the same end time
+    give_up = time.monotonic() + stage_timeout(GROQ_TIMEOUT)
+    
+    def time_left():
+        return max(0.001, give_up - time.monotonic())
+    
+    primary_started = threading.Event()
+    primary_cancel = threading.Event()
+    
+    def run_primary():
+        primary_started.set()
+        start = time.perf_counter()
+        result = groq_chat_completion(prompt, max_tokens, temperature, GROQ_MODEL, GROQ_API_URL, primary_cancel, time_left())
+        record_groq_latency(time.perf_counter() - start)
+        return result
+    
+    primary = groq_hedge_pool.submit(run_primary)
+    if not primary_started.wait(max(0.0, give_up - time.monotonic())):
+        primary_cancel.set()
+        primary.cancel()
+        raise DeadlineExceeded("no Groq worker free before the request deadline")
+    
+    done, _ = wait([primary], timeout=min(deadline, time_left()))
+    if done:
+        GROQ_HEDGES.inc(outcome="not_needed")
+        return primary.result()
+    
+    logger.info("Primary Groq call exceeded %.2fs, hedging with %s", deadline, GROQ_HEDGE_MODEL)
+    hedge_cancel = threading.Event()
+    hedge = groq_hedge_pool.submit(
+        lambda: groq_chat_completion(prompt, max_tokens, temperature, GROQ_HEDGE_MODEL, GROQ_HEDGE_URL, hedge_cancel,
+                                     time_left())
+    )
+    pending = {primary: ("primary", primary_cancel), hedge: ("hedge", hedge_cancel)}
+    first_error = None
+    
+    while pending:
+        done, _ = wait(pending, timeout=max(0.0, give_up - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            for other, (_, cancel) in pending.items():
+                cancel.set()
+                other.cancel()
+            GROQ_HEDGES.inc(outcome="both_failed")
+            raise DeadlineExceeded("no Groq answer before the request deadline")
+        for future in done:
+            name, _ = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                first_error = first_error or e
+                continue
             
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
+            # Cancel the other call
+            for other, (_, cancel) in pending.items():
+                cancel.set()
+                other.cancel()
+            GROQ_HEDGES.inc(outcome=f"{name}_won")
+            return result
+    
+    GROQ_HEDGES.inc(outcome="both_failed")
+    raise first_error
+
+def send_groq_request(prompt, max_tokens, temperature, model=None):
+    """
+    Send one chat completion request to Groq (hedged when GROQ_HEDGE_ENABLED and
+    `model` is the primary model). Returns the answer text, or an error message on
+    failure. Fails fast while the Groq circuit breaker is open.
+    """
+    if not groq_breaker.allow():
+        GROQ_ERRORS.inc(reason="circuit_open")
+        return "Error generating response: Groq circuit open"
+    try:
+        if GROQ_HEDGE_ENABLED and model in (None, GROQ_MODEL):
+            content = hedged_chat_completion(prompt, max_tokens, temperature)
+        else:
+            content = groq_chat_completion(prompt, max_tokens, temperature, model)
+        groq_breaker.record_success()
+        GROQ_REQUESTS.inc(result="ok")
+        return content
     except Exception as e:
-        print(f"Error calling Groq API: {e}")
+        if isinstance(e, (DeadlineExceeded, RateLimitTimeout)):
+            # Out of time or local budget: says nothing about Groq's health
+            groq_breaker.release()
+        else:
+            groq_breaker.record_failure(e)
+        GROQ_REQUESTS.inc(result="error")
+        logger.error("Error calling Groq API: %s", e)
         if hasattr(e, 'response') and e.response is not None:
-            print(f"Response status: {e.response.status_code}")
-            print(f"Response body: {e.response.text}")
+            GROQ_ERRORS.inc(reason=f"http_{e.response.status_code}")
+            logger.error("Response status: %s, body: %s", e.response.status_code, e.response.text)
+        else:
+            GROQ_ERRORS.inc(reason=type(e).__name__)
         return f"Error generating response: {str(e)}"
 
 def generate_search_query(user_q):
@@ -303,17 +793,92 @@ def generate_search_query(user_q):
     # Fallback to just using the query
     return user_q
 
-def web_search(keywords, num_results=5):
+def extract_keywords(user_q, max_terms=6):
+    """
+    Pull search keywords out of the query locally, without an LLM call.
+    Keeps the longer non-stop-words in their original order.
+    """
+    stop_words = set(['the', 'a', 'an', 'are', 'is', 'for', 'in', 'on', 'at', 'of', 'to', 'with', 'and', 'or',
+                      'what', 'which', 'how', 'should', 'could', 'would', 'does', 'there', 'this', 'that', 'when'])
+    words = re.findall(r"[A-Za-z0-9#\-/]+", user_q)
+    keywords = []
+    for word in words:
+        if len(word) > 3 and word.lower() not in stop_words and word.lower() not in keywords:
+            keywords.append(word.lower())
+    return " ".join(keywords[:max_terms]) or user_q
+
+def route_request(user_q, context_info):
+    """
+    Decide per request whether web search is needed and, if so, whether
+    the search keywords need a Groq call. Returns a dict describing the route.
+    """
+    top_raw = context_info.get("top_raw_score", 0)
+    relevant = context_info.get("relevant_count", 0)
+    long_query = len(user_q.split()) > 5
+
+    deadline = current_deadline()
+    
+    if not WEB_SEARCH_ENABLED:
+        route = {"web_search": False, "llm_keywords": False, "reason": "web search disabled"}
+    elif web_breaker.is_open():
+        route = {"web_search": False, "llm_keywords": False, "reason": "web search circuit open"}
+    elif is_degraded():
+        route = {"web_search": False, "llm_keywords": False, "reason": "degraded under load"}
+    elif deadline is not None and deadline.remaining() < ANSWER_TIME_RESERVE:
+        route = {"web_search": False, "llm_keywords": False,
+                 "reason": f"only {deadline.remaining():.1f}s left for the answer"}
+    elif not ROUTER_ENABLED:
+        # Original behaviour: hybrid mode always searches the web, and keywords always come from
+        # generate_search_query (which handles short queries itself without calling Groq)
+        needs_web = not context_info["found_relevant"] or HYBRID_MODE or context_info["top_score"] < SIM_THRESHOLD
+        route = {"web_search": needs_web, "llm_keywords": needs_web, "reason": "router disabled"}
+    elif top_raw >= ROUTER_SKIP_WEB_SCORE and relevant >= ROUTER_MIN_RELEVANT_HITS:
+        route = {"web_search": False, "llm_keywords": False,
+                 "reason": f"confident DB hit (score {top_raw:.3f}, {relevant} relevant)"}
+    elif long_query and top_raw < ROUTER_LLM_KEYWORDS_MAX_SCORE:
+        route = {"web_search": True, "llm_keywords": True,
+                 "reason": f"weak DB match (score {top_raw:.3f}), long query"}
+    else:
+        route = {"web_search": True, "llm_keywords": False,
+                 "reason": f"partial DB match (score {top_raw:.3f}), local keywords"}
+
+    if route["llm_keywords"] and groq_breaker.is_open():
+        route["llm_keywords"] = False
+        route["reason"] += "; Groq circuit open, local keywords"
+    
+    logger.info("Route: web_search=%s llm_keywords=%s (%s)", route["web_search"], route["llm_keywords"], route["reason"])
+    return route
+
+def search_backend(search_terms, num_results):
+    """
+    Return raw search results as a list of {title, body, href} dicts.
+    Uses DuckDuckGo unless WEB_SEARCH_URL points at a JSON search endpoint.
+    """
+    if WEB_SEARCH_URL:
+        response = requests.get(
+            WEB_SEARCH_URL,
+            params={"q": search_terms, "max_results": num_results},
+            timeout=stage_timeout(WEB_SEARCH_TIMEOUT)
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    from duckduckgo_search import DDGS
+    return list(DDGS(timeout=int(stage_timeout(WEB_SEARCH_TIMEOUT)) or 1).text(search_terms, max_results=num_results))
+
+def embed_passages(texts):
+    """Embed page passages for selection against the query."""
+    return embedder.encode(texts, batch_size=EMBED_BATCH, normalize_embeddings=True)
+
+def web_search(keywords, num_results=5, query_embedding=None):
     """
     Enhanced DuckDuckGo search that ensures results are properly formatted
     with clear source information for citation.
+    With PAGE_FETCH_ENABLED the top result pages are fetched as well and their
+    passages closest to `query_embedding` are added to the snippets.
     """
     try:
-        # Initialize the DuckDuckGo search engine
-        from duckduckgo_search import DDGS
-        search = DDGS()
-        
-        print(f"Searching DuckDuckGo for: {keywords}")
+        logger.info("Searching DuckDuckGo for: %s", keywords)
         
         # Add aviation/maintenance terms for more relevant results
         search_terms = keywords
@@ -321,13 +886,32 @@ def web_search(keywords, num_results=5):
             search_terms += " aircraft maintenance"
         
         # Perform the search
-        results = list(search.text(search_terms, max_results=num_results))
+        try:
+            results = web_breaker.call(search_backend, search_terms, num_results)
+        except CircuitOpenError:
+            logger.warning("Web search circuit open, skipping search")
+            WEB_SEARCHES.inc(outcome="circuit_open")
+            return None
         
         if not results:
-            print("No DuckDuckGo results found!")
+            logger.warning("No DuckDuckGo results found!")
+            WEB_SEARCHES.inc(outcome="empty")
             return "No search results found."
         
-        print(f"Found {len(results)} search results")
+        logger.debug("Found %d search results", len(results))
+        WEB_SEARCHES.inc(outcome="ok")
+        
+        # Optionally pull the relevant passages from the result pages themselves
+        page_passages = {}
+        if page_fetch.PAGE_FETCH_ENABLED:
+            urls = [res.get("href", "").strip() for res in results[:page_fetch.PAGE_FETCH_TOP_N]]
+            if query_embedding is None:
+                query_embedding = embed_query(keywords)
+            with span("page_fetch", pages=len(urls)):
+                page_passages = page_fetch.fetch_passages(
+                    [u for u in urls if u], query_embedding, embed_passages,
+                    deadline=stage_timeout(page_fetch.PAGE_FETCH_DEADLINE)
+                )
         
         # Format the results with clear source formatting
         formatted_results = []
@@ -336,20 +920,23 @@ def web_search(keywords, num_results=5):
             body = res.get("body", "").strip()
             href = res.get("href", "").strip()
             
-            # Print the first result for debugging
+            # Log the first result for debugging
             if i == 1:
-                print(f"First result: {title[:50]}... - {body[:100]}...")
+                logger.debug("First result: %s... - %s...", title[:50], body[:100])
             
             # Format with clear source identification for better citation
             source_entry = f"Source {i}: {title}"
             content_entry = f"Content: {body}"
+            if href in page_passages:
+                content_entry += "\nPage excerpt: " + " ... ".join(page_passages[href])
             url_entry = f"URL: {href}"
             
             formatted_results.append(f"{source_entry}\n{content_entry}\n{url_entry}")
         
         return "\n\n".join(formatted_results)
     except Exception as e:
-        print(f"Error in web search: {e}")
+        logger.error("Error in web search: %s", e)
+        WEB_SEARCHES.inc(outcome="error")
         return f"Error performing web search: {str(e)}"
 def generate_answer(user_q, vector_results, web_snippets=None):
     """
@@ -376,6 +963,8 @@ def generate_answer(user_q, vector_results, web_snippets=None):
             source_name = c["payload"].get("source", "Aviation Safety Report")
             if "acn" in c["payload"]:
                 source_name += f" ACN-{c['payload']['acn']}"
+            if c["payload"].get("duplicate_acns"):
+                source_name += " (also reported as " + ", ".join(f"ACN-{a}" for a in c["payload"]["duplicate_acns"]) + ")"
         
         ctx = f"[{source_id}] {c['text']}"
         vector_contexts.append(ctx)
@@ -398,7 +987,7 @@ def generate_answer(user_q, vector_results, web_snippets=None):
                 for line in result.split("\n"):
                     if line.startswith("Source"):
                         continue
-                    elif line.startswith("Content:"):
+                    elif line.startswith("Content:") or line.startswith("Page excerpt:"):
                         continue
                     elif line.startswith("URL:"):
                         url_line = line.replace("URL:", "").strip()
@@ -471,12 +1060,16 @@ Use the source IDs (like [DB-1]) in your answer when citing specific information
     sources_text = "\n".join(sources)
     prompt += f"\n\nAvailable sources:\n{sources_text}"
     
-    # Print the actual prompt we're using for debugging
-    print("Prompt length:", len(prompt))
-    print("Prompt preview (first 200 chars):", prompt[:200])
+    # Log the actual prompt we're using for debugging
+    logger.debug("Prompt length: %d", len(prompt))
+    logger.debug("Prompt preview (first 200 chars): %s", prompt[:200])
     
     # Call Groq API to generate the answer
     response = call_groq_api(prompt, max_tokens=1024, temperature=0.1)
+    if response.startswith("Error generating response"):
+        # Groq is down or out of time: hand back the retrieved material itself
+        logger.warning("Answer generation failed (%s), returning retrieved contexts", response)
+        response = extractive_answer(vector_contexts, web_contexts)
     
     # Ensure the sources section is included in the response if it's not already there
     if "Sources:" not in response and sources:
@@ -485,56 +1078,242 @@ Use the source IDs (like [DB-1]) in your answer when citing specific information
     return response
 
 
-def rag_pipeline(user_q):
+def extractive_answer(vector_contexts, web_contexts, limit=3):
+    """Fallback answer when Groq is unavailable: the top retrieved contexts, verbatim."""
+    excerpts = (vector_contexts + web_contexts)[:limit]
+    return (
+        "The answer generator is unavailable right now, so here are the most relevant records found:\n\n"
+        + "\n\n".join(excerpts)
+    )
+
+def search_web_if_needed(user_q, context_info, query_embedding=None, route=None):
     """
-    Main RAG pipeline that balances vector DB and web search:
-    1. Embeds the user query
-    2. Retrieves relevant contexts with smart filtering
-    3. Performs web search based on relevance and user settings
-    4. Generates an answer using both sources when appropriate
+    Route the request and, if the router asks for it, search the web.
+    Returns the formatted web snippets, or None when web search was skipped.
+    Pass `route` to reuse a routing decision that was already made.
     """
-    # Embed the user query
-    q_emb = embedder.encode([user_q], normalize_embeddings=True)[0]
+    logger.info("Found %d relevant contexts", len(context_info["results"]))
     
-    # Retrieve contexts from Qdrant with improved relevance checking
-    context_info = retrieve_contexts(user_q, q_emb, top_k=3)
-    contexts = context_info["results"]
+    # Decide whether we need web search and LLM keyword generation
+    route = route or route_request(user_q, context_info)
     
-    # Print how many contexts were found
-    print(f"Found {len(contexts)} relevant contexts")
+    if not route["web_search"]:
+        WEB_SEARCHES.inc(outcome="skipped")
+        return None
     
-    # Determine if we should use web search
-    use_web_search = False
-    web_snips = None
+    logger.info("Using web search to supplement or replace vector results")
     
-    if WEB_SEARCH_ENABLED:
-        # Use web search if:
-        # 1. No relevant vector results found
-        # 2. In hybrid mode
-        # 3. Vector search scores are low
-        if not context_info["found_relevant"] or HYBRID_MODE or context_info["top_score"] < SIM_THRESHOLD:
-            print("[🌐] Using web search to supplement or replace vector results")
-            
-            # Generate search keywords
+    # Generate search keywords, only asking Groq when the router says so
+    with span("keywords", llm=route["llm_keywords"]):
+        if route["llm_keywords"]:
             kws = generate_search_query(user_q)
-            print(f"Generated search keywords: {kws}")
-            
-            # Perform web search
-            web_snips = web_search(kws)
-            use_web_search = True
+        else:
+            kws = extract_keywords(user_q)
+    logger.info("Generated search keywords: %s", kws)
     
-    # Generate answer based on context availability
+    # Perform web search
+    with span("web_search"):
+        return web_search(kws, query_embedding=query_embedding)
+
+def compose_answer(user_q, contexts, web_snips):
+    """Generate the answer from whatever contexts and web snippets we have."""
     if contexts or web_snips:
         # In hybrid mode, use both sources when available
         if HYBRID_MODE and contexts and web_snips:
-            print("[🔄] Using hybrid approach with both vector DB and web search")
+            logger.info("Using hybrid approach with both vector DB and web search")
         
         # Generate the answer
-        return generate_answer(user_q, contexts, web_snips)
+        with span("generate"):
+            return generate_answer(user_q, contexts, web_snips)
     else:
         return "Sorry, I couldn't find relevant information in the database or on the web to answer your question."
 
+def answer_question(user_q, context_info, query_embedding=None):
+    """
+    Everything after retrieval: route the request, optionally search the web,
+    and generate the answer from the retrieved contexts.
+    """
+    web_snips = search_web_if_needed(user_q, context_info, query_embedding)
+    return compose_answer(user_q, context_info["results"], web_snips)
+
+def rag_pipeline(user_q, session=None, filters=None, deadline=None):
+    """
+    Main RAG pipeline that balances vector DB and web search:
+    1. Embeds the user query
+    2. Retrieves relevant contexts with smart filtering
+    3. Performs web search based on relevance and user settings
+    4. Generates an answer using both sources when appropriate
+    Each stage runs inside a metrics span.
+    
+    With a conversation `session` (see sessions.py), a follow-up that stays close
+    to the session's earlier retrieval reuses its contexts and web snippets and
+    skips steps 2-3.
+    
+    `filters` ({facet field: value}, see facets.py) narrows retrieval to points
+    tagged with those aircraft models / issue categories.
+    
+    The whole request shares one `deadline` (REQUEST_DEADLINE seconds by default);
+    each stage's timeout is cut to whatever is left of it.
+    """
+    with deadline_scope(deadline or Deadline()), diagnostics_scope(), span("total"):
+        # Embed the user query
+        with span("embed"):
+            q_emb = embed_query(user_q)
+        
+        if session is None:
+            # Retrieve contexts from Qdrant with improved relevance checking
+            with span("retrieve"):
+                context_info = retrieve_contexts(user_q, q_emb, top_k=3, filters=filters)
+            
+            return answer_question(user_q, context_info, q_emb)
+        
+        with session.lock:
+            reuse, similarity = session.can_reuse(user_q, q_emb, filters)
+            if reuse:
+                logger.info("Session %s: reusing earlier retrieval (similarity %.3f)", session.id, similarity)
+                CACHE_LOOKUPS.inc(cache="session", result="hit")
+                context_info, web_snips = session.context_info, session.web_snippets
+                question = session.contextualize(user_q)
+            else:
+                CACHE_LOOKUPS.inc(cache="session", result="miss")
+                with span("retrieve"):
+                    context_info = retrieve_contexts(user_q, q_emb, top_k=3, filters=filters)
+                web_snips = search_web_if_needed(user_q, context_info, q_emb)
+                session.update_retrieval(q_emb, context_info, web_snips, filters)
+                question = user_q
+            
+            answer = compose_answer(question, context_info["results"], web_snips)
+            session.add_turn(user_q, answer)
+            return answer
+
+def rag_pipeline_progressive(user_q, session=None, filters=None, deadline=None):
+    """
+    Two-phase variant of rag_pipeline. Returns (fast_answer, refine):
+    - fast_answer is generated from the vector DB contexts alone, skipping
+      keyword generation and web search
+    - refine is None when the router wouldn't search the web anyway (the fast
+      answer is final), otherwise a callable that searches the web and returns
+      the web-augmented answer; run it in the background
+    With a session, the refined answer replaces the fast one in the session's
+    history and its web snippets become available to follow-ups.
+    `deadline` bounds the fast answer only; the refinement gets a fresh one.
+    """
+    with deadline_scope(deadline or Deadline()), diagnostics_scope() as sampled, span("fast_answer"):
+        with span("embed"):
+            q_emb = embed_query(user_q)
+        
+        lock = session.lock if session is not None else threading.Lock()
+        with lock:
+            if session is not None:
+                reuse, similarity = session.can_reuse(user_q, q_emb, filters)
+                CACHE_LOOKUPS.inc(cache="session", result="hit" if reuse else "miss")
+                if reuse:
+                    # Earlier contexts and web snippets still apply: one answer, no refinement
+                    logger.info("Session %s: reusing earlier retrieval (similarity %.3f)", session.id, similarity)
+                    answer = compose_answer(session.contextualize(user_q), session.context_info["results"], session.web_snippets)
+                    session.add_turn(user_q, answer)
+                    return answer, None
+            
+            with span("retrieve"):
+                context_info = retrieve_contexts(user_q, q_emb, top_k=3, filters=filters)
+            route = route_request(user_q, context_info)
+            if context_info["results"] or not route["web_search"]:
+                answer = compose_answer(user_q, context_info["results"], None)
+            else:
+                answer = "No matching maintenance records were found. Searching the web for an answer..."
+            
+            turn = {"question": user_q, "answer": answer}
+            if session is not None:
+                session.update_retrieval(q_emb, context_info, None, filters)
+                session.add_turn(user_q, answer)
+                turn = session.turns[-1]
+    
+    if not route["web_search"]:
+        WEB_SEARCHES.inc(outcome="skipped")
+        return answer, None
+    
+    def refine():
+        with deadline_scope(Deadline()), diagnostics_scope(sampled), span("refine"):
+            web_snips = search_web_if_needed(user_q, context_info, q_emb, route)
+            refined = compose_answer(user_q, context_info["results"], web_snips)
+        if session is not None:
+            with session.lock:
+                # Only touch the session if no newer retrieval replaced this one meanwhile
+                if session.context_info is context_info:
+                    session.web_snippets = web_snips
+                turn["answer"] = refined
+        return refined
+    
+    return answer, refine
+
+def rag_pipeline_batch(questions, max_concurrency=BATCH_MAX_CONCURRENCY, filters=None, admit=None):
+    """
+    Answer many questions at once. All questions are embedded in one encode call,
+    each collection is searched with one batched request, and the per-question
+    Groq / web search work runs on a pool of at most `max_concurrency` threads.
+    `filters` optionally gives one facet filter dict per question. `admit`, if given,
+    returns a context manager each question's answer runs in (a scheduler slot);
+    a question it sheds with Overloaded gets an error result.
+    
+    Yields one {"type": "result", ...} dict per question as soon as it finishes
+    (so not in input order), then a final {"type": "summary", ...} dict.
+    """
+    batch_start = time.perf_counter()
+    
+    with span("batch_embed"):
+        embeddings = embedder.encode(questions, batch_size=EMBED_BATCH, normalize_embeddings=True)
+    embed_done = time.perf_counter()
+    
+    with span("batch_retrieve"):
+        context_infos = retrieve_contexts_batch(questions, embeddings, top_k=3, filters=filters)
+    retrieve_done = time.perf_counter()
+    
+    def run(index, submitted):
+        started = None
+        item = {"type": "result", "index": index, "question": questions[index]}
+        try:
+            with admit() if admit is not None else nullcontext():
+                started = time.perf_counter()
+                with deadline_scope(Deadline()), diagnostics_scope():
+                    item["response"] = answer_question(questions[index], context_infos[index], embeddings[index])
+        except Overloaded as e:
+            logger.warning("Shed batch item %d: %s", index, e)
+            item["error"] = f"Server is busy: {e}"
+            item["retryAfter"] = e.retry_after
+        except Exception as e:
+            logger.exception("Error answering batch item %d: %s", index, e)
+            item["error"] = str(e)
+        finished = time.perf_counter()
+        started = started or finished
+        item["timing"] = {
+            "wait_ms": round((started - submitted) * 1000, 1),
+            "answer_ms": round((finished - started) * 1000, 1),
+            "elapsed_ms": round((finished - batch_start) * 1000, 1)
+        }
+        return item
+    
+    errors = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        submitted = time.perf_counter()
+        futures = [pool.submit(run, i, submitted) for i in range(len(questions))]
+        for future in as_completed(futures):
+            item = future.result()
+            errors += "error" in item
+            yield item
+    
+    yield {
+        "type": "summary",
+        "count": len(questions),
+        "errors": errors,
+        "timing": {
+            "embed_ms": round((embed_done - batch_start) * 1000, 1),
+            "retrieve_ms": round((retrieve_done - embed_done) * 1000, 1),
+            "total_ms": round((time.perf_counter() - batch_start) * 1000, 1)
+        }
+    }
+
 if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     print("RAG pipeline ready. Enter your question (CTRL+C to quit).")
     try:
         while True:
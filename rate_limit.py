@@ -0,0 +1,151 @@
+"""
+Client-side rate limiting and request coalescing for upstream APIs.
+
+RateLimiter keeps two token buckets, one for requests per minute and one for
+tokens per minute, and blocks callers until both budgets allow the call.
+SingleFlight makes concurrent callers with the same key share one upstream call.
+"""
+
+import time
+import threading
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a call would have to wait longer than allowed for budget."""
+
+
+class SingleFlightTimeout(Exception):
+    """Raised when a caller waiting on a shared call runs out of time."""
+
+
+class TokenBucket:
+    """Bucket holding up to `capacity` units, refilled at `capacity` per `period` seconds."""
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` units are available (0 if they are now)."""
+        missing = amount - self.level
+        return max(0.0, missing / self.rate) if self.rate else float("inf")
+
+
+class RateLimiter:
+    """
+    Requests-per-minute plus tokens-per-minute limiter. A limit of 0 disables
+    that bucket. Token costs are estimated up front and corrected with
+    `reconcile` once the real usage is known.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens, max_wait=None):
+        """
+        Block until one request and `tokens` tokens fit in the budget, then spend them.
+        Returns the seconds spent waiting. Raises RateLimitTimeout past `max_wait`.
+        """
+        start = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                waits = [self.blocked_until - now]
+                if self.requests:
+                    self.requests.refill(now)
+                    waits.append(self.requests.wait_time(1))
+                if self.tokens:
+                    self.tokens.refill(now)
+                    # A single call larger than the whole budget is charged as a full bucket,
+                    # so it goes through once the bucket is full and never drives it negative
+                    tokens = min(tokens, self.tokens.capacity)
+                    waits.append(self.tokens.wait_time(tokens))
+                wait = max(waits)
+                if wait <= 0:
+                    if self.requests:
+                        self.requests.level -= 1
+                    if self.tokens:
+                        self.tokens.level -= tokens
+                    return now - start
+
+            if max_wait is not None and (time.monotonic() - start) + wait > max_wait:
+                raise RateLimitTimeout(f"rate limit budget not available within {max_wait}s")
+            time.sleep(min(wait, 1.0))
+
+    def reconcile(self, estimated, actual):
+        """Correct the token bucket once the real token usage of a call is known."""
+        if not self.tokens or actual is None:
+            return
+        with self.lock:
+            # acquire charged at most a full bucket for the estimate
+            estimated = min(estimated, self.tokens.capacity)
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated - actual)
+
+    def pause(self, seconds):
+        """Stop issuing calls for `seconds` (e.g. after a 429 with Retry-After)."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, fn, timeout=None):
+        """
+        Run fn() unless a call with this key is already in flight, in which case
+        wait for it and share its result. Returns (result, shared).
+
+        A waiter gives up after `timeout` seconds (its own budget, not the leader's)
+        with SingleFlightTimeout. If the shared call fails, the waiter doesn't inherit
+        the leader's error: it runs the call itself, or joins the next one in flight.
+        """
+        expires = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self.lock:
+                call = self.calls.get(key)
+                if call is not None:
+                    call.waiters += 1
+                    leader = False
+                else:
+                    call = self.calls[key] = _Call()
+                    leader = True
+
+            if leader:
+                break
+            remaining = None if expires is None else max(0.0, expires - time.monotonic())
+            if not call.done.wait(remaining):
+                raise SingleFlightTimeout(f"shared call did not finish within {timeout}s")
+            if call.error is None:
+                return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
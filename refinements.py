@@ -0,0 +1,98 @@
+"""
+Background refinements for progressive /api/chat answers.
+
+In progressive mode the client gets an answer built from the vector DB alone
+right away; the web-augmented answer is computed here on a small worker pool.
+The client polls GET /api/chat/refinement/<id> (optionally long-polling with
+?wait=) until the refinement is done. Finished refinements are kept for
+REFINE_TTL seconds in a bounded in-memory store.
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import REFINEMENTS
+
+logger = logging.getLogger("refinements")
+
+REFINE_WORKERS = int(os.getenv("REFINE_WORKERS", "4"))  # Refinements computed concurrently
+REFINE_TTL = float(os.getenv("REFINE_TTL", "600"))  # Seconds a refinement is kept after it was submitted
+REFINE_MAX = int(os.getenv("REFINE_MAX", "1000"))  # Refinements kept in memory (oldest are evicted)
+REFINE_MAX_WAIT = float(os.getenv("REFINE_MAX_WAIT", "25"))  # Longest a poll may block waiting for the result
+
+
+class Refinement:
+    """One background answer: pending until the worker finishes, then done or failed."""
+
+    PENDING, DONE, FAILED = "pending", "done", "failed"
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = self.PENDING
+        self.response = None
+        self.error = None
+        self.created = time.monotonic()
+        self.finished = None
+        self.event = threading.Event()
+
+    def wait(self, timeout):
+        return self.event.wait(timeout)
+
+    def to_dict(self):
+        info = {"refinementId": self.id, "status": self.status}
+        if self.status == self.DONE:
+            info["response"] = self.response
+            info["processingTime"] = round(self.finished - self.created, 2)
+        elif self.status == self.FAILED:
+            info["error"] = self.error
+        return info
+
+
+class RefinementStore:
+    """Runs refinement jobs and keeps their results for polling."""
+
+    def __init__(self, workers=REFINE_WORKERS, max_items=REFINE_MAX, ttl=REFINE_TTL):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="refine")
+        self.max_items = max_items
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _expire(self, now):
+        while self.items:
+            oldest = next(iter(self.items.values()))
+            if now - oldest.created <= self.ttl and len(self.items) <= self.max_items:
+                break
+            self.items.popitem(last=False)
+
+    def submit(self, fn):
+        """Compute fn() in the background; returns the pending Refinement."""
+        refinement = Refinement()
+        with self.lock:
+            self.items[refinement.id] = refinement
+            self._expire(refinement.created)
+        self.pool.submit(self._run, refinement, fn)
+        return refinement
+
+    def _run(self, refinement, fn):
+        try:
+            refinement.response = fn()
+            refinement.status = Refinement.DONE
+            REFINEMENTS.inc(outcome="done")
+        except Exception as e:
+            logger.exception("Refinement %s failed: %s", refinement.id, e)
+            refinement.error = str(e)
+            refinement.status = Refinement.FAILED
+            REFINEMENTS.inc(outcome="failed")
+        refinement.finished = time.monotonic()
+        refinement.event.set()
+
+    def get(self, refinement_id):
+        with self.lock:
+            self._expire(time.monotonic())
+            return self.items.get(refinement_id)
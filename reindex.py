@@ -0,0 +1,202 @@
+"""
+Blue/green reindexing for the Qdrant collections.
+
+`rag_pipeline` queries the names "aircraft_maintenance_logs" and "acn", which
+are aliases. A reload never touches the collection behind the alias: the
+loaders fill a new versioned collection (e.g. "acn_v20261019T131500"),
+`publish` checks its point count and a sample search, then repoints the alias
+in one atomic alias update. The previous REINDEX_KEEP_VERSIONS versions stay
+around for `rollback`; older ones are dropped together with their texts in
+the payload store and their local IVF-PQ index. When the version being
+replaced has a local index (see ivfpq.py), the new version gets one built
+before the alias moves.
+
+    python reindex.py list acn
+    python reindex.py rollback acn                 # previous version
+    python reindex.py rollback acn --to acn_v20261019T131500
+    python reindex.py prune acn --keep 1
+"""
+
+import os
+import re
+import time
+import shutil
+import argparse
+import warnings
+from pathlib import Path
+
+from qdrant_client.http import models
+from qdrant_client.http.models import Distance, VectorParams
+
+from facets import create_facet_indexes
+from ivfpq import LOCAL_INDEX_DIR, build_local_index
+
+REINDEX_KEEP_VERSIONS = int(os.getenv("REINDEX_KEEP_VERSIONS", "2"))  # Old versions kept for rollback
+VALIDATION_SAMPLE = 5  # Points whose own vector must find them in a sample search
+VALIDATION_TOP_K = 5
+
+
+class ReindexError(Exception):
+    """Raised when a new version fails validation or an alias operation is impossible."""
+
+
+def version_name(alias):
+    return f"{alias}_v{time.strftime('%Y%m%dT%H%M%S')}"
+
+
+def list_versions(client, alias):
+    """Versioned collections of an alias, oldest first."""
+    pattern = re.compile(rf"^{re.escape(alias)}_v\d{{8}}T\d{{6}}$")
+    return sorted(c.name for c in client.get_collections().collections if pattern.match(c.name))
+
+
+def current_version(client, alias):
+    """The collection the alias points at, or None."""
+    for a in client.get_aliases().aliases:
+        if a.alias_name == alias:
+            return a.collection_name
+    return None
+
+
+def create_version(client, alias, dim):
+    """Create an empty versioned collection (with facet indexes) for a reload of `alias`."""
+    name = version_name(alias)
+    client.create_collection(collection_name=name, vectors_config=VectorParams(size=dim, distance=Distance.COSINE))
+    create_facet_indexes(client, name)
+    return name
+
+
+def validate_version(client, name, expected_count, sample):
+    """
+    Check that `name` holds exactly `expected_count` points and that each of the
+    sample (point id, vector) pairs finds its own point among the top hits.
+    """
+    count = client.count(collection_name=name, exact=True).count
+    if count != expected_count:
+        raise ReindexError(f"'{name}' has {count} points, expected {expected_count}")
+    for point_id, vector in sample[:VALIDATION_SAMPLE]:
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=DeprecationWarning)
+            hits = client.search(collection_name=name, query_vector=list(vector), limit=VALIDATION_TOP_K, with_payload=False)
+        if str(point_id) not in {str(hit.id) for hit in hits}:
+            raise ReindexError(f"sample search in '{name}' did not find point {point_id}")
+
+
+def swap_alias(client, alias, name, store=None):
+    """Point `alias` at collection `name` in a single alias update."""
+    names = {c.name for c in client.get_collections().collections}
+    if alias in names:
+        # First reindex after the collections were loaded directly under the alias name:
+        # the plain collection has to go before the alias can take its name
+        print(f"Replacing the plain collection '{alias}' with an alias (one-time migration)")
+        if store is not None:
+            store.delete_ids(alias, point_ids(client, alias))
+        client.delete_collection(collection_name=alias)
+
+    operations = []
+    if current_version(client, alias) is not None:
+        operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)))
+    operations.append(models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=name, alias_name=alias)))
+    client.update_collection_aliases(change_aliases_operations=operations)
+
+
+def point_ids(client, name, batch=1024):
+    ids = []
+    offset = None
+    while True:
+        points, offset = client.scroll(collection_name=name, limit=batch, offset=offset, with_payload=False, with_vectors=False)
+        ids.extend(p.id for p in points)
+        if offset is None:
+            return ids
+
+
+def local_index_path(name):
+    """Where the local IVF-PQ index of collection `name` lives, or None without LOCAL_INDEX_DIR."""
+    return Path(LOCAL_INDEX_DIR) / name if LOCAL_INDEX_DIR else None
+
+
+def prune_versions(client, alias, keep=REINDEX_KEEP_VERSIONS, store=None):
+    """
+    Drop all but the live version and the `keep` newest older ones. Their texts are
+    removed from the payload store too (payloads are keyed by alias and point id),
+    and so are their local indexes.
+    """
+    live = current_version(client, alias)
+    old = [v for v in list_versions(client, alias) if v != live]
+    dropped = old[:max(0, len(old) - keep)]
+    for name in dropped:
+        if store is not None:
+            store.delete_ids(alias, point_ids(client, name))
+        client.delete_collection(collection_name=name)
+        if local_index_path(name) is not None and local_index_path(name).is_dir():
+            # Servers still mapping these files keep reading them until they reload
+            shutil.rmtree(local_index_path(name))
+        print(f"Dropped old version '{name}'")
+    return dropped
+
+
+def publish(client, alias, name, expected_count, sample, store=None, keep=REINDEX_KEEP_VERSIONS):
+    """
+    Validate the freshly loaded version `name`, switch `alias` to it and prune old
+    versions. A version that fails validation is deleted together with its texts in
+    the payload store, and the alias is left alone.
+    """
+    try:
+        validate_version(client, name, expected_count, sample)
+    except Exception:
+        if store is not None:
+            # Point ids are new for every version, so this never touches the live one's texts
+            store.delete_ids(alias, point_ids(client, name))
+        client.delete_collection(collection_name=name)
+        raise
+    previous = current_version(client, alias)
+    indexed = local_index_path(previous or alias)
+    if indexed is not None and (indexed / "meta.json").is_file():
+        # Built before the swap, so servers find it as soon as they see the alias move
+        build_local_index(client, name)
+    swap_alias(client, alias, name, store)
+    print(f"Alias '{alias}' now points at '{name}'" + (f" (was '{previous}')" if previous else ""))
+    prune_versions(client, alias, keep, store)
+
+
+def rollback(client, alias, to=None):
+    """Point `alias` back at version `to`, or at the version before the live one."""
+    versions = list_versions(client, alias)
+    live = current_version(client, alias)
+    if to is None:
+        older = [v for v in versions if live is None or v < live]
+        if not older:
+            raise ReindexError(f"no version of '{alias}' older than '{live}' to roll back to")
+        to = older[-1]
+    elif to not in versions:
+        raise ReindexError(f"'{to}' is not a version of '{alias}'")
+    swap_alias(client, alias, to)
+    print(f"Alias '{alias}' rolled back from '{live}' to '{to}'")
+    return to
+
+
+if __name__ == "__main__":
+    import qdrant_access
+    from payload_store import PayloadStore
+
+    parser = argparse.ArgumentParser(description="Manage versioned Qdrant collections behind aliases.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Show the versions of an alias").add_argument("alias")
+    cmd = sub.add_parser("rollback", help="Point an alias back at an older version")
+    cmd.add_argument("alias")
+    cmd.add_argument("--to", default=None, help="Version to switch to (default: the previous one)")
+    cmd = sub.add_parser("prune", help="Drop old versions beyond --keep")
+    cmd.add_argument("alias")
+    cmd.add_argument("--keep", type=int, default=REINDEX_KEEP_VERSIONS)
+    args = parser.parse_args()
+
+    client = qdrant_access.get_client(timeout=qdrant_access.QDRANT_BULK_TIMEOUT)
+    if args.command == "list":
+        live = current_version(client, args.alias)
+        for name in list_versions(client, args.alias):
+            count = client.count(collection_name=name, exact=True).count
+            print(f"{'*' if name == live else ' '} {name}  {count} points")
+    elif args.command == "rollback":
+        rollback(client, args.alias, args.to)
+    else:
+        prune_versions(client, args.alias, args.keep, PayloadStore())
@@ -0,0 +1,161 @@
+"""
+Request deadlines and circuit breakers for the pipeline's external dependencies.
+
+A Deadline is created per request and made current for the thread handling it
+(`deadline_scope`); each stage asks `stage_timeout(cap)` for the time it may
+spend, so a slow early stage leaves less for the later ones instead of the
+request running past its budget.
+
+A CircuitBreaker counts consecutive failures of one dependency. Once it trips,
+calls are refused without touching the dependency until `reset_timeout` has
+passed, then a single trial call decides whether it closes again.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+from metrics import CIRCUIT_STATE, CIRCUIT_REJECTIONS
+
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "45"))  # Seconds a /api/chat request may take end to end
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))  # Consecutive failures that open a breaker
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))  # Seconds an open breaker waits before a trial call
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage has no time left in the request's budget."""
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the dependency's breaker is open."""
+
+
+class Deadline:
+    """A point in time by which the request must be answered."""
+
+    def __init__(self, seconds=REQUEST_DEADLINE):
+        self.budget = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap=None):
+        """Time a stage may spend: what is left of the budget, at most `cap`."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"request deadline of {self.budget:.1f}s exceeded")
+        return min(remaining, cap) if cap is not None else remaining
+
+
+_local = threading.local()
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """Make `deadline` the current deadline for this thread."""
+    previous = getattr(_local, "deadline", None)
+    _local.deadline = deadline
+    try:
+        yield deadline
+    finally:
+        _local.deadline = previous
+
+
+def current_deadline():
+    return getattr(_local, "deadline", None)
+
+
+def stage_timeout(cap):
+    """Timeout for a stage: `cap`, shortened to the current deadline if there is one."""
+    deadline = current_deadline()
+    return deadline.timeout(cap) if deadline is not None else cap
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open trial -> closed or open again."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.last_error = None
+        self.lock = threading.Lock()
+        CIRCUIT_STATE.set(0, dependency=name)
+
+    def _set_state(self, state):
+        self.state = state
+        CIRCUIT_STATE.set(self.STATE_VALUES[state], dependency=self.name)
+
+    def allow(self):
+        """Whether a call may go through now. An open breaker lets one trial call through after reset_timeout."""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+        CIRCUIT_REJECTIONS.inc(dependency=self.name)
+        return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.trial_in_flight = False
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def release(self):
+        """Give back a trial call that ended without saying anything about the dependency."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def is_open(self):
+        """True while the breaker refuses calls and isn't yet due for a trial (doesn't use up the trial)."""
+        with self.lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_failure(self, error=None):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            self.last_error = str(error) if error is not None else None
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._set_state(self.OPEN)
+                self.opened_at = time.monotonic()
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn through the breaker. Raises CircuitOpenError without calling fn when open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = fn(*args, **kwargs)
+        except DeadlineExceeded:
+            self.release()
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self):
+        with self.lock:
+            info = {"state": self.state, "consecutiveFailures": self.failures}
+            if self.state != self.CLOSED:
+                info["retryIn"] = round(max(0.0, self.opened_at + self.reset_timeout - time.monotonic()), 1)
+                info["lastError"] = self.last_error
+            return info
@@ -0,0 +1,215 @@
+"""
+Admission control and priority scheduling for /api/chat.
+
+At most SCHED_CONCURRENCY requests run the RAG pipeline at once. The others
+wait in one bounded queue per priority class, and a freed slot always goes
+to the oldest request of the highest class waiting, so an aircraft-on-ground
+question never queues behind routine ones. Under saturation:
+- a request whose class queue is full, or that waited longer than its class
+  allows, is shed (the caller answers 503 with Retry-After)
+- requests below the top class that had to queue, or that start while others
+  are still queued, run degraded: no web search, and GROQ_DEGRADED_MODEL for
+  Groq when one is configured (see `degraded_scope` / `is_degraded`)
+
+The priority comes from the request's "priority" field, from an AOG mention
+in the question, or from CATEGORY_PRIORITIES for its issueCategory tag. Work no
+client is waiting on, such as the web refinement of a progressive answer, runs
+in the "background" class below them all.
+"""
+
+import os
+import re
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from issue_categories import normalize_category
+from metrics import SCHED_QUEUE_DEPTH, SCHED_RUNNING, SCHED_WAIT, SCHED_REQUESTS
+
+PRIORITIES = ("aog", "urgent", "routine", "background")  # Highest first
+REQUEST_PRIORITIES = PRIORITIES[:-1]  # Classes a request may ask for
+DEFAULT_PRIORITY = "routine"
+BACKGROUND_PRIORITY = "background"
+
+
+def _per_class(value, cast=float):
+    """Parse "aog:30,urgent:20" into {class: value}."""
+    parsed = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, number = item.partition(":")
+        parsed[name.strip().lower()] = cast(number)
+    return parsed
+
+
+SCHED_CONCURRENCY = int(os.getenv("SCHED_CONCURRENCY", "4"))  # Requests running the pipeline at once
+SCHED_QUEUE_LIMITS = _per_class(os.getenv("SCHED_QUEUE_LIMITS", "aog:32,urgent:16,routine:16,background:32"), int)  # Waiting requests per class
+SCHED_MAX_WAIT = _per_class(os.getenv("SCHED_MAX_WAIT", "aog:30,urgent:15,routine:8,background:30"))  # Seconds a request may wait before it is shed
+SCHED_DEGRADE_DEPTH = int(os.getenv("SCHED_DEGRADE_DEPTH", "1"))  # Queued requests at which lower classes start degraded
+CATEGORY_PRIORITIES = os.getenv("CATEGORY_PRIORITIES", "")  # Issue categories that raise the priority, e.g. "Structural:urgent"
+
+AOG_PATTERN = re.compile(r"\bAOG\b|\baircraft on (?:the )?ground\b", re.IGNORECASE)
+
+
+def _category_priorities(value):
+    """Parse CATEGORY_PRIORITIES into {canonical category: class}, ignoring unknown names."""
+    parsed = {}
+    for category, priority in _per_class(value, str).items():
+        priority = priority.strip().lower()
+        if normalize_category(category) and priority in REQUEST_PRIORITIES:
+            parsed[normalize_category(category)] = priority
+    return parsed
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; `retry_after` is a hint in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def classify_priority(requested=None, issue_category=None, message=""):
+    """
+    Priority class of a request: the explicit `requested` class if given (raises
+    ValueError if unknown), "aog" if the question mentions AOG, otherwise the class
+    configured for its issue category, or DEFAULT_PRIORITY.
+    """
+    if requested:
+        priority = str(requested).strip().lower()
+        if priority not in REQUEST_PRIORITIES:
+            raise ValueError(f"Unknown priority: {requested}. Use one of: {', '.join(REQUEST_PRIORITIES)}")
+        return priority
+    if AOG_PATTERN.search(message or ""):
+        return "aog"
+    return _category_priorities(CATEGORY_PRIORITIES).get(normalize_category(issue_category), DEFAULT_PRIORITY)
+
+
+_local = threading.local()
+
+
+@contextmanager
+def degraded_scope(degraded):
+    """Mark the work done on this thread as degraded (or not) for the pipeline."""
+    previous = getattr(_local, "degraded", False)
+    _local.degraded = degraded
+    try:
+        yield
+    finally:
+        _local.degraded = previous
+
+
+def is_degraded():
+    return getattr(_local, "degraded", False)
+
+
+class Ticket:
+    """A request's place in the scheduler: queued until granted a slot."""
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.granted = threading.Event()
+        self.degraded = False
+        self.waited = 0.0
+
+
+class Scheduler:
+    """Fixed number of pipeline slots handed out by strict priority."""
+
+    def __init__(self, concurrency=SCHED_CONCURRENCY, queue_limits=None, max_wait=None,
+                 degrade_depth=SCHED_DEGRADE_DEPTH):
+        self.concurrency = max(1, concurrency)
+        self.queue_limits = {p: (queue_limits or SCHED_QUEUE_LIMITS).get(p, 0) for p in PRIORITIES}
+        self.max_wait = {p: (max_wait or SCHED_MAX_WAIT).get(p, 0.0) for p in PRIORITIES}
+        self.degrade_depth = degrade_depth
+        self.queues = {p: deque() for p in PRIORITIES}
+        self.running = 0
+        self.service_time = 1.0  # Moving average of seconds a request holds a slot, for Retry-After
+        self.lock = threading.Lock()
+
+    def _queued(self):
+        return sum(len(q) for q in self.queues.values())
+
+    def _ahead(self, priority):
+        """Requests of the same or a higher class already waiting."""
+        return sum(len(self.queues[p]) for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+
+    def _retry_after(self):
+        return max(1, math.ceil(self.service_time * (self._queued() + 1) / self.concurrency))
+
+    def _publish(self):
+        SCHED_RUNNING.set(self.running)
+        for p, q in self.queues.items():
+            SCHED_QUEUE_DEPTH.set(len(q), priority=p)
+
+    def _grant(self, ticket, queued):
+        # Called with the lock held
+        ticket.waited = time.monotonic() - ticket.enqueued
+        ticket.degraded = ticket.priority != PRIORITIES[0] and (queued or self._queued() >= self.degrade_depth)
+        ticket.granted.set()
+
+    def acquire(self, priority):
+        """Wait for a slot. Returns the granted Ticket; raises Overloaded if the request is shed."""
+        ticket = Ticket(priority)
+        with self.lock:
+            if self.running < self.concurrency and self._ahead(priority) == 0:
+                self.running += 1
+                self._grant(ticket, queued=False)
+            elif len(self.queues[priority]) >= self.queue_limits[priority]:
+                SCHED_REQUESTS.inc(priority=priority, outcome="shed_queue_full")
+                raise Overloaded(f"The {priority} queue is full", self._retry_after())
+            else:
+                self.queues[priority].append(ticket)
+            self._publish()
+
+        if not ticket.granted.wait(self.max_wait[priority]):
+            with self.lock:
+                if not ticket.granted.is_set():
+                    self.queues[priority].remove(ticket)
+                    self._publish()
+                    SCHED_WAIT.observe(time.monotonic() - ticket.enqueued, priority=priority)
+                    SCHED_REQUESTS.inc(priority=priority, outcome="shed_timeout")
+                    raise Overloaded(f"No capacity for {priority} requests within {self.max_wait[priority]:g}s",
+                                     self._retry_after())
+
+        SCHED_WAIT.observe(ticket.waited, priority=priority)
+        SCHED_REQUESTS.inc(priority=priority, outcome="degraded" if ticket.degraded else "admitted")
+        return ticket
+
+    def release(self, ticket):
+        """Free the ticket's slot, handing it straight to the highest-priority waiter."""
+        held = time.monotonic() - ticket.enqueued - ticket.waited
+        with self.lock:
+            self.service_time = 0.8 * self.service_time + 0.2 * held
+            for p in PRIORITIES:
+                if self.queues[p]:
+                    self._grant(self.queues[p].popleft(), queued=True)
+                    break
+            else:
+                self.running -= 1
+            self._publish()
+
+    @contextmanager
+    def admit(self, priority):
+        """Run the body in a slot, degraded if the scheduler says so. Raises Overloaded when shed."""
+        ticket = self.acquire(priority)
+        try:
+            with degraded_scope(ticket.degraded):
+                yield ticket
+        finally:
+            self.release(ticket)
+
+    def snapshot(self):
+        with self.lock:
+            now = time.monotonic()
+            return {
+                "running": self.running,
+                "concurrency": self.concurrency,
+                "queues": {
+                    p: {"depth": len(q), "limit": self.queue_limits[p],
+                        "oldest_wait_s": round(now - q[0].enqueued, 3) if q else 0.0}
+                    for p, q in self.queues.items()
+                },
+            }
@@ -1,70 +1,275 @@
-import os
-import requests
+"""
+Retrieval evaluation for the Qdrant collections.
+
+Builds a labeled query set from the corpus itself:
+- maintenance logs: a log's processed_problem on its own (the action held out)
+  is the query, and every row with that same problem is a relevant target
+- ACN reports: a section's synopsis is the query, and the point for that ACN
+  (or the canonical section it was merged into) is the relevant target
+
+Every query is then searched under each configuration (exact search, HNSW,
+HNSW on quantized vectors, the local IVF-PQ index). The report gives recall@k
+and MRR at each score threshold, plus per-query search latency, for each
+collection, and is written as JSON so runs can be compared.
+
+    python search_vector_db.py --queries 200 --top-k 1 3 5 10 --thresholds 0 0.3 0.5
+    python search_vector_db.py --in-memory --logs-limit 2000      # offline, embeds the corpus first
+    python search_vector_db.py --baseline bench_results/retrieval_<previous>.json
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import warnings
+import platform
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
 
 # --- CONFIG ---
 load_dotenv()
-QDRANT_URL      = os.getenv("QDRANT_URL").rstrip("/")  
-QDRANT_API_KEY  = os.getenv("QDRANT_API_KEY")
 EMBED_MODEL     = "all-MiniLM-L6-v2"
-COLLS           = ["acn", "aircraft_maintenance_logs"]
-TOP_K           = 2
-
-HEADERS = {
-    "Content-Type": "application/json",
-    "api-key": QDRANT_API_KEY
-}
-
-# --- INIT EMBEDDER ---
-embedder = SentenceTransformer(EMBED_MODEL)
-
-# --- SAMPLE TECHNICIAN QUERY ---
-query = (
-    "During a high-altitude cruie at FL350, the #2 engine’s N1 spool dropped by 8% "
-    "within 30 seconds, accompanied by a low-oil-pressure EICAS advisory and faint "
-    "metallic vibration—what step-by-step troubleshooting should be applied?"
-)
-qvec = embedder.encode([query], normalize_embeddings=True)[0].tolist()
-
-def search_collection(collection_name: str, vector: list, top_k: int):
-    url = f"{QDRANT_URL}/collections/{collection_name}/points/search"
-    body = {
-        "vector": vector,
-        "limit": top_k,
-        "with_payload": True
+LOGS_COLLECTION = "aircraft_maintenance_logs"
+ACN_COLLECTION  = "acn"
+LOGS_CSV        = Path("maintenance_logs.csv")
+ACN_JSON        = Path("acn.json")
+RESULTS_DIR     = Path("bench_results")
+CONFIGS         = ["exact", "hnsw", "hnsw_quantized", "ivfpq"]
+LABEL_FIELDS    = ["csv_row", "acn", "duplicate_acns"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Recall@k, MRR and latency of retrieval per collection.")
+    parser.add_argument("--queries", type=int, default=100, help="Queries per collection")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[1, 3, 5, 10], help="Cutoffs for recall@k")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.0], help="Minimum scores a hit must reach")
+    parser.add_argument("--configs", nargs="+", choices=CONFIGS, default=["exact", "hnsw", "hnsw_quantized"])
+    parser.add_argument("--local-index", type=Path, default=None, help="Directory of IVF-PQ indexes (enables the ivfpq config)")
+    parser.add_argument("--csv", type=Path, default=LOGS_CSV, help="Log CSV the collection was loaded from")
+    parser.add_argument("--acn-json", type=Path, default=ACN_JSON)
+    parser.add_argument("--in-memory", action="store_true", help="Load the corpus into an in-memory Qdrant first")
+    parser.add_argument("--logs-limit", type=int, default=None, help="With --in-memory, only load the first N log rows")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None, help="Previous report to compare against")
+    return parser.parse_args()
+
+
+def scroll_labels(client, coll, batch=1024):
+    """{point id: payload labels} for every point of a collection."""
+    labels = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=coll, limit=batch, offset=offset, with_payload=LABEL_FIELDS, with_vectors=False
+        )
+        for point in points:
+            labels[point.id] = point.payload or {}
+        if offset is None:
+            return labels
+
+
+def log_queries(csv_path, labels, n, rng):
+    """(problem text, relevant point ids) for up to n distinct problems present in the collection."""
+    df = pd.read_csv(csv_path).fillna("")
+    ids_by_row = {}
+    for pid, payload in labels.items():
+        if "csv_row" in payload:
+            ids_by_row.setdefault(int(payload["csv_row"]), []).append(pid)
+
+    rows_by_problem = df.groupby("processed_problem").groups
+    problems = [p for p, rows in rows_by_problem.items()
+                if len(p.split()) >= 3 and any(int(r) in ids_by_row for r in rows)]
+    rng.shuffle(problems)
+
+    queries = []
+    for problem in problems[:n]:
+        relevant = {pid for r in rows_by_problem[problem] for pid in ids_by_row.get(int(r), [])}
+        queries.append((problem, relevant))
+    return queries
+
+
+def acn_queries(json_path, labels, n, rng):
+    """(synopsis, relevant point ids) for up to n ACN sections present in the collection."""
+    from load_acns import extract_synopsis
+
+    ids_by_acn = {}
+    for pid, payload in labels.items():
+        for acn in [payload.get("acn")] + list(payload.get("duplicate_acns") or []):
+            if acn is not None:
+                ids_by_acn.setdefault(str(acn), set()).add(pid)
+
+    with open(json_path, encoding="utf-8") as f:
+        sections = json.load(f)
+    rng.shuffle(sections)
+
+    queries = []
+    for sec in sections:
+        synopsis = extract_synopsis(sec["text"])
+        relevant = ids_by_acn.get(str(sec["acn"]))
+        if synopsis and relevant:
+            queries.append((synopsis, relevant))
+        if len(queries) >= n:
+            break
+    return queries
+
+
+def make_searcher(client, coll, config, local_indexes):
+    """fn(query vector, k) -> [(point id, score)] for one configuration."""
+    from qdrant_client import models
+
+    if config == "ivfpq":
+        from ivfpq import rerank, IVF_RERANK_FACTOR
+
+        index = local_indexes[coll]
+
+        def search_local(q, k):
+            # As served: the IVF-PQ shortlist rescored exactly with the stored vectors
+            shortlist, _ = index.search(q, k * IVF_RERANK_FACTOR)
+            points = client.retrieve(collection_name=coll, ids=shortlist, with_vectors=True, with_payload=False)
+            return list(zip(*rerank([p.id for p in points], [p.vector for p in points], q, k)))
+
+        return search_local
+
+    params = {
+        "exact": models.SearchParams(exact=True),
+        "hnsw": models.SearchParams(quantization=models.QuantizationSearchParams(ignore=True)),
+        "hnsw_quantized": models.SearchParams(quantization=models.QuantizationSearchParams(ignore=False, rescore=False)),
+    }[config]
+
+    def search(q, k):
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=DeprecationWarning)
+            hits = client.search(collection_name=coll, query_vector=q.tolist(), limit=k,
+                                 search_params=params, with_payload=False)
+        return [(hit.id, hit.score) for hit in hits]
+
+    return search
+
+
+def score_ranking(ranking, relevant, cutoffs, threshold):
+    """Recall@k per cutoff and reciprocal rank for one query, ignoring hits below `threshold`."""
+    kept = [pid for pid, score in ranking if score >= threshold]
+    result = {f"recall@{k}": len(relevant.intersection(kept[:k])) / len(relevant) for k in cutoffs}
+    rank = next((i for i, pid in enumerate(kept, 1) if pid in relevant), None)
+    result["rr"] = 1.0 / rank if rank else 0.0
+    result["answered"] = 1.0 if kept else 0.0
+    return result
+
+
+def evaluate(searcher, queries, vectors, cutoffs, thresholds):
+    from benchmark_pipeline import summarize
+
+    per_threshold = {t: [] for t in thresholds}
+    latencies = []
+    for (_, relevant), q in zip(queries, vectors):
+        start = time.perf_counter()
+        ranking = searcher(q, max(cutoffs))
+        latencies.append(time.perf_counter() - start)
+        for t in thresholds:
+            per_threshold[t].append(score_ranking(ranking, relevant, cutoffs, t))
+
+    results = {"latency": summarize(latencies), "thresholds": {}}
+    for t, rows in per_threshold.items():
+        means = {key: round(float(np.mean([r[key] for r in rows])), 4) for key in rows[0]}
+        means["mrr"] = means.pop("rr")
+        results["thresholds"][str(t)] = means
+    return results
+
+
+def print_report(report, baseline=None):
+    cutoffs = report["config"]["top_k"]
+    header = f"{'collection':<28}{'config':<16}{'min score':>10}" + "".join(f"{f'R@{k}':>8}" for k in cutoffs)
+    print("\n" + header + f"{'MRR':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for coll, coll_report in report["collections"].items():
+        for config, res in coll_report["configs"].items():
+            for t, m in res["thresholds"].items():
+                line = f"{coll:<28}{config:<16}{float(t):>10.2f}" + "".join(f"{m[f'recall@{k}']:>8.3f}" for k in cutoffs)
+                line += f"{m['mrr']:>8.3f}{res['latency']['p50_ms']:>9.2f}{res['latency']['p95_ms']:>9.2f}"
+                base = (baseline or {}).get("collections", {}).get(coll, {}).get("configs", {}).get(config)
+                if base and t in base["thresholds"]:
+                    line += (f"   (MRR {m['mrr'] - base['thresholds'][t]['mrr']:+.3f}, "
+                             f"p50 {res['latency']['p50_ms'] - base['latency']['p50_ms']:+.2f})")
+                print(line)
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+
+    if args.in_memory:
+        import benchmark_pipeline as bp
+        bp.configure_environment("http://127.0.0.1:9/unused", "http://127.0.0.1:9/unused")
+        import rag_pipeline as rp
+        bp.load_corpus(rp, args.logs_limit)
+        client, embedder = rp.qdrant, rp.embedder
+    else:
+        import qdrant_access
+        from sentence_transformers import SentenceTransformer
+        client = qdrant_access.get_client(timeout=qdrant_access.QDRANT_BULK_TIMEOUT)
+        embedder = SentenceTransformer(EMBED_MODEL)
+
+    configs = list(args.configs)
+    local_indexes = {}
+    if args.local_index:
+        import reindex
+        from ivfpq import load_local_indexes
+
+        # Indexes are saved under the version each alias points at
+        versions = {coll: reindex.current_version(client, coll) or coll for coll in (LOGS_COLLECTION, ACN_COLLECTION)}
+        loaded = load_local_indexes(list(versions.values()), args.local_index)
+        local_indexes = {coll: loaded[version] for coll, version in versions.items() if version in loaded}
+        if "ivfpq" not in configs:
+            configs.append("ivfpq")
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"queries": args.queries, "top_k": sorted(args.top_k), "thresholds": args.thresholds,
+                   "configs": configs, "seed": args.seed, "in_memory": args.in_memory, "logs_limit": args.logs_limit},
+        "environment": {"python": sys.version.split()[0], "platform": platform.platform()},
+        "collections": {},
     }
-    resp = requests.post(url, headers=HEADERS, json=body, timeout=10)
-    resp.raise_for_status()
-    return resp.json().get("result", [])
-
-# --- RUN & PRINT RESULTS ---
-for coll in COLLS:
-    print(f"\n=== Top {TOP_K} from '{coll}' ===")
-    results = search_collection(coll, qvec, TOP_K)
-
-    for idx, hit in enumerate(results, start=1):
-        payload = hit.get("payload", {})
-        score   = hit.get("score", 0)
-        identifier = payload.get("acn") or hit.get("id")
-        
-        print(f"{idx}. ID: {identifier}  |  Score: {score:.3f}")
-        print("----")
-        
-        if coll == "acn":
-            text_chunk = payload.get("text_chunk", "<no text stored>")
-            synp       = payload.get("synp", "")
-            print("Text chunk:")
-            print(text_chunk)
-            if synp:
-                print("\nSynopsis:")
-                print(synp)
-        else:  # aircraft_maintenance_logs
-            problem = payload.get("problem", "<no problem stored>")
-            action  = payload.get("action", "<no action stored>")
-            print("Problem:")
-            print(problem)
-            print("\nAction:")
-            print(action)
-        
-        print("----")
+
+    # Loaders publish each collection as an alias of its newest version
+    existing = {c.name for c in client.get_collections().collections}
+    existing.update(a.alias_name for a in client.get_aliases().aliases)
+    for coll, build_queries, source in [(LOGS_COLLECTION, log_queries, args.csv), (ACN_COLLECTION, acn_queries, args.acn_json)]:
+        if coll not in existing:
+            print(f"Skipping '{coll}': collection not found")
+            continue
+        labels = scroll_labels(client, coll)
+        queries = build_queries(source, labels, args.queries, rng)
+        if not queries:
+            print(f"Skipping '{coll}': no labeled queries could be built")
+            continue
+        print(f"Evaluating '{coll}' ({len(labels)} points) with {len(queries)} queries...")
+        vectors = embedder.encode([q for q, _ in queries], normalize_embeddings=True)
+        quantized = client.get_collection(coll).config.quantization_config is not None
+
+        coll_report = {"points": len(labels), "queries": len(queries), "quantization_configured": quantized, "configs": {}}
+        for config in configs:
+            if config == "ivfpq" and coll not in local_indexes:
+                continue
+            searcher = make_searcher(client, coll, config, local_indexes)
+            coll_report["configs"][config] = evaluate(searcher, queries, vectors, sorted(args.top_k), args.thresholds)
+        report["collections"][coll] = coll_report
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = args.output or RESULTS_DIR / f"retrieval_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
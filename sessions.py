@@ -0,0 +1,128 @@
+"""
+Conversation sessions for /api/chat.
+
+A session remembers the contexts and web snippets retrieved for earlier turns,
+plus the query embedding they were retrieved for. A follow-up that stays close
+to that embedding reuses them instead of searching Qdrant and the web again.
+Sessions live in a bounded in-memory store and expire after a period of inactivity.
+"""
+
+import os
+import re
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))  # Seconds of inactivity before a session expires
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))  # Sessions kept in memory (least recently used are evicted)
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "6"))  # Turns of history kept per session
+SESSION_REUSE_THRESHOLD = float(os.getenv("SESSION_REUSE_THRESHOLD", "0.5"))  # Similarity above which retrieval is reused
+SESSION_FOLLOWUP_THRESHOLD = float(os.getenv("SESSION_FOLLOWUP_THRESHOLD", "0.3"))  # Lower bar for explicit follow-ups ("what about ...")
+
+# Explicit follow-ups: an opening that continues the previous turn ("what about the left side?",
+# "and the torque?", "same for the 737?") or a closing reference to it ("what's the limit for that?").
+# Pronouns elsewhere in a question ("is it normal that ...") don't count.
+FOLLOWUP_PATTERN = re.compile(
+    r"^\s*(?:(?:and|also|then)\b|(?:what|how) about\b|what else\b|same (?:for|with|on|thing)\b)"
+    r"|\b(?:for|on|with|about|of) (?:it|that|those|them)\s*\??\s*$",
+    re.IGNORECASE,
+)
+
+
+class Session:
+    """State for one conversation."""
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.anchor = None
+        self.context_info = None
+        self.web_snippets = None
+        self.filters = None
+        self.turns = []
+        self.touched = time.monotonic()
+        self.lock = threading.Lock()
+
+    def similarity(self, query_embedding):
+        """Cosine similarity between a query and the embedding the contexts were retrieved for."""
+        if self.anchor is None:
+            return None
+        q = np.asarray(query_embedding, dtype=np.float32)
+        denom = float(np.linalg.norm(q) * np.linalg.norm(self.anchor)) or 1.0
+        return float(np.dot(q, self.anchor)) / denom
+
+    def can_reuse(self, question, query_embedding, filters=None):
+        """
+        Decide whether the session's contexts still cover the question: either it is
+        close to the retrieval anchor, or it refers back to the earlier turn and hasn't
+        drifted far. Contexts retrieved under different facet filters are never
+        reused. Returns (reuse, similarity).
+        """
+        similarity = self.similarity(query_embedding)
+        if similarity is None or self.context_info is None or (filters or None) != self.filters:
+            return False, similarity
+        if similarity >= SESSION_REUSE_THRESHOLD:
+            return True, similarity
+        if FOLLOWUP_PATTERN.search(question) and similarity >= SESSION_FOLLOWUP_THRESHOLD:
+            return True, similarity
+        return False, similarity
+
+    def update_retrieval(self, query_embedding, context_info, web_snippets, filters=None):
+        """Replace the session's contexts after a fresh retrieval."""
+        self.anchor = np.asarray(query_embedding, dtype=np.float32)
+        self.context_info = context_info
+        self.web_snippets = web_snippets
+        self.filters = filters or None
+
+    def add_turn(self, question, answer):
+        self.turns.append({"question": question, "answer": answer})
+        del self.turns[:-SESSION_MAX_TURNS]
+
+    def contextualize(self, question):
+        """Prefix the previous question so the model knows what a follow-up refers to."""
+        if not self.turns:
+            return question
+        return f"(Previous question: {self.turns[-1]['question']})\nFollow-up question: {question}"
+
+
+class SessionStore:
+    """Bounded, expiring map of session id -> Session."""
+
+    def __init__(self, max_sessions=SESSION_MAX, ttl=SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _expire(self, now):
+        while self.sessions:
+            oldest = next(iter(self.sessions.values()))
+            if now - oldest.touched <= self.ttl:
+                break
+            self.sessions.popitem(last=False)
+
+    def get_or_create(self, session_id=None):
+        """Return the live session for `session_id`, or a new one if it's unknown or expired."""
+        now = time.monotonic()
+        with self.lock:
+            self._expire(now)
+            session = self.sessions.get(session_id) if session_id else None
+            if session is None:
+                session = Session(uuid.uuid4().hex)
+                self.sessions[session.id] = session
+                while len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+            session.touched = now
+            self.sessions.move_to_end(session.id)
+            return session
+
+    def delete(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        with self.lock:
+            self._expire(time.monotonic())
+            return len(self.sessions)
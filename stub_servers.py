@@ -0,0 +1,197 @@
+"""
+Local stand-ins for the Groq chat completions API and the web search backend,
+with configurable latency. Used by the benchmarks and load tests so they can run
+offline. Point rag_pipeline at them with GROQ_API_URL and WEB_SEARCH_URL.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urlencode
+
+
+def _sleep(latency, jitter):
+    """Sleep for `latency` seconds plus up to +/- `jitter` seconds of noise."""
+    delay = latency + random.uniform(-jitter, jitter) if jitter else latency
+    if delay > 0:
+        time.sleep(delay)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server_version = "StubServer/1.0"
+
+    def log_message(self, format, *args):
+        # Keep the benchmark output clean
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _GroqHandler(_StubHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        config = self.server.config
+
+        _sleep(config["latency"], config["jitter"])
+        if config["error_rate"] and random.random() < config["error_rate"]:
+            self._send_json(503, {"error": {"message": "stub overloaded"}})
+            return
+
+        prompt = request.get("messages", [{}])[-1].get("content", "")
+        if "search query generator" in prompt:
+            content = "engine vibration, oil pressure, troubleshooting"
+        else:
+            content = (
+                "Inspect the affected component per the maintenance manual [DB-1].\n\n"
+                "Sources:\nDB-1: Aircraft Maintenance Log"
+            )
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        self._send_json(200, {
+            "id": "stub-completion",
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+
+class _SearchHandler(_StubHandler):
+    def do_GET(self):
+        config = self.server.config
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if url.path.startswith("/page/"):
+            self._send_page(url.path.rsplit("/", 1)[-1], params)
+            return
+        query = params.get("q", [""])[0]
+        max_results = int(params.get("max_results", ["5"])[0])
+
+        _sleep(config["latency"], config["jitter"])
+        if config["error_rate"] and random.random() < config["error_rate"]:
+            self._send_json(503, {"error": "stub overloaded"})
+            return
+
+        results = [
+            {
+                "title": f"Stub result {i} for {query}",
+                "body": f"Maintenance guidance about {query}. Check torque values and inspect for leaks.",
+                "href": f"{self.server.base_url}/page/{i}?{urlencode({'q': query})}"
+            }
+            for i in range(1, max_results + 1)
+        ]
+        self._send_json(200, results)
+
+    def _send_page(self, page, params):
+        """
+        A result page with navigation and script noise around a few paragraphs.
+        ?delay= adds latency, ?size= pads the body to that many bytes.
+        """
+        config = self.server.config
+        query = params.get("q", ["the component"])[0]
+        _sleep(float(params.get("delay", [config["page_latency"]])[0]), 0)
+
+        paragraphs = [
+            f"Page {page} overview. This article covers maintenance procedures related to {query} on light aircraft.",
+            f"To troubleshoot {query}, remove the cowling, inspect the area for leaks and chafing, and check the torque "
+            f"on every fitting against the values in the maintenance manual before returning the aircraft to service.",
+            "Our company history goes back many decades and we are proud of the customers we serve around the world.",
+        ]
+        html = (
+            "<html><head><title>Stub page</title><script>var tracking = 1;</script>"
+            "<style>body { color: black; }</style></head><body>"
+            "<nav><a href='/'>Home</a> <a href='/about'>About us and our many services</a></nav>"
+            + "".join(f"<p>{p}</p>" for p in paragraphs)
+            + "<footer>Copyright stub pages, all rights reserved worldwide forever.</footer></body></html>"
+        )
+        data = html.encode("utf-8")
+        size = int(params.get("size", [0])[0])
+        if size > len(data):
+            data += b" " * (size - len(data))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubServer:
+    """Runs one stub HTTP server on a background thread."""
+
+    def __init__(self, handler, latency=0.0, jitter=0.0, error_rate=0.0, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = {"latency": latency, "jitter": jitter, "error_rate": error_rate, "page_latency": 0.0}
+        self.httpd.base_url = self.base_url
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def groq_stub(latency=0.5, jitter=0.1, error_rate=0.0, **kwargs):
+    """Stub for the Groq chat completions API. URL: <base_url>/openai/v1/chat/completions"""
+    return StubServer(_GroqHandler, latency, jitter, error_rate, **kwargs)
+
+
+def search_stub(latency=0.3, jitter=0.1, error_rate=0.0, page_latency=0.05, **kwargs):
+    """
+    Stub JSON search endpoint compatible with WEB_SEARCH_URL. URL: <base_url>/search
+    Result hrefs point at HTML pages served by the same stub (<base_url>/page/<n>),
+    each taking `page_latency` seconds, for exercising the page fetch stage.
+    """
+    server = StubServer(_SearchHandler, latency, jitter, error_rate, **kwargs)
+    server.httpd.config["page_latency"] = page_latency
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the Groq and web search stubs until interrupted.")
+    parser.add_argument("--groq-port", type=int, default=8801)
+    parser.add_argument("--search-port", type=int, default=8802)
+    parser.add_argument("--groq-latency", type=float, default=0.5)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    args = parser.parse_args()
+
+    groq = groq_stub(args.groq_latency, args.jitter, port=args.groq_port).start()
+    search = search_stub(args.search_latency, args.jitter, port=args.search_port).start()
+    print(f"GROQ_API_URL={groq.base_url}/openai/v1/chat/completions")
+    print(f"WEB_SEARCH_URL={search.base_url}/search")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        groq.stop()
+        search.stop()
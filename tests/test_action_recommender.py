@@ -0,0 +1,44 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from action_recommender import ActionRecommender, build_knn, rank_actions, save_graph, pack_strings, unpack_strings
+
+
+def test_pack_strings_round_trip():
+    strings = ["hydraulic leak", "", "Ölstand prüfen ✓", "x" * 1000]
+    assert unpack_strings(*pack_strings(strings)) == strings
+
+
+def test_graph_round_trip_without_pickle(tmp_path):
+    embeddings = np.eye(3, dtype=np.float32)
+    embeddings[1] = [0.8, 0.6, 0.0]
+    problems = ["pump leak", "pump seep", "tire worn"]
+    counts = [Counter({"replaced seal": 2}), Counter({"tightened fitting": 1}), Counter({"replaced tire": 1})]
+    indices, sims = build_knn(embeddings, k=2)
+    ranked = rank_actions(counts, indices, sims)
+
+    path = tmp_path / "graph.npz"
+    save_graph(path, embeddings, indices, sims, problems, ranked)
+    recommender = ActionRecommender(path)
+
+    result = recommender.suggest([1.0, 0.0, 0.0], limit=2)
+    assert result["matchedProblem"] == "pump leak"
+    assert [s["action"] for s in result["suggestions"]] == ["replaced seal", "tightened fitting"]
+
+
+def test_object_arrays_are_refused(tmp_path):
+    path = tmp_path / "old.npz"
+    np.savez(path, embeddings=np.eye(2, dtype=np.float32),
+             problem_bytes=np.array(["a", "b"], dtype=object), problem_offsets=np.array([0, 1, 2]),
+             action_bytes=np.array(["[]", "[]"], dtype=object), action_offsets=np.array([0, 1, 2]))
+    with pytest.raises(ValueError):
+        ActionRecommender(path)
+
+
+def test_load_if_exists_skips_old_format(tmp_path):
+    path = tmp_path / "old.npz"
+    np.savez(path, embeddings=np.eye(2, dtype=np.float32), problems=np.array(["a", "b"], dtype=object))
+    assert ActionRecommender.load_if_exists(path) is None
+    assert ActionRecommender.load_if_exists(tmp_path / "missing.npz") is None
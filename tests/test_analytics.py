@@ -0,0 +1,59 @@
+import pandas as pd
+
+import analytics
+from analytics import empty_rollups, fold_rows
+from issue_categories import UNCLASSIFIED, classify_issue, normalize_category
+
+
+def test_specific_systems_win_over_mechanical_context():
+    assert classify_issue("engine runs rough, replaced left magneto") == "Electrical"
+    assert classify_issue("cracked rib at wing spar, riveted doubler") == "Structural"
+
+
+def test_mechanical_only_when_its_terms_alone_match():
+    assert classify_issue("rough idle, cleaned carburetor") == "Mechanical"
+
+
+def test_unmatched_text_is_unclassified():
+    assert classify_issue("pilot reports something odd") == UNCLASSIFIED
+    assert classify_issue("") == UNCLASSIFIED
+    assert normalize_category("unclassified") == UNCLASSIFIED
+
+
+def test_fold_rows_keeps_exact_counts_for_every_problem():
+    rollups = empty_rollups()
+    rows = [{"problem": f"Problem {i}", "category": "Mechanical", "week": "2026-10-12"} for i in range(1500)]
+    rows += [{"problem": "problem 7 ", "category": "Mechanical", "week": "2026-10-12"}]
+    rows += [{"problem": "odd noise", "category": UNCLASSIFIED, "week": "2026-10-19"}]
+    fold_rows(rollups, rows)
+
+    assert rollups["total"] == 1502
+    assert len(rollups["problem_counts"]["Mechanical"]) == 1500
+    assert rollups["problem_counts"]["Mechanical"]["problem 7"] == 2
+    assert rollups["by_category"][UNCLASSIFIED] == 1
+    assert rollups["weekly"] == {"2026-10-12": {"Mechanical": 1501}, "2026-10-19": {UNCLASSIFIED: 1}}
+
+
+def test_same_rows_under_another_file_name_are_not_counted_twice(tmp_path):
+    df = pd.DataFrame({"processed_problem": ["oil leak", "oil leak", "flat tire"],
+                       "processed_action": ["tightened", "tightened", "replaced"]})
+    assert analytics.ingest(df, "maintenance.csv", tmp_path) == 3  # Repeated rows are separate logs
+    assert analytics.ingest(df, "maintenance_logs.csv", tmp_path) == 0
+    assert analytics.load_rollups(tmp_path)["total"] == 3
+
+
+def test_top_problems_are_served_from_the_precomputed_lists(tmp_path, monkeypatch):
+    rollups = empty_rollups()
+    rows = [{"problem": p, "category": c, "week": "2026-10-12"}
+            for p, c, n in [("oil leak", "Mechanical", 5), ("flat tire", "Mechanical", 3),
+                            ("dead battery", "Electrical", 4), ("oil leak", "Electrical", 1)]
+            for _ in range(n)]
+    analytics.save_rollups(fold_rows(rollups, rows), tmp_path)
+    store = analytics.AnalyticsStore(tmp_path)
+
+    assert store.top_problems(2) == [{"problem": "oil leak", "count": 6}, {"problem": "dead battery", "count": 4}]
+    assert store.top_problems(5, "Electrical") == [{"problem": "dead battery", "count": 4}, {"problem": "oil leak", "count": 1}]
+    assert store.top_problems(5, UNCLASSIFIED) == []
+
+    monkeypatch.setattr(analytics, "Counter", None)  # Requests must not merge the full counts
+    assert store.top_problems(1) == [{"problem": "oil leak", "count": 6}]
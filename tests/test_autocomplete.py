@@ -0,0 +1,35 @@
+import pandas as pd
+
+import analytics
+from autocomplete import Autocomplete, PrefixIndex
+
+
+def load(base, problems, name):
+    # A distinct action per load: identical rows loaded again would be skipped as already stored
+    df = pd.DataFrame({"processed_problem": problems, "processed_action": [f"replaced ({name})"] * len(problems)})
+    return analytics.ingest(df, name, base)
+
+
+def test_prefix_index_orders_by_count():
+    index = PrefixIndex({"oil leak": 3, "oil pressure low": 5, "oily rag": 1, "prop nick": 9})
+    assert index.complete("oil", 2) == [("oil pressure low", 5), ("oil leak", 3)]
+    assert index.complete("oil ") == [("oil pressure low", 5), ("oil leak", 3)]
+    assert index.merged({"oil leak": 4}).complete("oil l") == [("oil leak", 7)]
+
+
+def test_refresh_runs_in_background_and_swaps_indexes(tmp_path):
+    load(tmp_path, ["oil leak", "oil leak"], "first.csv")
+    auto = Autocomplete(csv_path=tmp_path / "none.csv", analytics_dir=tmp_path).build()
+    assert auto.complete("oil") == [{"text": "oil leak", "count": 2}]
+
+    load(tmp_path, ["oil leak", "oil filter loose"], "second.csv")
+    before = auto.indexes
+    auto.checked = 0.0  # Make a check due
+    thread = auto.refresh_in_background()
+    assert thread is not None
+    assert auto.refresh_in_background() is None  # Only one refresh at a time
+    thread.join(5)
+
+    assert auto.indexes is not before
+    assert auto.complete("oil") == [{"text": "oil leak", "count": 3}, {"text": "oil filter loose", "count": 1}]
+    assert auto.refresh(force=True) == 0
@@ -0,0 +1,59 @@
+import numpy as np
+
+from context_compression import OMISSION, compress_contexts, decode_vectors, sentence_fields, split_sentences
+
+SENTENCES = [
+    "The left main gear tire was found worn past limits.",
+    "Inspection of the brake assembly showed no further damage.",
+    "Shop records list the last tire change four months ago.",
+    "The tire was replaced and torqued per the maintenance manual.",
+]
+
+
+def one_hot(texts):
+    # Sentence i of SENTENCES points along axis i
+    return np.eye(len(SENTENCES))[[SENTENCES.index(t) for t in texts]]
+
+
+def test_short_fragments_are_merged_into_one_unit():
+    text = "Flight Phase : Parked\nAircraft : C172\n" + SENTENCES[0] + " " + SENTENCES[1]
+    assert split_sentences(text) == ["Flight Phase : Parked Aircraft : C172", SENTENCES[0], SENTENCES[1]]
+
+
+def test_sentence_fields_embed_every_text_in_one_call():
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return one_hot(texts)
+
+    fields = sentence_fields([" ".join(SENTENCES[:3]), SENTENCES[3]], embed)
+    assert calls == [SENTENCES]
+    assert [f["sentences"] for f in fields] == [SENTENCES[:3], SENTENCES[3:]]
+    assert decode_vectors(fields[1]["sentence_vectors"], 1).tolist() == [[0, 0, 0, 1]]
+
+
+def test_best_sentences_keep_their_order_with_omission_markers():
+    [fields] = sentence_fields([" ".join(SENTENCES)], one_hot)
+    results = [{"text": " ".join(SENTENCES), "payload": {"synp": "Worn tire", **fields}}]
+    query = [0.9, 0.0, 0.1, 0.8]
+
+    compress_contexts(results, query, keep=2)
+    assert results[0]["text"] == SENTENCES[0] + OMISSION + SENTENCES[3] + "\n\nSynopsis: Worn tire"
+    assert "sentences" not in results[0]["payload"]
+
+    [fields] = sentence_fields([" ".join(SENTENCES)], one_hot)
+    results = [{"text": " ".join(SENTENCES), "payload": dict(fields)}]
+    compress_contexts(results, [0.0, 0.9, 0.8, 0.0], keep=2)
+    assert results[0]["text"] == SENTENCES[1] + " " + SENTENCES[2]
+
+
+def test_contexts_with_few_sentences_pass_through():
+    [fields] = sentence_fields([" ".join(SENTENCES[:2])], one_hot)
+    payload = {"synp": "Worn tire", **fields}
+    results = [{"text": "original text", "payload": payload}, {"text": "no sentences", "payload": {}}]
+
+    compress_contexts(results, [1.0, 0.0, 0.0, 0.0], keep=2)
+    assert [r["text"] for r in results] == ["original text", "no sentences"]
+    assert results[0]["payload"] == {"synp": "Worn tire"}
+    assert "sentences" in payload  # The shared payload dict is left untouched
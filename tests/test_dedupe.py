@@ -0,0 +1,53 @@
+import numpy as np
+
+from dedupe import dedupe_sections, find_duplicate_groups, jaccard, lsh_candidates, minhash, minhash_params, shingles
+
+BASE = ("During cruise the number two engine oil pressure dropped below limits and the crew "
+        "shut it down, declared an emergency and diverted to the nearest suitable airport where "
+        "maintenance found a cracked oil line fitting on the accessory gearbox")
+
+
+def test_shingles_are_unique_word_trigrams():
+    assert shingles("a b c d").size == 2
+    assert shingles("A b c a B C").size == 3  # "a b c" repeats, case-folded
+    assert shingles("one").size == 1
+    assert shingles("").size == 1  # The empty gram
+
+
+def test_minhash_estimates_jaccard():
+    params = minhash_params(256)
+    a = shingles(BASE)
+    b = shingles(BASE.replace("cracked", "loose").replace("nearest", "closest"))
+    estimate = np.mean(minhash(a, params) == minhash(b, params))
+    assert abs(estimate - jaccard(a, b)) < 0.1
+    assert np.array_equal(minhash(a, params), minhash(shingles(BASE), params))
+
+
+def test_lsh_candidates_share_a_band():
+    signatures = np.array([[1, 2, 3, 4], [1, 2, 9, 9], [7, 7, 3, 4], [5, 5, 5, 5]], dtype=np.uint64)
+    assert lsh_candidates(signatures, bands=2) == {(0, 1), (0, 2)}
+
+
+def test_groups_near_duplicates_only():
+    texts = [
+        BASE,
+        BASE + " and replaced it",
+        "Bird strike on climb out, windshield cracked, returned to the field and landed without incident",
+        BASE.replace("oil", "fuel").replace("engine", "pack"),
+    ]
+    assert find_duplicate_groups(texts, threshold=0.8) == [[0, 1]]
+    assert find_duplicate_groups([]) == []
+
+
+def test_dedupe_sections_keeps_the_longest_and_records_acns():
+    sections = [
+        {"acn": "100", "text": BASE},
+        {"acn": "200", "text": BASE + " and replaced it"},
+        {"acn": "100", "text": BASE + "."},
+        {"acn": "300", "text": "Unrelated text about a tire that blew on landing rollout"},
+    ]
+    kept, report = dedupe_sections(sections, lambda sec: sec["text"])
+
+    assert [(sec["acn"], sec["duplicate_acns"]) for sec in kept] == [("200", ["100"]), ("300", [])]
+    assert report["removed"] == 2
+    assert report["groups"] == [["100", "200", "100"]]
@@ -0,0 +1,54 @@
+import pytest
+
+from facets import (
+    AIRCRAFT_MODEL_FIELD, AIRCRAFT_TYPE_FIELD, ISSUE_CATEGORY_FIELD,
+    acn_facets, extract_aircraft_models, extract_aircraft_types, log_facets,
+    normalize_aircraft_model, parse_facet_filters,
+)
+
+ACN = """Aircraft 1
+Make Model Name : B737-800
+Aircraft 2
+Make Model Name : Commercial Fixed Wing
+Aircraft 3
+Make Model Name :  Embraer   ERJ 190
+Narrative: The A320 behind us reported hydraulic leak on the 737-800."""
+
+
+def test_extract_aircraft_models_in_frontend_order():
+    assert extract_aircraft_models(ACN) == ["Boeing 737", "Airbus A320", "Embraer E190"]
+    assert extract_aircraft_models("a321neo and an A350") == ["Airbus A320", "Airbus A350"]
+    assert extract_aircraft_models("flight 7370 to B7870") == []
+    assert extract_aircraft_models(None) == []
+
+
+def test_extract_aircraft_types_skips_generic_values():
+    assert extract_aircraft_types(ACN) == ["B737-800", "Embraer ERJ 190"]
+
+
+def test_normalize_aircraft_model():
+    assert normalize_aircraft_model(" boeing 787 ") == "Boeing 787"
+    assert normalize_aircraft_model("Cessna 172") is None
+    assert normalize_aircraft_model("") is None
+
+
+def test_acn_and_log_facets():
+    facets = acn_facets(ACN, "hydraulic leak at the reservoir")
+    assert facets == {
+        AIRCRAFT_MODEL_FIELD: ["Boeing 737", "Airbus A320", "Embraer E190"],
+        AIRCRAFT_TYPE_FIELD: ["B737-800", "Embraer ERJ 190"],
+        ISSUE_CATEGORY_FIELD: "Hydraulics",
+    }
+    assert log_facets("battery dead", "replaced battery") == {ISSUE_CATEGORY_FIELD: "Electrical"}
+
+
+def test_parse_facet_filters():
+    assert parse_facet_filters() == {}
+    assert parse_facet_filters("airbus a350", "avionics") == {
+        AIRCRAFT_MODEL_FIELD: "Airbus A350",
+        ISSUE_CATEGORY_FIELD: "Avionics",
+    }
+    with pytest.raises(ValueError, match="aircraft model"):
+        parse_facet_filters(aircraft_model="Cessna 172")
+    with pytest.raises(ValueError, match="issue category"):
+        parse_facet_filters(issue_category="Paint")
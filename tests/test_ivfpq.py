@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from ivfpq import IVFPQIndex, load_local_indexes, rerank, synthetic_vectors
+
+K = 10
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    ids, vectors = synthetic_vectors(8000, seed=3)
+    rng = np.random.default_rng(4)
+    queries = vectors[rng.choice(len(vectors), 50, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = [set(np.argpartition(-(vectors @ q), K)[:K].tolist()) for q in queries]
+    return ids, vectors, queries, truth, IVFPQIndex.build(vectors, ids)
+
+
+def recall(index, vectors, queries, truth, shortlist_factor, nprobe=16):
+    hits = 0
+    for q, expected in zip(queries, truth):
+        shortlist, _ = index.search(q, K * shortlist_factor, nprobe)
+        found, _ = rerank(shortlist, vectors[shortlist], q, K)
+        hits += len(expected.intersection(found))
+    return hits / (K * len(queries))
+
+
+def test_reranked_shortlist_recovers_exact_top_k(corpus):
+    ids, vectors, queries, truth, index = corpus
+    pq_only = np.mean([len(t.intersection(index.search(q, K)[0])) / K for q, t in zip(queries, truth)])
+    reranked = recall(index, vectors, queries, truth, shortlist_factor=10)
+    assert reranked >= 0.95
+    assert reranked > pq_only
+
+
+def test_rerank_scores_are_exact_inner_products(corpus):
+    ids, vectors, queries, truth, index = corpus
+    shortlist, _ = index.search(queries[0], 30)
+    found, scores = rerank(shortlist, vectors[shortlist], queries[0], 5)
+    assert np.allclose(scores, vectors[found] @ queries[0])
+    assert list(scores) == sorted(scores, reverse=True)
+    assert rerank([], [], queries[0], 5)[0] == []
+
+
+def test_saved_indexes_load_by_version_and_are_reused(corpus, tmp_path):
+    ids, vectors, queries, truth, index = corpus
+    index.save(tmp_path / "acn_v20261019T131500")
+
+    loaded = load_local_indexes(["acn_v20261019T131500", "acn_v20261020T090000"], tmp_path)
+    assert list(loaded) == ["acn_v20261019T131500"]
+    assert loaded["acn_v20261019T131500"].search(queries[0], K)[0] == index.search(queries[0], K)[0]
+
+    again = load_local_indexes(["acn_v20261019T131500"], tmp_path, loaded=loaded)
+    assert again["acn_v20261019T131500"] is loaded["acn_v20261019T131500"]
+    assert load_local_indexes(["acn_v20261020T090000"], tmp_path, loaded=loaded) == {}
+    assert load_local_indexes(["acn"], None) == {}
@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from log_store import InvalidCursor, LogStore, decode_cursor, encode_cursor, fts_query
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LogStore(tmp_path / "logs.sqlite")
+    rows = [("2026-10-%02d" % (1 + i % 5), f"oil leak {i}" if i % 2 else f"battery dead {i}", "fixed") for i in range(23)]
+    df = pd.DataFrame(rows, columns=["date", "processed_problem", "processed_action"])
+    assert store.ingest(df, "test.csv") == 23
+    return store
+
+
+def walk(store, **kwargs):
+    items, cursor, pages = [], None, 0
+    while True:
+        page = store.page(cursor=cursor, **kwargs)
+        items += page["items"]
+        pages += 1
+        cursor = page["nextCursor"]
+        if cursor is None:
+            return items, pages
+
+
+def test_cursor_round_trip_and_rejection():
+    cursor = encode_cursor({"date": "2026-10-01", "id": 42}, "desc")
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "desc") == ("2026-10-01", 42)
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "asc")
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor", "desc")
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor({"date": "2026-10-01", "id": "42"}, "desc"), "desc")
+
+
+def test_keyset_pages_cover_every_row_once_in_order(store):
+    items, pages = walk(store, limit=5)
+    assert pages == 5 and len(items) == 23
+    assert len({item["id"] for item in items}) == 23
+    assert [item["date"] for item in items] == sorted((item["date"] for item in items), reverse=True)
+
+    ascending, _ = walk(store, limit=7, order="asc")
+    assert [item["id"] for item in ascending] == [item["id"] for item in reversed(items)]
+
+
+def test_rows_added_later_do_not_shift_pages(store):
+    first = store.page(limit=5)
+    store.ingest(pd.DataFrame([("2026-10-09", "new problem", "fixed")],
+                              columns=["date", "processed_problem", "processed_action"]), "later.csv")
+    second = store.page(limit=5, cursor=first["nextCursor"])
+    assert second["items"][0]["date"] <= first["items"][-1]["date"]
+    assert "new problem" not in [item["description"] for item in second["items"]]
+    assert first["items"][-1]["id"] not in [item["id"] for item in second["items"]]  # Offset paging would repeat it
+
+
+def test_filters_and_search(store):
+    items, _ = walk(store, limit=3, q="batt", date_from="2026-10-02", date_to="2026-10-03")
+    assert items and all(i["description"].startswith("battery") and i["date"] in ("2026-10-02", "2026-10-03")
+                         for i in items)
+    assert store.page(category="electrical")["items"]
+    with pytest.raises(ValueError):
+        store.page(category="Paint")
+    with pytest.raises(ValueError):
+        store.page(date_from="yesterday")
+    assert fts_query('oil" OR *') == '"oil"* "or"*'
@@ -0,0 +1,101 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import page_fetch
+from page_fetch import download, fetch_passages, prune_cache, read_cache, write_cache
+
+
+def test_concurrent_writes_of_one_url_never_collide(tmp_path):
+    errors = []
+
+    def writer(n):
+        try:
+            for i in range(20):
+                write_cache("https://example.com/a", f"text {n}-{i}", tmp_path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert read_cache("https://example.com/a", tmp_path).startswith("text ")
+    assert [p.suffix for p in tmp_path.iterdir()] == [".json"]
+
+
+def test_prune_drops_expired_then_oldest(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_fetch, "PAGE_CACHE_PRUNE_EVERY", 10 ** 6)
+    now = time.time()
+    for i, url in enumerate(["old", "a", "b", "c"]):
+        write_cache(url, "x" * 1000, tmp_path)
+        age = 10_000 if url == "old" else 30 - i
+        os.utime(page_fetch._cache_path(url, tmp_path), (now - age, now - age))
+    stale_tmp = tmp_path / "leftover.tmp"
+    stale_tmp.write_text("partial")
+    os.utime(stale_tmp, (now - 7200, now - 7200))
+
+    assert prune_cache(tmp_path, max_bytes=2500, ttl=3600) == 3
+    assert [read_cache(u, tmp_path) is not None for u in ["old", "a", "b", "c"]] == [False, False, True, True]
+    assert not stale_tmp.exists()
+
+
+class _DripHandler(BaseHTTPRequestHandler):
+    """Sends a page one byte every 0.1s, well inside any per-read timeout."""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", "1000")
+        self.end_headers()
+        try:
+            for _ in range(1000):
+                self.wfile.write(b"x")
+                self.wfile.flush()
+                time.sleep(0.1)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def test_download_stops_a_slow_page_at_its_total_timeout():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DripHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            download(f"http://127.0.0.1:{server.server_port}/", timeout=0.5)
+        assert time.monotonic() - start < 2
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_queued_fetches_are_cancelled_at_the_deadline(tmp_path, monkeypatch):
+    started = []
+    release = threading.Event()
+
+    def slow_fetch(url, cache_dir):
+        started.append(url)
+        release.wait(5)
+        return None
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(page_fetch, "fetch_pool", pool)
+    monkeypatch.setattr(page_fetch, "fetch_page_text", slow_fetch)
+    try:
+        assert fetch_passages(["a", "b", "c"], [1.0], None, deadline=0.2, cache_dir=tmp_path) == {}
+    finally:
+        release.set()
+        pool.shutdown(wait=True)
+    assert started == ["a"]
@@ -0,0 +1,31 @@
+from payload_store import PayloadStore
+
+
+def test_round_trip(tmp_path):
+    store = PayloadStore(tmp_path / "payloads.sqlite")
+    fields = {"text_chunk": "Replaced hydraulic pump — leak at fitting ✓", "synp": "x" * 5000}
+    assert store.put_many("acn", [(1, fields), ("a-2", {"text_chunk": "other"})]) == 2
+
+    assert store.get_many("acn", [1, "a-2", "missing"]) == {"1": fields, "a-2": {"text_chunk": "other"}}
+    assert store.get_many("acn", []) == {}
+    assert store.count("acn") == 2
+
+
+def test_collections_are_separate_and_replace_overwrites(tmp_path):
+    store = PayloadStore(tmp_path / "payloads.sqlite")
+    store.put_many("acn", [(1, {"text_chunk": "old"})])
+    store.put_many("logs", [(1, {"text_chunk": "log"})])
+    store.put_many("acn", [(1, {"text_chunk": "new"})])
+
+    assert store.get_many("acn", [1]) == {"1": {"text_chunk": "new"}}
+    assert store.get_many("logs", [1]) == {"1": {"text_chunk": "log"}}
+
+
+def test_delete_ids_and_collection(tmp_path):
+    store = PayloadStore(tmp_path / "payloads.sqlite")
+    store.put_many("acn", [(i, {"n": i}) for i in range(5)])
+    store.delete_ids("acn", [0, 1])
+    assert sorted(store.get_many("acn", range(5))) == ["2", "3", "4"]
+
+    store.delete_collection("acn")
+    assert store.count("acn") == 0
@@ -0,0 +1,24 @@
+import os
+import time
+
+from profiling import folded_path, profile_call, prune_profiles
+
+
+def test_profile_call_saves_folded_stacks(tmp_path):
+    result, report = profile_call(lambda: sum(range(100_000)), save_dir=tmp_path)
+    assert result == sum(range(100_000))
+    assert folded_path(report["profileId"], tmp_path) is not None
+    assert folded_path("../etc/passwd", tmp_path) is None
+
+
+def test_only_the_newest_profiles_are_kept(tmp_path):
+    now = time.time()
+    for i in range(5):
+        path = tmp_path / f"{i:032x}.folded"
+        path.write_text("main 1\n")
+        os.utime(path, (now - 100 + i, now - 100 + i))
+    (tmp_path / "notes.txt").write_text("kept")
+
+    assert prune_profiles(tmp_path, keep=2) == 3
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"{3:032x}.folded", f"{4:032x}.folded", "notes.txt"]
+    assert prune_profiles(tmp_path, keep=2) == 0
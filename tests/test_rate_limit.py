@@ -0,0 +1,124 @@
+import time
+import threading
+
+import pytest
+
+from rate_limit import TokenBucket, RateLimiter, RateLimitTimeout, SingleFlight, SingleFlightTimeout
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(60, period=60.0)  # 1 unit per second
+    bucket.level = 0.0
+    bucket.refill(bucket.updated + 2.5)
+    assert bucket.level == pytest.approx(2.5)
+    assert bucket.wait_time(4) == pytest.approx(1.5)
+    bucket.refill(bucket.updated + 1000)
+    assert bucket.level == 60
+
+
+def test_limiter_spends_both_budgets():
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=1000)
+    assert limiter.acquire(100) == pytest.approx(0, abs=0.01)
+    assert limiter.acquire(100) == pytest.approx(0, abs=0.01)
+    assert limiter.tokens.level == pytest.approx(800, abs=1)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(100, max_wait=0.1)  # Third request in the minute
+
+
+def test_oversized_request_is_charged_one_full_bucket():
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=1000)
+    limiter.acquire(5000, max_wait=0.1)
+    assert limiter.tokens.level == pytest.approx(0, abs=1)
+    limiter.reconcile(5000, 1000)  # Real usage equal to the capacity: nothing to correct
+    assert limiter.tokens.level == pytest.approx(0, abs=1)
+
+
+def test_reconcile_returns_unused_tokens():
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=1000)
+    limiter.acquire(300)
+    limiter.reconcile(300, 100)
+    assert limiter.tokens.level == pytest.approx(900, abs=1)
+
+
+def _concurrently(fn, n):
+    results = [None] * n
+    errors = [None] * n
+
+    def run(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_singleflight_shares_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "answer"
+
+    results, errors = _concurrently(lambda: flight.do("k", slow), 5)
+    assert errors == [None] * 5
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {result for result, _ in results} == {"answer"}
+
+
+def test_singleflight_waiter_times_out_on_its_own_budget():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.5)
+        return "late"
+
+    leader = threading.Thread(target=flight.do, args=("k", slow))
+    leader.start()
+    started.wait()
+    t0 = time.monotonic()
+    with pytest.raises(SingleFlightTimeout):
+        flight.do("k", slow, timeout=0.05)
+    assert time.monotonic() - t0 < 0.3
+    leader.join()
+
+
+def test_singleflight_waiter_does_not_inherit_leader_error():
+    flight = SingleFlight()
+    started = threading.Event()
+    attempts = []
+
+    def leader_fn():
+        started.set()
+        time.sleep(0.1)
+        raise TimeoutError("leader ran out of time")
+
+    def waiter_fn():
+        attempts.append(1)
+        return "own answer"
+
+    leader_errors = []
+
+    def lead():
+        try:
+            flight.do("k", leader_fn)
+        except TimeoutError as e:
+            leader_errors.append(e)
+
+    leader = threading.Thread(target=lead)
+    leader.start()
+    started.wait()
+    assert flight.do("k", waiter_fn) == ("own answer", False)
+    assert attempts == [1]
+    leader.join()
+    assert len(leader_errors) == 1
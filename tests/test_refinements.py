@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from refinements import RefinementStore
+from sessions import Session
+
+try:
+    import rag_pipeline
+except Exception:  # Needs the embedding model and service configuration
+    rag_pipeline = None
+
+
+def test_refinement_goes_from_pending_to_done():
+    store = RefinementStore(workers=1)
+    release = threading.Event()
+    refinement = store.submit(lambda: release.wait(5) and "refined answer")
+
+    assert store.get(refinement.id).to_dict() == {"refinementId": refinement.id, "status": "pending"}
+    release.set()
+    assert refinement.wait(5)
+    info = store.get(refinement.id).to_dict()
+    assert (info["status"], info["response"]) == ("done", "refined answer")
+
+
+def test_refinement_that_raises_is_failed():
+    store = RefinementStore(workers=1)
+
+    def refine():
+        raise RuntimeError("web search down")
+
+    refinement = store.submit(refine)
+    assert refinement.wait(5)
+    assert store.get(refinement.id).to_dict() == {"refinementId": refinement.id, "status": "failed", "error": "web search down"}
+
+
+def test_expired_and_excess_refinements_are_evicted():
+    store = RefinementStore(workers=1, max_items=2, ttl=60)
+    first, second, third = (store.submit(lambda: "answer") for _ in range(3))
+    assert store.get(first.id) is None  # Oldest dropped past max_items
+    assert store.get(second.id) is second
+
+    second.created -= 120
+    assert store.get(second.id) is None
+    assert store.get(third.id) is third
+
+
+@pytest.mark.skipif(rag_pipeline is None, reason="rag_pipeline could not be imported here")
+def test_finished_refinement_replaces_the_fast_answer_in_the_session(monkeypatch):
+    context_info = {"results": [{"text": "Replaced worn tire", "payload": {}}]}
+    monkeypatch.setattr(rag_pipeline, "embed_query", lambda q: [1.0, 0.0])
+    monkeypatch.setattr(rag_pipeline, "retrieve_contexts", lambda *a, **k: context_info)
+    monkeypatch.setattr(rag_pipeline, "route_request", lambda q, ctx: {"web_search": True})
+    monkeypatch.setattr(rag_pipeline, "search_web_if_needed", lambda *a, **k: ["web snippet"])
+    monkeypatch.setattr(rag_pipeline, "compose_answer", lambda q, ctx, web: "refined" if web else "fast")
+
+    session = Session("s1")
+    answer, refine = rag_pipeline.rag_pipeline_progressive("How do I replace a tire?", session)
+    assert answer == "fast"
+    assert session.turns == [{"question": "How do I replace a tire?", "answer": "fast"}]
+
+    store = RefinementStore(workers=1)
+    refinement = store.submit(refine)
+    assert refinement.wait(5) and refinement.response == "refined"
+    assert session.turns == [{"question": "How do I replace a tire?", "answer": "refined"}]
+    assert session.web_snippets == ["web snippet"]
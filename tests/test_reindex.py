@@ -0,0 +1,31 @@
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import PointStruct
+
+import reindex
+from payload_store import PayloadStore
+
+
+def load_version(client, store, alias, ids):
+    name = reindex.create_version(client, alias, 2)
+    client.upsert(collection_name=name, points=[PointStruct(id=i, vector=[1.0, i / 10], payload={}) for i in ids], wait=True)
+    store.put_many(alias, [(i, {"text_chunk": f"text {i}"}) for i in ids])
+    return name
+
+
+def test_failed_validation_drops_the_new_texts_and_keeps_the_live_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(reindex, "LOCAL_INDEX_DIR", None)
+    monkeypatch.setattr(reindex, "version_name", lambda alias: f"{alias}_v20261019T00000{len(client.get_collections().collections)}")
+    client = QdrantClient(":memory:")
+    store = PayloadStore(tmp_path / "payloads.sqlite")
+
+    live = load_version(client, store, "acn", [1, 2])
+    reindex.publish(client, "acn", live, 2, [])
+
+    failed = load_version(client, store, "acn", [3, 4, 5])
+    with pytest.raises(reindex.ReindexError):
+        reindex.publish(client, "acn", failed, 4, [], store)
+
+    assert reindex.current_version(client, "acn") == live
+    assert reindex.list_versions(client, "acn") == [live]
+    assert sorted(store.get_many("acn", [1, 2, 3, 4, 5])) == ["1", "2"]
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from resilience import (
+    CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded,
+    current_deadline, deadline_scope, stage_timeout,
+)
+
+
+def fail():
+    raise ConnectionError("down")
+
+
+def test_deadline_caps_stage_timeouts():
+    deadline = Deadline(10)
+    assert deadline.timeout(3) == 3
+    assert 9.9 < deadline.timeout() <= 10
+    assert not deadline.expired()
+
+    deadline.expires = time.monotonic() - 1
+    assert deadline.remaining() == 0 and deadline.expired()
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout(3)
+
+
+def test_deadline_scope_nests_and_restores():
+    assert current_deadline() is None
+    assert stage_timeout(5) == 5
+    outer, inner = Deadline(2), Deadline(30)
+    with deadline_scope(outer):
+        assert stage_timeout(5) <= 2
+        with deadline_scope(inner):
+            assert current_deadline() is inner
+            assert stage_timeout(5) == 5
+        assert current_deadline() is outer
+    assert current_deadline() is None
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test-open", failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.call(lambda: "ok") == "ok"  # A success resets the count
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(calls.append, 1)
+    assert calls == [] and breaker.is_open()
+    assert breaker.snapshot()["state"] == "open"
+    assert breaker.snapshot()["lastError"] == "down"
+
+
+def test_half_open_allows_one_trial_then_closes_or_reopens():
+    breaker = CircuitBreaker("test-trial", failure_threshold=1, reset_timeout=0.05)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    time.sleep(0.06)
+    assert not breaker.is_open()
+
+    assert breaker.allow()  # The trial
+    assert not breaker.allow()  # Everyone else waits for it
+    breaker.record_failure(ConnectionError("still down"))
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_deadline_exceeded_does_not_count_against_the_dependency():
+    breaker = CircuitBreaker("test-deadline", failure_threshold=1, reset_timeout=0.05)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    time.sleep(0.06)
+
+    def out_of_time():
+        raise DeadlineExceeded("no time left")
+
+    with pytest.raises(DeadlineExceeded):
+        breaker.call(out_of_time)
+    assert breaker.state == "half_open"
+    assert breaker.allow()  # The trial was given back
@@ -0,0 +1,95 @@
+import time
+import threading
+
+import pytest
+
+from scheduler import Overloaded, Scheduler, classify_priority, is_degraded
+
+LIMITS = {"aog": 4, "urgent": 4, "routine": 4, "background": 4}
+WAITS = {"aog": 5.0, "urgent": 5.0, "routine": 5.0, "background": 5.0}
+
+
+def wait_for_queued(scheduler, count):
+    deadline = time.monotonic() + 5
+    while scheduler._queued() < count:
+        assert time.monotonic() < deadline, "requests never queued"
+        time.sleep(0.005)
+
+
+def test_classify_priority():
+    assert classify_priority("URGENT") == "urgent"
+    assert classify_priority(None, None, "Aircraft on ground at KDEN, hydraulic leak") == "aog"
+    assert classify_priority(None, "Electrical", "battery dead") == "routine"
+    with pytest.raises(ValueError):
+        classify_priority("background")  # Reserved for work no client waits on
+
+
+def test_freed_slots_go_to_the_highest_class_in_arrival_order():
+    scheduler = Scheduler(concurrency=1, queue_limits=LIMITS, max_wait=WAITS)
+    holder = scheduler.acquire("routine")
+    order = []
+
+    def request(name, priority):
+        with scheduler.admit(priority):
+            order.append(name)
+
+    threads = []
+    for name, priority in [("bg", "background"), ("r1", "routine"), ("u1", "urgent"), ("r2", "routine"), ("aog", "aog")]:
+        threads.append(threading.Thread(target=request, args=(name, priority)))
+        threads[-1].start()
+        wait_for_queued(scheduler, len(threads))
+
+    scheduler.release(holder)
+    for t in threads:
+        t.join(5)
+    assert order == ["aog", "u1", "r1", "r2", "bg"]
+    assert scheduler.running == 0
+
+
+def test_full_queue_and_long_wait_are_shed():
+    scheduler = Scheduler(concurrency=1, queue_limits={**LIMITS, "routine": 1},
+                          max_wait={**WAITS, "routine": 0.05})
+    holder = scheduler.acquire("urgent")
+    shed = []
+
+    def waiter():
+        try:
+            scheduler.acquire("routine")
+        except Overloaded as e:
+            shed.append(e)
+
+    t = threading.Thread(target=waiter)
+    t.start()
+    wait_for_queued(scheduler, 1)
+    with pytest.raises(Overloaded, match="queue is full") as full:
+        scheduler.acquire("routine")
+    assert full.value.retry_after >= 1
+
+    t.join(5)
+    assert len(shed) == 1 and "No capacity" in str(shed[0])
+    assert scheduler._queued() == 0
+    scheduler.release(holder)
+    assert scheduler.running == 0
+
+
+def test_queued_lower_classes_run_degraded():
+    scheduler = Scheduler(concurrency=1, queue_limits=LIMITS, max_wait=WAITS, degrade_depth=1)
+    with scheduler.admit("routine") as ticket:
+        assert not ticket.degraded and not is_degraded()
+
+    holder = scheduler.acquire("routine")
+    seen = {}
+
+    def request(priority):
+        with scheduler.admit(priority) as ticket:
+            seen[priority] = (ticket.degraded, is_degraded())
+
+    threads = [threading.Thread(target=request, args=(p,)) for p in ("aog", "urgent")]
+    for i, t in enumerate(threads):
+        t.start()
+        wait_for_queued(scheduler, i + 1)
+    scheduler.release(holder)
+    for t in threads:
+        t.join(5)
+    assert seen == {"aog": (False, False), "urgent": (True, True)}
+    assert not is_degraded()
@@ -0,0 +1,83 @@
+import math
+
+import pytest
+
+from sessions import Session, SessionStore, FOLLOWUP_PATTERN, SESSION_REUSE_THRESHOLD, SESSION_FOLLOWUP_THRESHOLD
+
+
+def at_similarity(cos):
+    """2-d unit vector with the given cosine to the anchor [1, 0]."""
+    return [cos, math.sqrt(1 - cos * cos)]
+
+
+@pytest.fixture
+def session():
+    s = Session("s1")
+    s.update_retrieval([1.0, 0.0], {"results": ["ctx"]}, None)
+    return s
+
+
+@pytest.mark.parametrize("question", [
+    "What about the left main gear?",
+    "and the torque value?",
+    "Also, how long does the inspection take?",
+    "how about on the A320",
+    "Same for the Boeing 737?",
+    "What is the torque limit for that?",
+])
+def test_followup_phrasings(question):
+    assert FOLLOWUP_PATTERN.search(question)
+
+
+@pytest.mark.parametrize("question", [
+    "Is it normal that the oil pressure drops at idle?",
+    "What causes this hydraulic leak on the nose gear?",
+    "Are there known issues with the same pump model on cold days?",
+    "Check whether those brake wear pins are within limits",
+])
+def test_everyday_pronouns_are_not_followups(question):
+    assert not FOLLOWUP_PATTERN.search(question)
+
+
+def test_close_question_reuses_retrieval(session):
+    reuse, similarity = session.can_reuse("Any question", at_similarity(SESSION_REUSE_THRESHOLD + 0.05))
+    assert reuse
+    assert similarity == pytest.approx(SESSION_REUSE_THRESHOLD + 0.05)
+
+
+def test_followup_reuses_with_moderate_similarity(session):
+    cos = (SESSION_REUSE_THRESHOLD + SESSION_FOLLOWUP_THRESHOLD) / 2
+    assert session.can_reuse("What about the right side?", at_similarity(cos))[0]
+    assert not session.can_reuse("Is it normal for the right side to leak?", at_similarity(cos))[0]
+
+
+def test_drifted_followup_retrieves_again(session):
+    # A follow-up phrasing alone doesn't hold the session on an unrelated topic
+    assert not session.can_reuse("What about cabin pressurization?", at_similarity(0.1))[0]
+    assert SESSION_FOLLOWUP_THRESHOLD >= 0.25
+
+
+def test_filters_must_match(session):
+    assert not session.can_reuse("same question", [1.0, 0.0], filters={"issue_category": "Hydraulics"})[0]
+
+
+def test_new_session_has_nothing_to_reuse():
+    assert Session("s2").can_reuse("What about it?", [1.0, 0.0]) == (False, None)
+
+
+def test_contextualize_prefixes_previous_question(session):
+    session.add_turn("Hydraulic pump whines at startup", "Check the case drain filter")
+    assert session.contextualize("What about the reservoir?") == (
+        "(Previous question: Hydraulic pump whines at startup)\nFollow-up question: What about the reservoir?"
+    )
+
+
+def test_store_evicts_least_recently_used():
+    store = SessionStore(max_sessions=2, ttl=60)
+    a = store.get_or_create()
+    b = store.get_or_create()
+    store.get_or_create(a.id)  # Touch a
+    store.get_or_create()
+    assert store.get_or_create(a.id) is a
+    assert b.id not in store.sessions
+    assert store.delete(a.id) and not store.delete(a.id)